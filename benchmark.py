@@ -0,0 +1,251 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Benchmark Module
+This module contains the runner functions that time the graph algorithms on large randomly
+generated contact graphs, to show how they scale with the number of people.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+import numpy as np
+import engines
+from compact_graph import CompactGraph
+from edge_store import EdgeStoreBuilder, MappedGraph
+from simulation import Simulation
+from social_graph import Graph
+
+BENCHMARK_SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+
+# The average numbers of contacts per person of the edge stores built by benchmark_mapped_graph
+BENCHMARK_CONTACTS = (5, 20, 80)
+
+
+def generate_benchmark_graph(n: int, seed: int = 0) -> Graph:
+    """Return a connected Graph of n people with n + n // 5 edges, in the same shape as
+    data_processing.generate_connected_graph but without its limit on the number of people.
+
+    Preconditions:
+        - n >= 2
+    """
+    rand = random.Random(seed)
+    graph = Graph()
+
+    for i in range(n):
+        graph.add_vertex(str(i), 'P' + str(i), 30, 0.5)
+
+    # A random spanning tree keeps the graph connected, so every person gets a degree.
+    for i in range(1, n):
+        graph.add_edge(str(i), str(rand.randrange(i)), 0.5)
+
+    for _ in range(n // 5):
+        person_1, person_2 = rand.randrange(n), rand.randrange(n)
+        if person_1 != person_2:
+            graph.add_edge(str(person_1), str(person_2), 0.5)
+
+    return graph
+
+
+def benchmark_recalculate_degrees(sizes: tuple[int, ...] = BENCHMARK_SIZES,
+                                  num_infected: int = 5) -> list[tuple[int, float]]:
+    """Time Graph.recalculate_degrees on graphs of each of the given sizes, print a table of the
+    results, and return a list of (size, seconds) pairs.
+
+    The time per person should stay roughly constant as the size grows, since the calculation is
+    linear in the number of people and contacts.
+    """
+    results = []
+    print('{:>10} {:>12} {:>18}'.format('people', 'seconds', 'microseconds/person'))
+
+    for n in sizes:
+        graph = generate_benchmark_graph(n)
+        graph.set_infected({str(i) for i in range(0, n, max(1, n // num_infected))})
+
+        start = time.perf_counter()
+        graph.recalculate_degrees()
+        elapsed = time.perf_counter() - start
+
+        results.append((n, elapsed))
+        print('{:>10} {:>12.4f} {:>18.3f}'.format(n, elapsed, elapsed / n * 10 ** 6))
+
+    return results
+
+
+def benchmark_engines(n: int = 10 ** 5, ticks: int = 5,
+                      fraction_infected: float = 0.1) -> dict[str, float]:
+    """Time one tick of each infection engine in engines.ENGINES on a graph of n people with the
+    given fraction of them infected, print the results, and return a dictionary mapping each
+    engine name to its average seconds per tick.
+
+    Each engine is also timed with spread_indexes, which leaves out the conversion of the people
+    reached to identifiers.
+    """
+    graph = generate_benchmark_graph(n)
+    infected = {str(i) for i in range(0, n, max(1, round(1 / fraction_infected)))}
+    results = {}
+
+    for name, engine_class in engines.ENGINES.items():
+        engine = engine_class(graph)
+        engine.infect(infected)
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            engine.spread()
+        results[name] = (time.perf_counter() - start) / ticks
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            engine.spread_indexes()
+        print('{:>12} {:>12.4f} seconds/tick, {:.4f} with indexes'.format(
+            name, results[name], (time.perf_counter() - start) / ticks))
+
+    return results
+
+
+def benchmark_headless(n: int = 10 ** 5, ticks: int = 10, fraction_infected: float = 0.1,
+                       repeats: int = 3) -> dict[str, float]:
+    """Time a headless Simulation of ticks ticks with each infection engine in engines.ENGINES
+    on a graph of n people with the given fraction of them infected at the start, print the
+    results, and return a dictionary mapping each engine name to its average seconds per tick,
+    in the fastest of repeats runs.
+
+    Unlike benchmark_engines, this includes the work Simulation.run_headless does around the
+    engine on each tick, such as recording who was infected.
+    """
+    graph = generate_benchmark_graph(n)
+    conditions = (n, 'medium', max(1, round(n * fraction_infected)), 'yes')
+    results = {}
+
+    for name in engines.ENGINES:
+        times = []
+        for _ in range(repeats):
+            simulation = Simulation(conditions, graph, name, seed=0)
+            start = time.perf_counter()
+            simulation.run_headless(ticks)
+            times.append((time.perf_counter() - start) / ticks)
+
+        results[name] = min(times)
+        print('{:>12} {:>12.4f} seconds/tick'.format(name, results[name]))
+
+    return results
+
+
+def benchmark_mapped_graph(n: int = 10 ** 5,
+                           contacts: tuple[int, ...] = BENCHMARK_CONTACTS,
+                           ticks: int = 10) -> list[tuple[int, float, float]]:
+    """Build an edge store of n people for each of the given average numbers of contacts per
+    person, open each one as a MappedGraph in a new process, recalculate its degrees and run
+    ticks ticks of the vectorized engine on it. Print a table of the size of the contact files
+    and of the most memory the process used beyond what it used once the store was open, and
+    return a list of (contacts per person, file megabytes, peak megabytes) tuples.
+
+    The peak should stay roughly the same as the contact files grow, since a MappedGraph only
+    keeps its people in memory and reads its contacts one block at a time. The memory is read
+    from /proc, so this only runs on Linux.
+
+    Preconditions:
+        - n >= 2
+    """
+    results = []
+    print('{:>10} {:>14} {:>14}'.format('contacts', 'file MB', 'peak MB'))
+
+    for per_person in contacts:
+        with tempfile.TemporaryDirectory() as directory:
+            _build_benchmark_store(directory, n, n * per_person // 2)
+            size = sum(os.path.getsize(os.path.join(directory, name))
+                       for name in ('indices.npy', 'weights.npy')) / 2 ** 20
+
+            # A new process starts with none of the memory this one has used
+            with ProcessPoolExecutor(max_workers=1,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                peak = executor.submit(_mapped_graph_peak, directory, ticks).result()
+
+        results.append((per_person, size, peak))
+        print('{:>10} {:>14.1f} {:>14.1f}'.format(per_person, size, peak))
+
+    return results
+
+
+def _build_benchmark_store(directory: str, n: int, num_contacts: int, seed: int = 0) -> None:
+    """Write an edge store to directory of n people and about num_contacts random contacts
+    between them, generated a chunk at a time.
+    """
+    people = CompactGraph()
+    people.add_vertices_bulk([str(i) for i in range(n)], ['P' + str(i) for i in range(n)],
+                             [30] * n, [0.5] * n)
+    builder = EdgeStoreBuilder(directory, people)
+    chunk_size = 10 ** 6
+
+    def chunks() -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        # The same seed gives the same chunks on both passes
+        rng = np.random.default_rng(seed)
+        for start in range(0, num_contacts, chunk_size):
+            pairs = rng.integers(0, n, size=(min(chunk_size, num_contacts - start), 2))
+            pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+            yield pairs[:, 0], pairs[:, 1]
+
+    for sources, targets in chunks():
+        builder.count(sources, targets)
+    for sources, targets in chunks():
+        builder.fill(sources, targets, np.full(len(sources), 0.5))
+    builder.finish()
+
+
+def _mapped_graph_peak(directory: str, ticks: int) -> float:
+    """Open the edge store at directory, recalculate its degrees and run ticks ticks of the
+    vectorized engine on it, and return the most megabytes of memory this process used beyond
+    what it used once the store was open.
+    """
+    with MappedGraph.open(directory) as graph:
+        before = _peak_memory()
+
+        n = graph.num_people()
+        sources = np.arange(0, n, max(1, n // 5))
+        graph.set_infected({graph.get_identifier(i) for i in sources.tolist()})
+        graph.recalculate_degrees()
+
+        engine = engines.VectorizedEngine(graph)
+        engine.infect_indexes(sources)
+        for _ in range(ticks):
+            engine.infect_indexes(engine.spread_indexes())
+
+    return (_peak_memory() - before) / 2 ** 10
+
+
+def _peak_memory() -> int:
+    """Return the most kilobytes of memory this process has used, as reported by Linux."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    raise ValueError('The peak memory of this process is not reported')
+
+
+if __name__ == '__main__':
+    benchmark_recalculate_degrees()
+    benchmark_engines()
+    benchmark_headless()
+    benchmark_mapped_graph()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['multiprocessing', 'os', 'random', 'tempfile', 'time', 'typing',
+                          'concurrent.futures', 'numpy', 'engines', 'compact_graph',
+                          'edge_store', 'simulation', 'social_graph'],
+        'max-line-length': 100,
+        'allowed-io': ['benchmark_recalculate_degrees', 'benchmark_engines',
+                       'benchmark_mapped_graph', '_peak_memory'],
+        'disable': ['E1136']
+    })
@@ -17,6 +17,11 @@ from functools import cache
 
 # DEGREES APART CONSTANTS
 INFECTED_COLOUR = (255, 0, 0)
+HEALTHY_COLOUR = (255, 255, 255)
+
+# COMPARTMENT CONSTANTS
+EXPOSED_COLOUR = (255, 165, 0)
+RECOVERED_COLOUR = (70, 130, 220)
 
 MIN_FILL = 0.95
 STRETCH = 0.6
@@ -35,7 +40,7 @@ def degrees_apart_get_colour(degrees_apart: Optional[int]) -> tuple[int, int, in
     """
     # Hard coded base case degree colours
     if degrees_apart is None:
-        return 255, 255, 255  # white
+        return HEALTHY_COLOUR  # white
     elif degrees_apart == 0:
         return INFECTED_COLOUR
 
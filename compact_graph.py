@@ -0,0 +1,810 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Compact Graph Module
+This module contains an array-backed version of the social graph, for contact networks too large to
+store as one Python object per person. People are numbered with dense integer indexes, their
+attributes are stored in typed NumPy columns, and contacts are stored in compressed sparse row
+(CSR) form.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+from __future__ import annotations
+from typing import Iterator, Mapping, Optional, Union
+import networkx as nx
+import numpy as np
+import colouring as colour
+from social_graph import Graph
+
+# The value stored in the degrees column for a degrees_apart of None
+NO_DEGREE = -1
+
+# The largest number of contact entries read at once by the scans that work one block of rows at
+# a time, which bounds the memory they use
+CSR_BLOCK_SIZE = 1 << 18
+
+
+class _PersonView:
+    """A lightweight view of one person in a CompactGraph, which can be used anywhere a _Person
+    object is read. Attributes are read from and written to the columns of the graph.
+
+    Instance Attributes:
+        - graph: The graph this person belongs to.
+        - index: The dense integer index of this person in graph.
+    """
+    __slots__ = ('graph', 'index')
+    graph: CompactGraph
+    index: int
+
+    def __init__(self, graph: CompactGraph, index: int) -> None:
+        """Initialize a view of the person at the given index of graph."""
+        self.graph = graph
+        self.index = index
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _PersonView) and other.graph is self.graph \
+            and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.graph), self.index))
+
+    def __repr__(self) -> str:
+        return '_PersonView({!r})'.format(self.identifier)
+
+    @property
+    def identifier(self) -> str:
+        """The unique identifier of the person."""
+        return self.graph.get_identifier(self.index)
+
+    @property
+    def name(self) -> str:
+        """The person's first and last name."""
+        return self.graph.get_name(self.index)
+
+    @property
+    def age(self) -> int:
+        """The person's age."""
+        return int(self.graph.ages[self.index])
+
+    @property
+    def severity_level(self) -> float:
+        """The severity of COVID-19 the person would experience if they develop the illness."""
+        return float(self.graph.severities[self.index])
+
+    @property
+    def infected(self) -> bool:
+        """True if the person has developed COVID-19, False otherwise."""
+        return bool(self.graph.infected[self.index])
+
+    @infected.setter
+    def infected(self, value: bool) -> None:
+        self.graph.infected[self.index] = value
+
+    @property
+    def degrees_apart(self) -> Optional[int]:
+        """The degree of separation between this person and an infected person."""
+        degree = int(self.graph.degrees[self.index])
+        return None if degree == NO_DEGREE else degree
+
+    @degrees_apart.setter
+    def degrees_apart(self, value: Optional[int]) -> None:
+        self.graph.degrees[self.index] = NO_DEGREE if value is None else value
+
+    @property
+    def neighbours(self) -> dict[_PersonView, float]:
+        """The people in this person's social circle, mapped to their contact level."""
+        indices, weights = self.graph.neighbour_indices(self.index)
+        return {_PersonView(self.graph, int(j)): float(w) for j, w in zip(indices, weights)}
+
+    def change_infection_status(self) -> None:
+        """Reverses the current infection status of the person."""
+        self.infected = not self.infected
+
+    def get_degree(self) -> int:
+        """Return smallest degree apart from an infected vertex. Raise ValueError if has not been
+        calculated yet.
+        """
+        if self.degrees_apart is not None:
+            return self.degrees_apart
+        raise ValueError
+
+    def reset_degree(self, zero: Optional[bool] = False) -> None:
+        """Resets the degrees_apart attribute to None to represent an uncalculated value.
+        If zero is true, set it to 0 instead.
+        """
+        self.degrees_apart = 0 if zero else None
+
+
+class _PersonTable(Mapping):
+    """A read-only mapping from person identifier to a _PersonView, created on demand so that
+    the graph never stores one Python object per person.
+    """
+    # Private Instance Attributes:
+    #     - _graph: The graph whose people this table maps.
+    _graph: CompactGraph
+
+    def __init__(self, graph: CompactGraph) -> None:
+        self._graph = graph
+
+    def __getitem__(self, identifier: str) -> _PersonView:
+        return _PersonView(self._graph, self._graph.get_index(identifier))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.get_identifiers())
+
+    def __len__(self) -> int:
+        return self._graph.num_people()
+
+    def __contains__(self, identifier: object) -> bool:
+        return identifier in self._graph.get_index_map()
+
+
+class _DegreeChanges(Mapping):
+    """A read-only mapping from the identifier of each person whose degrees_apart changed to
+    their new degree, stored as arrays so that no Python object is kept per person.
+    """
+    # Private Instance Attributes:
+    #     - _graph: The graph whose people changed.
+    #     - _indexes: The index of each person whose degree changed.
+    #     - _degrees: The new degree of each of those people, matching _indexes.
+    #     - _order: The positions of _indexes in sorted order, or None until a lookup needs them.
+    _graph: CompactGraph
+    _indexes: np.ndarray
+    _degrees: np.ndarray
+    _order: Optional[np.ndarray]
+
+    def __init__(self, graph: CompactGraph, indexes: np.ndarray) -> None:
+        self._graph = graph
+        self._indexes = indexes
+        self._degrees = graph.degrees[indexes]
+        self._order = None
+
+    def __getitem__(self, identifier: str) -> Optional[int]:
+        index = self._graph.get_index_map().get(identifier)
+        if index is not None:
+            if self._order is None:
+                self._order = np.argsort(self._indexes, kind='stable')
+            position = int(np.searchsorted(self._indexes, index, sorter=self._order))
+            if position < len(self._order) and self._indexes[self._order[position]] == index:
+                degree = int(self._degrees[self._order[position]])
+                return None if degree == NO_DEGREE else degree
+        raise KeyError(identifier)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._graph.get_identifier(i) for i in self._indexes.tolist())
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+
+class CompactGraph(Graph):
+    """ A weighted graph of people stored in typed arrays, with the same public methods as Graph.
+
+    Edges added with add_edge or add_edges_bulk are buffered, and merged into the CSR arrays the
+    next time the contacts are read.
+
+    Instance Attributes:
+        - ages: The age column, indexed by person index.
+        - severities: The severity level column, indexed by person index.
+        - infected: The infection status column, indexed by person index.
+        - degrees: The degrees_apart column, indexed by person index, where NO_DEGREE stands for
+          an uncalculated degree.
+
+    Representation Invariants:
+        - len(self._ids) == len(self._index) == len(self._names)
+        - set(self._name_index) == set(self._names)
+        - all(self._index[self._ids[i]] == i for i in range(len(self._ids)))
+        - self._indptr[-1] == len(self._indices) == len(self._weights)
+    """
+    ages: np.ndarray
+    severities: np.ndarray
+    infected: np.ndarray
+    degrees: np.ndarray
+    # Private Instance Attributes:
+    #     - _ids: The identifier of each person, in index order.
+    #     - _index: Maps person identifier to index.
+    #     - _names: The name of each person, in index order.
+    #     - _size: The number of people; the columns may have spare capacity beyond it.
+    #     - _indptr, _indices, _weights:
+    #         The contacts in CSR form. The neighbours of person i are
+    #         _indices[_indptr[i]:_indptr[i + 1]], with matching contact levels in _weights.
+    #     - _pending: Directed edges (sources, targets, weights) not yet merged into the CSR arrays.
+    #     - _component_cache:
+    #         The version the component labels were calculated at, and the label of each person,
+    #         which is the smallest index in their component. None if never calculated.
+    _ids: list[str]
+    _index: dict[str, int]
+    _names: list[str]
+    _size: int
+    _indptr: np.ndarray
+    _indices: np.ndarray
+    _weights: np.ndarray
+    _pending: list[tuple[np.ndarray, np.ndarray, np.ndarray]]
+    _component_cache: Optional[tuple[int, np.ndarray]]
+
+    def __init__(self, capacity: int = 16) -> None:
+        """ Initialize an empty graph with room for capacity people before its columns grow."""
+        super().__init__()
+        self._ids = []
+        self._index = {}
+        self._names = []
+        self._size = 0
+        self.ages = np.zeros(capacity, dtype=np.int16)
+        self.severities = np.zeros(capacity, dtype=np.float32)
+        self.infected = np.zeros(capacity, dtype=np.bool_)
+        self.degrees = np.full(capacity, NO_DEGREE, dtype=np.int32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._weights = np.zeros(0, dtype=np.float32)
+        self._pending = []
+        self._component_cache = None
+        self._people = _PersonTable(self)
+
+    @staticmethod
+    def from_graph(graph: Graph) -> CompactGraph:
+        """Return a CompactGraph containing the same people, contacts, infection statuses and
+        degrees as graph.
+
+        >>> graph = Graph()
+        >>> graph.add_vertex('F5H9A8', 'Bob', 60, 0.9)
+        >>> graph.add_vertex('F7H8T6', 'Jim', 60, 0.9)
+        >>> graph.add_edge('F5H9A8', 'F7H8T6', 0.5)
+        >>> compact = CompactGraph.from_graph(graph)
+        >>> compact.get_weight('F7H8T6', 'F5H9A8')
+        0.5
+        """
+        people = list(graph.get_people().values())
+        compact = CompactGraph(capacity=len(people))
+        compact.add_vertices_bulk([p.identifier for p in people], [p.name for p in people],
+                                  [p.age for p in people], [p.severity_level for p in people])
+        compact.infected[:len(people)] = [p.infected for p in people]
+        compact.degrees[:len(people)] = [NO_DEGREE if p.degrees_apart is None
+                                         else p.degrees_apart for p in people]
+
+        index = compact.get_index_map()
+        sources, targets, weights = [], [], []
+        for p in people:
+            for u, weight in p.neighbours.items():
+                sources.append(index[p.identifier])
+                targets.append(index[u.identifier])
+                weights.append(weight)
+
+        # Each contact is already stored in both directions, so no mirroring is needed.
+        compact.add_edges_bulk(np.array(sources, dtype=np.int32),
+                               np.array(targets, dtype=np.int32),
+                               np.array(weights, dtype=np.float32), symmetric=False)
+        return compact
+
+    @staticmethod
+    def from_arrays(identifiers: list[str], names: list[str], columns: dict[str, np.ndarray],
+                    csr: tuple[np.ndarray, np.ndarray, np.ndarray]) -> CompactGraph:
+        """Return a CompactGraph built directly from its columns and CSR contact arrays, without
+        buffering or sorting any edges.
+
+        columns maps 'ages', 'severities' and optionally 'infected' to the matching column.
+
+        Preconditions:
+            - len(identifiers) == len(names) == len(csr[0]) - 1
+            - each row of csr is sorted by neighbour index, and lists each neighbour once
+            - every contact appears in the rows of both of its people
+        """
+        compact = CompactGraph(capacity=len(identifiers))
+        compact.add_vertices_bulk(identifiers, names, columns['ages'], columns['severities'])
+        if 'infected' in columns:
+            compact.infected[:len(identifiers)] = columns['infected']
+
+        compact._indptr = np.asarray(csr[0], dtype=np.int64)
+        compact._indices = np.asarray(csr[1], dtype=np.int32)
+        compact._weights = np.asarray(csr[2], dtype=np.float32)
+        return compact
+
+    # ACCESSOR METHODS
+    def num_people(self) -> int:
+        """Return the number of people in this graph."""
+        return self._size
+
+    def get_identifiers(self) -> list[str]:
+        """Return the identifier of every person, in index order."""
+        return self._ids
+
+    def get_index_map(self) -> dict[str, int]:
+        """Return the dictionary mapping each person identifier to its index."""
+        return self._index
+
+    def get_index(self, identifier: str) -> int:
+        """Return the index of the person with the given identifier."""
+        return self._index[identifier]
+
+    def get_identifier(self, index: int) -> str:
+        """Return the identifier of the person with the given index."""
+        return self._ids[index]
+
+    def get_name(self, index: int) -> str:
+        """Return the name of the person with the given index."""
+        return self._names[index]
+
+    def to_csr(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the (indptr, indices, weights) arrays of this graph's contacts in CSR form.
+
+        The arrays are shared with this graph and must not be modified.
+        """
+        self._merge_pending()
+        return self._indptr, self._indices, self._weights
+
+    def neighbour_indices(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the indexes of the neighbours of the person at index, and the matching contact
+        levels.
+        """
+        indptr, indices, weights = self.to_csr()
+        start, end = indptr[index], indptr[index + 1]
+        return indices[start:end], weights[start:end]
+
+    def get_neighbours(self, item: str) -> list[_PersonView]:
+        """Return the neighbours of the item"""
+        indices, _ = self.neighbour_indices(self._index[item])
+        return [_PersonView(self, int(j)) for j in indices]
+
+    def get_weight(self, person1: str, person2: str) -> float:
+        """Return the weight between person1 and person2. Raise KeyError if they are not
+        adjacent.
+        """
+        weight = self._find_weight(self._index[person1], self._index[person2])
+        if weight is None:
+            raise KeyError(person2)
+        return weight
+
+    def get_contact_level(self, identifier1: str, identifier2: str) -> float:
+        """Return the level of contact between the given items (the weight of their edge).
+
+        Return 0 if identifier1 and identifier2 are not adjacent.
+        """
+        weight = self._find_weight(self._index[identifier1], self._index[identifier2])
+        return 0 if weight is None else weight
+
+    def _find_weight(self, index1: int, index2: int) -> Optional[float]:
+        """Return the weight of the edge between the given indexes, or None if there is none.
+
+        Each row of the CSR arrays is sorted by neighbour index, so this is a binary search.
+        """
+        indices, weights = self.neighbour_indices(index1)
+        position = int(np.searchsorted(indices, index2))
+        if position < len(indices) and indices[position] == index2:
+            return float(weights[position])
+        return None
+
+    def neighbourhood(self, sources: Union[str, set[str]],
+                      max_hops: int) -> dict[str, tuple[int, Optional[str], float]]:
+        """Return everyone within max_hops contacts of the given person or people, as in
+        Graph.neighbourhood.
+
+        Each hop is expanded with array operations over the CSR rows of the people reached by the
+        previous hop, so the cost depends only on the size of the neighbourhood.
+        """
+        if isinstance(sources, str):
+            sources = {sources}
+
+        indptr, indices, weights = self.to_csr()
+        reached = {self._index[identifier]: (0, None, 0) for identifier in sources}
+        frontier = np.fromiter(reached, dtype=np.int64, count=len(reached))
+
+        for hops in range(1, max_hops + 1):
+            positions = csr_edge_positions(indptr, frontier)
+            parents = np.repeat(frontier, indptr[frontier + 1] - indptr[frontier])
+            targets = np.asarray(indices[positions], dtype=np.int64)
+            contact_levels = np.asarray(weights[positions])
+
+            seen = np.fromiter(reached, dtype=np.int64, count=len(reached))
+            new = ~np.isin(targets, seen)
+            parents, targets, contact_levels = parents[new], targets[new], contact_levels[new]
+            if len(targets) == 0:
+                break
+
+            # For each person reached, keep the parent with the highest contact level
+            order = np.lexsort((-contact_levels, targets))
+            targets, parents, contact_levels = \
+                targets[order], parents[order], contact_levels[order]
+            first = np.r_[True, targets[1:] != targets[:-1]]
+
+            frontier = targets[first]
+            for target, parent, contact_level in zip(frontier.tolist(), parents[first].tolist(),
+                                                     contact_levels[first].tolist()):
+                reached[target] = (hops, self._ids[parent], contact_level)
+
+        return {self._ids[index]: found for index, found in reached.items()}
+
+    def component_labels(self) -> np.ndarray:
+        """Return the connected component label of each person, by index. Each label is the
+        smallest index in its component. The labels are recalculated only after the graph changes.
+        """
+        if self._component_cache is None or self._component_cache[0] != self._version:
+            indptr, indices, _ = self.to_csr()
+            self._component_cache = (self._version,
+                                     csr_component_labels(indptr, indices, self._size))
+        return self._component_cache[1]
+
+    def component_of(self, identifier: str) -> str:
+        """Return the id of the connected component containing the person with the given
+        identifier, which is the identifier of the first person added to the component.
+        """
+        return self._ids[int(self.component_labels()[self._index[identifier]])]
+
+    def component_sizes(self) -> dict[str, int]:
+        """Return a dictionary mapping the id of each connected component to its number of people.
+        """
+        labels, sizes = np.unique(self.component_labels(), return_counts=True)
+        return {self._ids[label]: size for label, size in zip(labels.tolist(), sizes.tolist())}
+
+    def component_members(self, component: str) -> list[str]:
+        """Return the identifiers of the people in the connected component with the given id."""
+        members = np.flatnonzero(self.component_labels() == self._index[component])
+        return [self._ids[i] for i in members.tolist()]
+
+    def infected_components(self) -> set[str]:
+        """Return the ids of the connected components that contain at least one infected person.
+        """
+        labels = np.unique(self.component_labels()[self.infected[:self._size]])
+        return {self._ids[label] for label in labels.tolist()}
+
+    # MUTATION METHODS
+    def add_vertex(self, identifier: str, name: str, age: int, severity_level: float) -> None:
+        """Add a vertex with the given identifier, name, age, and severity level to this graph.
+        """
+        if identifier not in self._index:
+            self.add_vertices_bulk([identifier], [name], [age], [severity_level])
+
+    def add_vertices_bulk(self, identifiers: list[str], names: list[str], ages: list[int],
+                          severity_levels: list[float]) -> None:
+        """Add a vertex for each identifier, with the matching name, age and severity level.
+
+        Preconditions:
+            - len(identifiers) == len(names) == len(ages) == len(severity_levels)
+            - identifiers contains no duplicates, and none of them are already in this graph
+        """
+        start, end = self._size, self._size + len(identifiers)
+        self._reserve(end)
+
+        self._index.update(zip(identifiers, range(start, end)))
+        for name, identifier in zip(names, identifiers):
+            self._name_index.setdefault(name, identifier)
+        self._ids.extend(identifiers)
+        self._names.extend(names)
+        self.ages[start:end] = ages
+        self.severities[start:end] = severity_levels
+        self._size = end
+        self._version += 1
+
+    def add_edge(self, identifier1: str, identifier2: str, contact_level: float) -> None:
+        """Add an edge between two people with the given identifiers in this graph, with the given
+        weight, representing their level of contact.
+
+        Preconditions:
+            - identifier1 != identifier2
+        """
+        self.add_edges_bulk(np.array([self._index[identifier1]], dtype=np.int32),
+                            np.array([self._index[identifier2]], dtype=np.int32),
+                            np.array([contact_level], dtype=np.float32))
+
+    def add_edges_bulk(self, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+                       symmetric: bool = True) -> None:
+        """Add an edge between each pair of people at the matching positions of sources and
+        targets (given by index), with the matching weight. If symmetric is False, the edges are
+        only added in the given direction, and the caller is responsible for adding both.
+
+        As in add_edge, adding an edge that already exists replaces its weight.
+
+        Preconditions:
+            - len(sources) == len(targets) == len(weights)
+            - all(sources[i] != targets[i] for i in range(len(sources)))
+        """
+        self._pending.append((sources, targets, weights))
+        if symmetric:
+            self._pending.append((targets, sources, weights))
+        self._version += 1
+
+    def set_infected(self, init_infected: set[str]) -> None:
+        """Sets the initial infected people for the graph, given their ids."""
+        self.infected[[self._index[identifier] for identifier in init_infected]] = True
+
+    def set_recovered(self, recovered: set[str]) -> None:
+        """Sets the people with the given ids as no longer infected."""
+        self.infected[[self._index[identifier] for identifier in recovered]] = False
+
+    def recalculate_degrees(self) -> Mapping[str, Optional[int]]:
+        """Recalculates the degrees_apart attribute for each connected person to an infected, and
+        return the changed degrees, as in Graph.recalculate_degrees.
+
+        The changed degrees are a read-only mapping backed by arrays, so that recalculating the
+        degrees of a large graph never creates a Python object per person.
+
+        >>> graph = CompactGraph()
+        >>> graph.add_vertices_bulk(['A', 'B', 'C'], ['A', 'B', 'C'], [20] * 3, [0.5] * 3)
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> graph.set_infected({'A'})
+        >>> graph.recalculate_degrees() == {'A': 0, 'B': 1}
+        True
+        """
+        previous = self.degrees[:self._size].copy()
+        self._reset_degrees()
+        self._relax_degrees(np.flatnonzero(self.infected[:self._size]))
+
+        return _DegreeChanges(self, np.flatnonzero(self.degrees[:self._size] != previous))
+
+    def update_degrees(self, newly_infected: set[str]) -> Mapping[str, int]:
+        """Update the degrees_apart attribute of each person after the people with the given
+        identifiers have become infected, and return the changed degrees, as in
+        Graph.update_degrees and recalculate_degrees.
+        """
+        return _DegreeChanges(self, self._relax_degrees(np.array(
+            [self._index[identifier] for identifier in newly_infected], dtype=np.int64)))
+
+    def positive_contact_counts(self) -> np.ndarray:
+        """Return the number of contacts of each person with a contact level above 0, by index.
+
+        The contacts are read one block of rows at a time.
+
+        >>> graph = CompactGraph()
+        >>> graph.add_vertices_bulk(['A', 'B', 'C'], ['A', 'B', 'C'], [20] * 3, [0.5] * 3)
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> graph.add_edge('A', 'C', 0.0)
+        >>> graph.positive_contact_counts().tolist()
+        [1, 1, 0]
+        """
+        indptr, _, weights = self.to_csr()
+        counts = np.zeros(self._size, dtype=np.int32)
+        for start, end in csr_row_ranges(indptr[:self._size + 1]):
+            low = indptr[start]
+            # The number of positive weights before each row start in the block
+            positive = np.r_[0, np.cumsum(weights[low:indptr[end]] > 0)]
+            offsets = indptr[start:end + 1] - low
+            counts[start:end] = positive[offsets[1:]] - positive[offsets[:-1]]
+        return counts
+
+    def contact_blocks(self, rows: np.ndarray) -> Iterator[np.ndarray]:
+        """Yield the given rows in consecutive groups with at most CSR_BLOCK_SIZE contacts in
+        total, or one row where a single row has more, so that callers read the contacts of one
+        group at a time.
+        """
+        yield from csr_row_blocks(self.to_csr()[0], rows)
+
+    def _relax_degrees(self, sources: np.ndarray) -> np.ndarray:
+        """Set the degree of every person in sources to 0, and lower the degree of every other
+        person to their distance from sources wherever that is smaller. Return the indexes of the
+        people whose degree changed, in the order they were reached.
+
+        This is a breadth-first search that expands one whole level at a time with array
+        operations, reading the contacts of one block of the level at a time.
+        """
+        indptr, indices, _ = self.to_csr()
+        degrees = self.degrees
+
+        frontier = np.unique(sources[degrees[sources] != 0])
+        degrees[frontier] = 0
+        levels = [frontier]
+        level = 0
+
+        while len(frontier) > 0:
+            level += 1
+            reached_blocks = [np.zeros(0, dtype=np.int64)]
+            for block in self.contact_blocks(frontier):
+                reached = indices[csr_edge_positions(indptr, block)]
+                current = degrees[reached]
+                # People lowered by an earlier block of this level are left out here
+                reached = np.unique(reached[(current == NO_DEGREE) | (current > level)])
+                degrees[reached] = level
+                reached_blocks.append(reached)
+            frontier = np.concatenate(reached_blocks)
+            levels.append(frontier)
+
+        # Each person is lowered at most once, on the level of their new degree
+        return np.concatenate(levels).astype(np.int64)
+
+    def _reset_degrees(self) -> None:
+        """ Resets all degrees_apart attributes in graph to be None
+        """
+        self.degrees[:self._size] = NO_DEGREE
+
+    # NETWORKX CONVERSION METHODS
+    def node_colours(self, with_degrees: bool = False) -> list[str]:
+        """Return the colour of each node of self.to_nx(), in node order, as in
+        Graph.node_colours.
+        """
+        node_indices = self._nx_topology()[1]
+
+        if with_degrees:
+            return [colour.rgb_to_str(colour.degrees_apart_get_colour(
+                None if degree == NO_DEGREE else degree))
+                for degree in self.degrees[node_indices].tolist()]
+        else:
+            infected_colour = colour.rgb_to_str(colour.INFECTED_COLOUR)
+            healthy_colour = colour.rgb_to_str(colour.HEALTHY_COLOUR)
+            return [infected_colour if infected else healthy_colour
+                    for infected in self.infected[node_indices].tolist()]
+
+    def node_identifiers(self) -> list[str]:
+        """Return the identifier of each node of self.to_nx(), in node order."""
+        return [self._ids[i] for i in self._nx_topology()[1].tolist()]
+
+    def _build_nx_topology(self) -> tuple[nx.Graph, np.ndarray]:
+        """Return a new networkx Graph with a node for each person's name and an edge for each
+        contact, and the index of the person drawn as each node, in node order.
+        """
+        # People with the same name share a node, which is drawn as the last of them
+        node_indices = dict(zip(self._names, range(self._size)))
+
+        indptr, indices, _ = self.to_csr()
+        sources = np.repeat(np.arange(self._size), np.diff(indptr))
+        one_way = sources < indices
+
+        names = self._names
+        graph_nx = nx.Graph()
+        graph_nx.add_nodes_from(node_indices)
+        graph_nx.add_edges_from((names[i], names[j]) for i, j in
+                                zip(sources[one_way].tolist(), indices[one_way].tolist()))
+
+        return graph_nx, np.fromiter(node_indices.values(), dtype=np.int64,
+                                     count=len(node_indices))
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the person columns so that they can hold at least capacity people."""
+        if capacity <= len(self.ages):
+            return
+        new_capacity = max(capacity, 2 * len(self.ages))
+        self.ages = _grow(self.ages, new_capacity, 0)
+        self.severities = _grow(self.severities, new_capacity, 0)
+        self.infected = _grow(self.infected, new_capacity, False)
+        self.degrees = _grow(self.degrees, new_capacity, NO_DEGREE)
+
+    def _merge_pending(self) -> None:
+        """Merge the buffered edges into the CSR arrays, so that each row is sorted by neighbour
+        index and, where an edge was added more than once, the most recent weight is kept.
+        """
+        n = self._size
+        if not self._pending and len(self._indptr) == n + 1:
+            return
+
+        # Rows for people added since the last merge are empty
+        old_counts = np.zeros(n, dtype=np.int64)
+        old_counts[:len(self._indptr) - 1] = np.diff(self._indptr)
+        old_sources = np.repeat(np.arange(n, dtype=np.int64), old_counts)
+
+        sources = np.concatenate([old_sources] + [np.asarray(p[0], dtype=np.int64)
+                                                  for p in self._pending])
+        targets = np.concatenate([self._indices] + [np.asarray(p[1], dtype=np.int32)
+                                                    for p in self._pending])
+        weights = np.concatenate([self._weights] + [np.asarray(p[2], dtype=np.float32)
+                                                    for p in self._pending])
+        self._pending = []
+
+        # Keep the last occurrence of each (source, target) pair, in sorted order
+        keys = sources * max(n, 1) + targets
+        _, last_in_reverse = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - last_in_reverse
+
+        self._indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources[keep], minlength=n), out=self._indptr[1:])
+        self._indices = targets[keep]
+        self._weights = weights[keep]
+
+
+def unique_indexes(indexes: np.ndarray) -> np.ndarray:
+    """Return the distinct values of the given array of indexes, in increasing order, as
+    np.unique does.
+
+    np.unique finds the distinct values of an integer array by hashing, which is several times
+    slower than sorting them for the arrays of people the engines handle on each tick.
+
+    >>> unique_indexes(np.array([3, 1, 3, 0])).tolist()
+    [0, 1, 3]
+    """
+    indexes = np.sort(indexes)
+    keep = np.ones(len(indexes), dtype=np.bool_)
+    np.not_equal(indexes[1:], indexes[:-1], out=keep[1:])
+    return indexes[keep]
+
+
+def csr_edge_positions(indptr: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Return the positions in the CSR indices array of every edge leaving the given rows.
+
+    >>> indptr = np.array([0, 2, 2, 5])
+    >>> csr_edge_positions(indptr, np.array([0, 2])).tolist()
+    [0, 1, 2, 3, 4]
+    """
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    # For each row, shift a running arange back so that it begins at that row's start
+    shifts = starts - (np.cumsum(counts) - counts)
+    return np.repeat(shifts, counts) + np.arange(int(counts.sum()), dtype=np.int64)
+
+
+def csr_row_blocks(indptr: np.ndarray, rows: np.ndarray,
+                   block_size: int = CSR_BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """Yield the given rows of a CSR graph in consecutive groups with at most block_size edges in
+    total, or one row where a single row has more.
+
+    >>> indptr = np.array([0, 2, 2, 5, 6])
+    >>> [block.tolist() for block in csr_row_blocks(indptr, np.array([0, 1, 2, 3]), 3)]
+    [[0, 1], [2], [3]]
+    """
+    totals = np.cumsum(indptr[rows + 1] - indptr[rows])
+
+    start = 0
+    while start < len(rows):
+        before = int(totals[start - 1]) if start > 0 else 0
+        end = int(np.searchsorted(totals, before + block_size, side='right'))
+        end = max(end, start + 1)
+        yield rows[start:end]
+        start = end
+
+
+def csr_row_ranges(indptr: np.ndarray,
+                   block_size: int = CSR_BLOCK_SIZE) -> Iterator[tuple[int, int]]:
+    """Yield the (start, end) ranges of consecutive rows of a CSR graph, covering every row, with
+    at most block_size edges in each range, or one row where a single row has more.
+
+    >>> list(csr_row_ranges(np.array([0, 2, 2, 5, 6]), 3))
+    [(0, 2), (2, 3), (3, 4)]
+    """
+    n = len(indptr) - 1
+    start = 0
+    while start < n:
+        end = int(np.searchsorted(indptr, indptr[start] + block_size, side='right')) - 1
+        end = min(max(end, start + 1), n)
+        yield start, end
+        start = end
+
+
+def csr_component_labels(indptr: np.ndarray, indices: np.ndarray, n: int) -> np.ndarray:
+    """Return the connected component label of each of the n rows of a CSR graph, where each
+    label is the smallest row in its component.
+
+    Every component's rows start as a tree of their own, and each round hooks the root of every
+    tree onto the smallest root it has a contact with, then flattens the trees, so the number of
+    rounds grows with the logarithm of the component sizes rather than their diameter.
+
+    >>> indptr = np.array([0, 1, 2, 3, 4, 4])
+    >>> indices = np.array([3, 2, 1, 0])
+    >>> csr_component_labels(indptr, indices, 5).tolist()
+    [0, 1, 1, 0, 4]
+    """
+    sources = np.repeat(np.arange(n), np.diff(indptr[:n + 1]))
+    targets = np.asarray(indices, dtype=np.int64)
+    labels = np.arange(n)
+
+    while True:
+        source_roots, target_roots = labels[sources], labels[targets]
+        hook = target_roots < source_roots
+        if not hook.any():
+            return labels
+
+        np.minimum.at(labels, source_roots[hook], target_roots[hook])
+
+        # Point every row directly at its root
+        parents = labels[labels]
+        while not np.array_equal(parents, labels):
+            labels = parents
+            parents = labels[labels]
+
+
+def _grow(column: np.ndarray, capacity: int, fill: object) -> np.ndarray:
+    """Return a copy of column extended to the given capacity with fill."""
+    grown = np.full(capacity, fill, dtype=column.dtype)
+    grown[:len(column)] = column
+    return grown
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['networkx', 'numpy', 'colouring', 'social_graph'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,281 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Compartments Module
+This module contains an infection engine in which people move through the compartments of an
+SEIR or SIRS model, instead of staying infected forever:
+    - Susceptible people can be exposed by a contact with an infectious person, with probability
+      equal to the contact level between them, once per tick.
+    - Exposed people carry the infection but do not spread it until their latent period is over.
+    - Infectious people spread the infection until their infectious period is over.
+    - Recovered people cannot be exposed. In the SIRS model they become susceptible again after
+      their immune period; in the SEIR model they stay recovered. Immunised people are recovered
+      for good in both models.
+
+Each person's periods depend on their attributes: the infectious period is scaled by
+0.5 + severity_level, and the immune period by REFERENCE_AGE / age, so more severe cases stay
+infectious longer and older people lose their immunity sooner.
+
+The compartments, the ticks spent in them and the periods are kept in arrays indexed like the
+people of a CompactGraph, and every tick is a handful of array operations.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+from __future__ import annotations
+from typing import Optional, Union
+import numpy as np
+import colouring as colour
+import seeding
+from compact_graph import CompactGraph, csr_edge_positions, unique_indexes
+from social_graph import Graph
+
+# The compartments, as stored in CompartmentEngine.state
+SUSCEPTIBLE = 0
+EXPOSED = 1
+INFECTIOUS = 2
+RECOVERED = 3
+
+# The colour of each compartment, as shown in a simulation
+COMPARTMENT_COLOURS = {SUSCEPTIBLE: colour.HEALTHY_COLOUR, EXPOSED: colour.EXPOSED_COLOUR,
+                       INFECTIOUS: colour.INFECTED_COLOUR, RECOVERED: colour.RECOVERED_COLOUR}
+
+# The default lengths of each period, in ticks, before they are scaled for each person
+DEFAULT_LATENT_TICKS = 1.0
+DEFAULT_INFECTIOUS_TICKS = 3.0
+DEFAULT_IMMUNE_TICKS = 8.0
+
+# The age at which the immune period is not scaled
+REFERENCE_AGE = 40
+
+
+class CompartmentEngine:
+    """An infection engine in which people move from susceptible to exposed, infectious and
+    recovered, and in the SIRS model back to susceptible.
+
+    It is used in the same two steps per tick as the engines in the engines module, where
+    infect exposes people and spread returns the people exposed on this tick, before moving
+    everyone whose period is over on to their next compartment. The people who recovered since the
+    last call to pop_recovered are kept, so their graph can mark them as no longer infected.
+
+    Graphs that are not already a CompactGraph are frozen into one when the engine is created.
+
+    Instance Attributes:
+        - state: The compartment of each person, by index.
+        - time_in_state: The number of ticks each person, by index, has spent in their compartment.
+        - latent_periods: The number of ticks each person, by index, stays exposed.
+        - infectious_periods: The number of ticks each person, by index, stays infectious.
+        - immune_periods: The number of ticks each person, by index, stays recovered, or None in
+        the SEIR model, where recovery is permanent.
+
+    Representation Invariants:
+        - self.state.dtype == np.int8
+        - all(s in {SUSCEPTIBLE, EXPOSED, INFECTIOUS, RECOVERED} for s in self.state.tolist())
+    """
+    state: np.ndarray
+    time_in_state: np.ndarray
+    latent_periods: np.ndarray
+    infectious_periods: np.ndarray
+    immune_periods: Optional[np.ndarray]
+    # Private Instance Attributes:
+    #     - _compact: The graph the infection spreads over, in compact form.
+    #     - _immune: Whether each person, by index, was immunised and stays recovered for good.
+    #     - _recovered: The indexes of the people who recovered since pop_recovered was last called.
+    #     - _rng: The random number generator used for every infection trial.
+    _compact: CompactGraph
+    _immune: np.ndarray
+    _recovered: list[np.ndarray]
+    _rng: np.random.Generator
+
+    def __init__(self, graph: Graph, seed: Union[None, int, np.random.Generator] = None,
+                 latent_ticks: float = DEFAULT_LATENT_TICKS,
+                 infectious_ticks: float = DEFAULT_INFECTIOUS_TICKS,
+                 immune_ticks: Optional[float] = None) -> None:
+        """Initialize an engine for graph, with everybody susceptible. If immune_ticks is None,
+        the engine follows the SEIR model, otherwise the SIRS model. If seed is given, the
+        infection trials are reproducible.
+
+        Preconditions:
+            - latent_ticks >= 0
+            - infectious_ticks > 0
+            - immune_ticks is None or immune_ticks > 0
+        """
+        self._compact = graph if isinstance(graph, CompactGraph) else graph.freeze()
+        n = self._compact.num_people()
+
+        self.state = np.full(n, SUSCEPTIBLE, dtype=np.int8)
+        self.time_in_state = np.zeros(n, dtype=np.int16)
+
+        ages = np.maximum(self._compact.ages[:n], 1).astype(np.float32)
+        severities = self._compact.severities[:n]
+        self.latent_periods = np.full(n, latent_ticks, dtype=np.float32)
+        self.infectious_periods = (infectious_ticks * (0.5 + severities)).astype(np.float32)
+        self.immune_periods = None if immune_ticks is None \
+            else (immune_ticks * REFERENCE_AGE / ages).astype(np.float32)
+
+        self._immune = np.zeros(n, dtype=np.bool_)
+        self._recovered = []
+        self._rng = seeding.numpy_rng(seed)
+
+    def infect(self, identifiers: set[str]) -> set[str]:
+        """Expose the susceptible people with the given identifiers, and return their identifiers.
+        """
+        return self.to_identifiers(self.infect_indexes(self.to_indexes(identifiers)))
+
+    def immunise(self, identifiers: set[str]) -> None:
+        """Move the susceptible people with the given identifiers to recovered for good, even in
+        the SIRS model.
+        """
+        self.immunise_indexes(self.to_indexes(identifiers))
+
+    def spread(self) -> set[str]:
+        """Return the identifiers of the susceptible people exposed by an infectious person on
+        this tick, then move on everyone whose period is over.
+        """
+        return self.to_identifiers(self.spread_indexes())
+
+    def is_settled(self) -> bool:
+        """Return whether nobody will ever change compartment again, since nobody carries the
+        infection and, in the SIRS model, nobody is waiting to lose their immunity.
+        """
+        carriers = np.any((self.state == EXPOSED) | (self.state == INFECTIOUS))
+        waiting = self.immune_periods is not None \
+            and np.any((self.state == RECOVERED) & ~self._immune)
+        return not carriers and not waiting
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the state of this engine as a dictionary of arrays, which set_state can restore
+        on an engine for the same graph.
+        """
+        state = {'state': self.state.copy(),
+                 'time_in_state': self.time_in_state.copy(),
+                 'latent_periods': self.latent_periods.copy(),
+                 'infectious_periods': self.infectious_periods.copy(),
+                 'immune': self._immune.copy(),
+                 'recovered': np.concatenate(self._recovered) if self._recovered
+                 else np.zeros(0, dtype=np.int64),
+                 'rng_state': np.array(seeding.get_rng_state(self._rng))}
+        if self.immune_periods is not None:
+            state['immune_periods'] = self.immune_periods.copy()
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state of this engine from a dictionary returned by get_state."""
+        self.state = state['state'].copy()
+        self.time_in_state = state['time_in_state'].copy()
+        self.latent_periods = state['latent_periods'].copy()
+        self.infectious_periods = state['infectious_periods'].copy()
+        self.immune_periods = state['immune_periods'].copy() if 'immune_periods' in state \
+            else None
+        self._immune = state['immune'].copy()
+        self._recovered = [state['recovered'].copy()]
+        seeding.set_rng_state(self._rng, str(state['rng_state']))
+
+    def pop_recovered(self) -> set[str]:
+        """Return the identifiers of the people who recovered since this method was last called.
+        """
+        return self.to_identifiers(self.pop_recovered_indexes())
+
+    def pop_recovered_indexes(self) -> np.ndarray:
+        """Return the indexes of the people who recovered since this method or pop_recovered was
+        last called.
+        """
+        if not self._recovered:
+            return np.zeros(0, dtype=np.int64)
+        recovered = np.concatenate(self._recovered)
+        self._recovered = []
+        return recovered
+
+    def counts(self) -> dict[int, int]:
+        """Return a dictionary mapping each compartment to the number of people in it."""
+        totals = np.bincount(self.state, minlength=RECOVERED + 1)
+        return {compartment: int(totals[compartment])
+                for compartment in (SUSCEPTIBLE, EXPOSED, INFECTIOUS, RECOVERED)}
+
+    def node_colours(self, identifiers: list[str]) -> list[str]:
+        """Return the colour of the compartment of each of the people with the given identifiers,
+        in order.
+        """
+        index = self._compact.get_index_map()
+        colours = {compartment: colour.rgb_to_str(rgb)
+                   for compartment, rgb in COMPARTMENT_COLOURS.items()}
+        return [colours[self.state[index[identifier]]] for identifier in identifiers]
+
+    def infect_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Expose the susceptible people at the given indexes, and return their indexes."""
+        newly_exposed = unique_indexes(indexes[self.state[indexes] == SUSCEPTIBLE])
+        self.state[newly_exposed] = EXPOSED
+        self.time_in_state[newly_exposed] = 0
+        return newly_exposed
+
+    def immunise_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Move the susceptible people at the given indexes to recovered for good, and return
+        their indexes.
+        """
+        newly_immune = unique_indexes(indexes[self.state[indexes] == SUSCEPTIBLE])
+        self.state[newly_immune] = RECOVERED
+        self.time_in_state[newly_immune] = 0
+        self._immune[newly_immune] = True
+        return newly_immune
+
+    def spread_indexes(self) -> np.ndarray:
+        """Return the indexes of the susceptible people exposed by an infectious person on this
+        tick, then move on everyone whose period is over.
+        """
+        indptr, indices, weights = self._compact.to_csr()
+
+        # Gather every contact of an infectious person with a susceptible person, and try them all
+        positions = csr_edge_positions(indptr, np.flatnonzero(self.state == INFECTIOUS))
+        positions = positions[self.state[indices[positions]] == SUSCEPTIBLE]
+        trials = self._rng.random(len(positions)) < weights[positions]
+
+        exposed = unique_indexes(indices[positions[trials]])
+        self._advance()
+        return exposed
+
+    def _advance(self) -> None:
+        """Add a tick to everyone's time in their compartment, and move everyone whose period is
+        over on to their next compartment.
+        """
+        self.time_in_state[self.state != SUSCEPTIBLE] += 1
+
+        # Every transition is found before any is made, so nobody moves twice in one tick
+        incubated = (self.state == EXPOSED) & (self.time_in_state >= self.latent_periods)
+        recovered = (self.state == INFECTIOUS) & (self.time_in_state >= self.infectious_periods)
+        if self.immune_periods is not None:
+            susceptible = (self.state == RECOVERED) & (self.time_in_state >= self.immune_periods) \
+                & ~self._immune
+            self.state[susceptible] = SUSCEPTIBLE
+            self.time_in_state[susceptible] = 0
+
+        self.state[incubated] = INFECTIOUS
+        self.state[recovered] = RECOVERED
+        self.time_in_state[incubated | recovered] = 0
+        self._recovered.append(np.flatnonzero(recovered))
+
+    def to_indexes(self, identifiers: set[str]) -> np.ndarray:
+        """Return the indexes of the people with the given identifiers."""
+        index = self._compact.get_index_map()
+        return np.fromiter((index[identifier] for identifier in identifiers), dtype=np.int64,
+                           count=len(identifiers))
+
+    def to_identifiers(self, indexes: np.ndarray) -> set[str]:
+        """Return the identifiers of the people at the given indexes."""
+        return {self._compact.get_identifier(i) for i in indexes.tolist()}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'colouring', 'seeding', 'compact_graph', 'social_graph'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -12,9 +12,29 @@ This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, and
 """
 from __future__ import annotations
 import csv
+import gzip
+import itertools
 import random
 import string
+from typing import IO, Iterator, Optional, Union
+import numpy as np
+import seeding
 from social_graph import Graph
+from compact_graph import CompactGraph
+from edge_store import EdgeStoreBuilder
+
+# The number of csv rows parsed at once by load_graph_csv_bulk
+DEFAULT_CHUNK_SIZE = 100_000
+
+# The layout of each contact in a binary contact file: the indexes of the two people, by their
+# row in the persons file, and the contact's weight
+EDGE_DTYPE = np.dtype([('person1', '<u4'), ('person2', '<u4'), ('weight', '<f4')])
+
+# The range from which the weight of a contact is chosen, for each level of contact
+LEVEL_RANGES = {'high': (0.65, 1.0), 'medium': (0.45, 0.6), 'low': (0.05, 0.4)}
+
+# The number of random names tried before the unused names are listed instead
+NAME_DRAWS = 32
 
 
 def load_graph_csv(names_file: str, contact_file: str) -> Graph:
@@ -44,133 +64,532 @@ def load_graph_csv(names_file: str, contact_file: str) -> Graph:
     return graph
 
 
+class LoadReport:
+    """A summary of a graph loaded by load_graph_csv_bulk, including the rows that were skipped
+    because they were invalid.
+
+    Instance Attributes:
+        - people_loaded: The number of people added to the graph.
+        - contacts_loaded: The number of contacts added to the graph.
+        - skipped: Maps each reason a row was skipped to the number of rows skipped for it.
+        - examples: The file, line number and reason of the first MAX_EXAMPLES skipped rows.
+
+    Representation Invariants:
+        - self.people_loaded >= 0 and self.contacts_loaded >= 0
+        - len(self.examples) <= LoadReport.MAX_EXAMPLES
+    """
+    MAX_EXAMPLES = 20
+
+    people_loaded: int
+    contacts_loaded: int
+    skipped: dict[str, int]
+    examples: list[tuple[str, int, str]]
+
+    def __init__(self) -> None:
+        """Initialize a report with nothing loaded or skipped."""
+        self.people_loaded = 0
+        self.contacts_loaded = 0
+        self.skipped = {}
+        self.examples = []
+
+    def record(self, file: str, lines: np.ndarray, reason: str) -> None:
+        """Record that the rows on the given lines of file were skipped for the given reason."""
+        if len(lines) == 0:
+            return
+
+        self.skipped[reason] = self.skipped.get(reason, 0) + len(lines)
+        room = self.MAX_EXAMPLES - len(self.examples)
+        self.examples.extend((file, int(line), reason) for line in lines[:room])
+
+    def total_skipped(self) -> int:
+        """Return the total number of rows skipped."""
+        return sum(self.skipped.values())
+
+    def __str__(self) -> str:
+        """Return a human-readable summary of this report."""
+        lines = ['Loaded {} people and {} contacts, skipped {} rows.'.format(
+            self.people_loaded, self.contacts_loaded, self.total_skipped())]
+        lines.extend('    {}: {}'.format(reason, count) for reason, count in self.skipped.items())
+        lines.extend('    {} line {}: {}'.format(file, line, reason)
+                     for file, line, reason in self.examples)
+        return '\n'.join(lines)
+
+
+def load_graph_csv_bulk(names_file: str, contact_file: str,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[CompactGraph, LoadReport]:
+    """Return a CompactGraph from the corresponding names_file and contact_file, and a report of
+    the rows that were skipped.
+
+    Unlike load_graph_csv, the files are read chunk_size rows at a time, the numeric columns of
+    each chunk are converted together with NumPy, and the graph is built with bulk insertions.
+    Invalid rows (malformed rows, invalid ages, severities or weights, duplicate or unknown ids,
+    self-loops and duplicate contacts) are left out and counted in the report instead of stopping
+    the load. The first row of each file is a header and is ignored.
+
+    Each chunk of contacts is added to the graph before the next is read, so besides the graph
+    only one chunk of rows and an 8-byte key for each contact added so far are held in memory.
+
+    contact_file may instead be a binary file of EDGE_DTYPE records, as written by
+    dataset_writer with edge_format='binary', if its name ends in .bin. Its invalid records are
+    reported by their record number, starting from 1. Either file is read through gzip if its
+    name ends in .gz.
+
+    >>> import os
+    >>> import tempfile
+    >>> import dataset_writer
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     loaded = [load_graph_csv_bulk(*dataset_writer.write_dataset(
+    ...         os.path.join(directory, edge_format), 50, seed=1, compress=compress,
+    ...         edge_format=edge_format, max_workers=1), chunk_size=30)
+    ...         for edge_format, compress in [('csv', False), ('binary', False), ('binary', True)]]
+    >>> [(report.contacts_loaded, report.total_skipped()) for _, report in loaded]
+    [(97, 0), (97, 0), (97, 0)]
+    >>> csv_graph, binary_graph = loaded[0][0], loaded[1][0]
+    >>> all(np.array_equal(a, b) for a, b in zip(csv_graph.to_csr()[:2], binary_graph.to_csr()[:2]))
+    True
+
+    Preconditions:
+        - names_file is in .csv format, and contact_file is in .csv or binary format
+        - chunk_size > 0
+    """
+    report = LoadReport()
+    graph, rows = _load_people_csv(names_file, chunk_size, report)
+    n = max(graph.num_people(), 1)
+
+    # Add weighted edges from contact_file a chunk at a time, keeping only the sorted key of each
+    # pair of people added so far to find repeated contacts
+    seen = np.zeros(0, dtype=np.int64)
+    for line_numbers, index1, index2, weight in _read_contact_chunks(contact_file, graph, rows,
+                                                                     chunk_size, report):
+        # Keep only the first row for each pair of people, in either order
+        keys = np.minimum(index1, index2) * n + np.maximum(index1, index2)
+        new_keys, first = np.unique(keys, return_index=True)
+        positions = np.searchsorted(seen, new_keys)
+        earlier = seen[np.minimum(positions, len(seen) - 1)] == new_keys if len(seen) > 0 \
+            else np.zeros(len(new_keys), dtype=np.bool_)
+
+        duplicate = np.ones(len(keys), dtype=np.bool_)
+        duplicate[first[~earlier]] = False
+        report.record(contact_file, line_numbers[duplicate], 'duplicate contact')
+        seen = np.insert(seen, positions[~earlier], new_keys[~earlier])
+
+        keep = np.flatnonzero(~duplicate)
+        graph.add_edges_bulk(index1[keep].astype(np.int32), index2[keep].astype(np.int32),
+                             weight[keep])
+        report.contacts_loaded += len(keep)
+
+    return graph, report
+
+
+def _load_people_csv(names_file: str, chunk_size: int,
+                     report: LoadReport) -> tuple[CompactGraph, np.ndarray]:
+    """Return a CompactGraph of the valid people in names_file, without any contacts, and the
+    index in the graph of the person on each row of names_file after its header, or -1 for the
+    rows left out. The invalid rows are recorded in report.
+    """
+    graph = CompactGraph()
+    row_parts, index_parts = [], []
+
+    for line_numbers, columns in _read_csv_chunks(names_file, 4, chunk_size, report):
+        identifiers, names = _strip(columns[0]), _strip(columns[1])
+        ages, valid_ages = _parse_numbers(columns[2])
+        severities, valid_severities = _parse_numbers(columns[3])
+
+        valid_ages &= (ages >= 0) & (ages == np.floor(ages))
+        report.record(names_file, line_numbers[~valid_ages], 'invalid age')
+        valid_severities &= valid_ages & (severities >= 0) & (severities <= 1)
+        report.record(names_file, line_numbers[valid_ages & ~valid_severities],
+                      'invalid severity')
+
+        new_people = {}
+        for i in np.flatnonzero(valid_severities).tolist():
+            if graph.has_identifier(identifiers[i]) or identifiers[i] in new_people:
+                report.record(names_file, line_numbers[i:i + 1], 'duplicate id')
+            else:
+                new_people[identifiers[i]] = i
+
+        keep = np.fromiter(new_people.values(), dtype=np.int64, count=len(new_people))
+        row_parts.append(line_numbers[keep] - 2)
+        index_parts.append(np.arange(graph.num_people(), graph.num_people() + len(keep)))
+        graph.add_vertices_bulk(list(new_people), [names[i] for i in keep.tolist()],
+                                ages[keep], severities[keep])
+
+    report.people_loaded = graph.num_people()
+    row_numbers = np.concatenate(row_parts or [np.zeros(0, dtype=np.int64)])
+    rows = np.full(int(row_numbers.max()) + 1 if len(row_numbers) > 0 else 0, -1,
+                   dtype=np.int64)
+    rows[row_numbers] = np.concatenate(index_parts)
+    return graph, rows
+
+
+def _read_contact_chunks(contact_file: str, graph: Graph, rows: np.ndarray, chunk_size: int,
+                         report: LoadReport) \
+        -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield the valid contacts in contact_file between people in graph, chunk_size rows at a
+    time, as (line numbers, first person indexes, second person indexes, weights) tuples. The
+    invalid rows are recorded in report, except for duplicate contacts, which are not detected.
+
+    If contact_file is a binary file, rows is the graph index of the person on each row of the
+    persons file, and its records are numbered from 1 instead of by line.
+    """
+    if contact_file.endswith(('.bin', '.bin.gz')):
+        chunks = _read_binary_contact_chunks(contact_file, rows, chunk_size, report)
+    else:
+        index = graph.get_index_map()
+        chunks = ((line_numbers, *_lookup_indexes(index, columns[0]),
+                   *_lookup_indexes(index, columns[1]), *_parse_numbers(columns[2]))
+                  for line_numbers, columns in _read_csv_chunks(contact_file, 3, chunk_size,
+                                                                report))
+
+    for line_numbers, index1, known1, index2, known2, weight, valid in chunks:
+        known = known1 & known2
+        report.record(contact_file, line_numbers[~known], 'unknown id')
+        distinct = known & (index1 != index2)
+        report.record(contact_file, line_numbers[known & ~distinct], 'self-loop')
+        valid &= distinct & (weight >= 0) & (weight <= 1)
+        report.record(contact_file, line_numbers[distinct & ~valid], 'invalid weight')
+
+        yield line_numbers[valid], index1[valid], index2[valid], weight[valid].astype(np.float32)
+
+
+def _read_binary_contact_chunks(contact_file: str, rows: np.ndarray, chunk_size: int,
+                                report: LoadReport) -> Iterator[tuple[np.ndarray, ...]]:
+    """Yield the records of the binary contact_file chunk_size at a time, as (record numbers,
+    first person indexes, mask of known first people, second person indexes, mask of known
+    second people, weights, mask of valid weights) tuples, given the graph index of the person
+    on each row of the persons file. A truncated last record is recorded in report.
+    """
+    with _open(contact_file, 'rb') as f:
+        first_record = 1
+        data = f.read(chunk_size * EDGE_DTYPE.itemsize)
+        while data:
+            whole = len(data) - len(data) % EDGE_DTYPE.itemsize
+            records = np.frombuffer(data[:whole], dtype=EDGE_DTYPE)
+            record_numbers = np.arange(first_record, first_record + len(records))
+            if whole < len(data):
+                report.record(contact_file, np.array([first_record + len(records)]),
+                              'malformed row')
+
+            index1, known1 = _lookup_rows(rows, records['person1'])
+            index2, known2 = _lookup_rows(rows, records['person2'])
+            weight = records['weight'].astype(np.float64)
+            yield record_numbers, index1, known1, index2, known2, weight, ~np.isnan(weight)
+
+            first_record += len(records)
+            data = f.read(chunk_size * EDGE_DTYPE.itemsize)
+
+
+def _lookup_rows(rows: np.ndarray, row_numbers: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the graph index of the person on each of the given rows of the persons file, and
+    a mask of which of them are in the graph, given the graph index of the person on each row.
+
+    >>> indexes, known = _lookup_rows(np.array([0, -1, 1]), np.array([2, 1, 5]))
+    >>> indexes[known].tolist(), known.tolist()
+    ([1], [True, False, False])
+    """
+    row_numbers = row_numbers.astype(np.int64)
+    indexes = rows[np.minimum(row_numbers, max(len(rows) - 1, 0))] if len(rows) > 0 \
+        else np.full(len(row_numbers), -1, dtype=np.int64)
+    indexes = np.where(row_numbers < len(rows), indexes, -1)
+    return indexes, indexes >= 0
+
+
+def _open(file: str, mode: str) -> IO:
+    """Return file opened in the given mode, through gzip if its name ends in .gz."""
+    if file.endswith('.gz'):
+        return gzip.open(file, mode + 't' if 'b' not in mode else mode,
+                         newline='' if 'b' not in mode else None)
+    return open(file, mode, newline='' if 'b' not in mode else None)
+
+
+def _read_csv_chunks(file: str, num_columns: int, chunk_size: int,
+                     report: LoadReport) -> Iterator[tuple[np.ndarray, list[list[str]]]]:
+    """Yield the rows of the csv file after its header, chunk_size rows at a time, as
+    (line numbers, columns) pairs where each column is a list of strings. Rows must not span
+    multiple lines.
+
+    Rows without exactly num_columns fields are recorded in report and left out.
+    """
+    with _open(file, 'r') as f:
+        f.readline()
+        first_line = 2
+
+        lines = list(itertools.islice(f, chunk_size))
+        while lines:
+            line_numbers = np.arange(first_line, first_line + len(lines))
+            well_formed, fields = _split_fields(lines, num_columns)
+
+            report.record(file, line_numbers[~well_formed], 'malformed row')
+            yield line_numbers[well_formed], [fields[k::num_columns] for k in range(num_columns)]
+
+            first_line += len(lines)
+            lines = list(itertools.islice(f, chunk_size))
+
+
+def _split_fields(lines: list[str], num_columns: int) -> tuple[np.ndarray, list[str]]:
+    """Return a mask of which of the csv lines have exactly num_columns fields, and the fields of
+    those lines, in order.
+
+    >>> well_formed, fields = _split_fields(['a,1\\n', 'b\\n', '"c,d",2\\n'], 2)
+    >>> well_formed.tolist(), fields
+    ([True, False, True], ['a', '1', 'c,d', '2'])
+    """
+    if any('"' in line for line in lines):
+        # Quoted fields can contain commas, so only the csv module can split them
+        rows = list(csv.reader(lines))
+        well_formed = np.array([len(row) == num_columns for row in rows], dtype=np.bool_)
+        return well_formed, [field for row, ok in zip(rows, well_formed) if ok for field in row]
+
+    # Otherwise, every line can be split at once by joining the lines with commas
+    well_formed = np.fromiter(map(str.count, lines, itertools.repeat(',')), dtype=np.int64,
+                              count=len(lines)) == num_columns - 1
+    if not well_formed.all():
+        lines = list(itertools.compress(lines, well_formed))
+
+    text = ''.join(lines).replace('\r\n', '\n').rstrip('\n')
+    return well_formed, text.replace('\n', ',').split(',') if text else []
+
+
+def _parse_numbers(column: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the values of column as a float array, and a mask of which values were valid
+    numbers. Invalid values are NaN.
+
+    The whole column is converted at once, and only parsed value by value if that fails.
+
+    >>> values, valid = _parse_numbers(['1.5', 'x', '2'])
+    >>> values[[0, 2]].tolist(), valid.tolist()
+    ([1.5, 2.0], [True, False, True])
+    """
+    try:
+        values = np.array(column, dtype=np.float64)
+    except ValueError:
+        values = np.array([_parse_number(value) for value in column], dtype=np.float64)
+
+    return values, ~np.isnan(values)
+
+
+def _parse_number(value: str) -> float:
+    """Return value as a float, or NaN if it is not a number."""
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+
+def _lookup_indexes(index: dict[str, int], column: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the graph index of each identifier in column, and a mask of which identifiers are
+    in the graph, given the dictionary mapping identifiers to indexes.
+    """
+    indexes = np.fromiter(map(index.get, _strip(column), itertools.repeat(-1)), dtype=np.int64,
+                          count=len(column))
+    return indexes, indexes >= 0
+
+
+def _strip(column: list[str]) -> list[str]:
+    """Return the strings in column without leading and trailing whitespace."""
+    return list(map(str.strip, column))
+
+
+def csv_to_snapshot(names_file: str, contact_file: str, snapshot_file: str) -> LoadReport:
+    """Convert the graph in names_file and contact_file to a binary snapshot saved at
+    snapshot_file, which can then be loaded much faster with Graph.load_snapshot. Return the
+    report of any invalid rows that were left out.
+
+    Preconditions:
+        - names_file and contact_file are in .csv format
+    """
+    graph, report = load_graph_csv_bulk(names_file, contact_file)
+    graph.save_snapshot(snapshot_file)
+    return report
+
+
+def csv_to_edge_store(names_file: str, contact_file: str, directory: str,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> LoadReport:
+    """Convert the graph in names_file and contact_file to an edge store written to directory,
+    which can then be opened with edge_store.MappedGraph.open. Return the report of any invalid
+    rows that were left out, as in load_graph_csv_bulk.
+
+    Only the people and chunk_size rows of contacts are held in memory at once, so this works
+    for contact files larger than memory. contact_file is read twice.
+
+    contact_file may also be a binary or gzip file, as in load_graph_csv_bulk.
+
+    Preconditions:
+        - names_file is in .csv format, and contact_file is in .csv or binary format
+        - chunk_size > 0
+    """
+    report = LoadReport()
+    people, rows = _load_people_csv(names_file, chunk_size, report)
+    builder = EdgeStoreBuilder(directory, people)
+
+    for _, index1, index2, _ in _read_contact_chunks(contact_file, people, rows, chunk_size,
+                                                     report):
+        builder.count(index1, index2)
+
+    # The invalid rows were already recorded in the first pass
+    for _, index1, index2, weight in _read_contact_chunks(contact_file, people, rows,
+                                                          chunk_size, LoadReport()):
+        builder.fill(index1, index2, weight)
+
+    builder.finish()
+    if builder.duplicates > 0:
+        report.skipped['duplicate contact'] = builder.duplicates
+    report.contacts_loaded = builder.contacts
+
+    return report
+
+
 # =========================
 # Data Generation Functions
 # =========================
-def generate_connected_graph(n: int, level: str = 'medium') -> Graph:
-    """Return a connected Graph containing n _Person objects with n + n // 5 total edges.
+def generate_connected_graph(n: int, level: str = 'medium',
+                             seed: Union[None, int, random.Random] = None) -> Graph:
+    """Return a connected Graph containing n _Person objects with n + n // 5 total edges, or an
+    edge between every pair of people if there are fewer pairs than that.
 
     The level, (high, medium, low) determines the range from which the weight between edges is
-    chosen.
+    chosen. If seed is given, the same graph is returned for the same seed. seed may also be a
+    random.Random to draw from.
 
     Preconditions:
         - 10 <= n <= 60
         - level in {'high', 'medium', 'low'}
+
+    >>> graph = generate_connected_graph(3, seed=0)
+    >>> sorted(len(graph.get_neighbours(person)) for person in graph.get_people())
+    [2, 2, 2]
     """
-    edges = n + n // 5
+    rand = seeding.python_rng(seed)
+    edges = min(n + n // 5, n * (n - 1) // 2)
     people = []
     graph = Graph()
 
     # Add n _Person objects with randomly generated attributes to the graph
     for _ in range(0, n):
-        identity, name = _generate_id_and_name(graph)
+        identity, name = _generate_id_and_name(graph, rand)
         people.append(identity)
-        graph.add_vertex(identity, name, random.randint(18, 55), random.uniform(0, 1))
-
-    remaining, visited = set(people), set()
-
-    current_person = random.choice(list(remaining))
-    remaining.remove(current_person)
-    visited.add(current_person)
-
-    # LOOP ACCUMULATOR: store the number of edges in the graph so far
-    edges_so_far = 0
-
-    while remaining != set():
-        new_neighbor = random.choice(people)
-
-        if new_neighbor not in visited:
-            graph.add_edge(current_person, new_neighbor, get_leveled_weight(level))
-            edges_so_far += 1
-            remaining.remove(new_neighbor)
-            visited.add(new_neighbor)
-
-        current_person = new_neighbor   # Move on to the next person
+        graph.add_vertex(identity, name, rand.randint(18, 55), rand.uniform(0, 1))
+
+    # Joins the people in a random order, each to a random person who has already joined, which
+    # connects everyone with one edge per person after the first
+    order = people.copy()
+    rand.shuffle(order)
+    contacts = set()
+    for i in range(1, n):
+        new_neighbour = order[rand.randrange(i)]
+        graph.add_edge(order[i], new_neighbour, get_leveled_weight(level, rand))
+        contacts.add(frozenset((order[i], new_neighbour)))
 
     # Adding edges until max edge number is met
-    while edges_so_far < edges:
-        # Checking in case person_1 and person_2 are the same person
-        person_1, person_2 = random.choice(people), random.choice(people)
-        if person_1 != person_2:
-            graph.add_edge(person_1, person_2, get_leveled_weight(level))
-            edges_so_far += 1
+    while len(contacts) < edges:
+        # Checking in case person_1 and person_2 are the same person or already in contact
+        person_1, person_2 = rand.choice(people), rand.choice(people)
+        if person_1 != person_2 and frozenset((person_1, person_2)) not in contacts:
+            graph.add_edge(person_1, person_2, get_leveled_weight(level, rand))
+            contacts.add(frozenset((person_1, person_2)))
 
     return graph
 
 
-def generate_disconnected_graph(n: int, level: str = 'medium') -> Graph:
+def generate_disconnected_graph(n: int, level: str = 'medium',
+                                seed: Union[None, int, random.Random] = None) -> Graph:
     """Return a non-connected graph of n _Person objects. The returned graph has a larger connected
      portion and a random smaller number of clusters/lone objects.
 
     The level, (high, medium, low) determines the range from which the weight
-    between edges is chosen.
+    between edges is chosen. If seed is given, the same graph is returned for the same seed. seed
+    may also be a random.Random to draw from.
 
     Preconditions:
         - 10 <= n <= 60
         - level in {'high', 'low', 'medium'}
     """
+    rand = seeding.python_rng(seed)
     num_of_disconnected = n // 5
-    graph = generate_connected_graph(n - num_of_disconnected, level)
+    graph = generate_connected_graph(n - num_of_disconnected, level, rand)
 
     # LOOP ACCUMULATOR: stores the identifiers for the loner _Person objects
     loner = []
 
     # Add num_of_disconnected _Person objects with randomly generated information to the graph
     for _ in range(0, num_of_disconnected):
-        identity, name = _generate_id_and_name(graph)
+        identity, name = _generate_id_and_name(graph, rand)
         loner.append(identity)
-        graph.add_vertex(identity, name, random.randint(18, 55), get_leveled_weight(level))
+        graph.add_vertex(identity, name, rand.randint(18, 55), get_leveled_weight(level, rand))
 
     # Number of times connections between lone _Person objects will be made
-    times = random.randint(0, num_of_disconnected // 2)
+    times = rand.randint(0, num_of_disconnected // 2)
 
     # Adds random edges between lone _Person objects
     for _ in range(times):
-        to_be_connected = _random_list_of_two(loner)
-        graph.add_edge(to_be_connected[0], to_be_connected[1], get_leveled_weight(level))
+        to_be_connected = _random_list_of_two(loner, rand)
+        graph.add_edge(to_be_connected[0], to_be_connected[1], get_leveled_weight(level, rand))
 
     return graph
 
 
-def _random_list_of_two(people: list[str]) -> list[str]:
+def _random_list_of_two(people: list[str], rand: random.Random) -> list[str]:
     """Return a randomly generated list of two strings representing _Person identifier attributes.
 
     Preconditions:
         - len(people) >= 2
         - any(x != y for x in people for y in people)
     """
-    person_1 = random.choice(people)
-    person_2 = random.choice(people)
+    person_1 = rand.choice(people)
+    person_2 = rand.choice(people)
 
     if person_2 != person_1:
         return [person_1, person_2]
     else:
-        return _random_list_of_two(people)
+        return _random_list_of_two(people, rand)
 
 
-def _generate_id_and_name(graph: Graph) -> tuple[str, str]:
+def _generate_id_and_name(graph: Graph, rand: random.Random) -> tuple[str, str]:
     """Return a tuple containing the following strings:
         1. A 6-digit id composed of uppercase ASCII letters and numbers for a _Person object.
         2. The initials for the name attribute of a _Person object.
+
+    Both are distinct from those of every person already in graph. Once every pair of initials
+    is used, a number is added after them, as in generators.generate_names.
+
+    >>> graph = Graph()
+    >>> rand = random.Random(111)
+    >>> for _ in range(700):
+    ...     graph.add_vertex(*_generate_id_and_name(graph, rand), 20, 0.5)
+    >>> len(graph.get_names())
+    700
     """
     id_chars = string.ascii_uppercase + string.digits
     name_chars = string.ascii_uppercase
-    id_and_name = (''.join(random.choice(id_chars) for _ in range(6)), random.choice(name_chars)
-                   + '. ' + random.choice(name_chars))
 
-    if id_and_name[1] in graph.get_names():
-        # If the name is already present in the graph, run the function again
-        return _generate_id_and_name(graph)
-    else:
-        return id_and_name
+    identifier = ''.join(rand.choice(id_chars) for _ in range(6))
+    while graph.has_identifier(identifier):
+        identifier = ''.join(rand.choice(id_chars) for _ in range(6))
 
+    run = len(graph.get_names()) // len(name_chars) ** 2
+    while True:
+        suffix = str(run) if run else ''
 
-def get_leveled_weight(level: str) -> float:
+        # If the name is already present in the graph, choose again
+        for _ in range(NAME_DRAWS):
+            name = rand.choice(name_chars) + '. ' + rand.choice(name_chars) + suffix
+            if not graph.has_name(name):
+                return identifier, name
+
+        # Few names may be left with this suffix, so they are listed rather than guessed
+        unused = [first + '. ' + last + suffix for first in name_chars for last in name_chars
+                  if not graph.has_name(first + '. ' + last + suffix)]
+        if unused:
+            return identifier, rand.choice(unused)
+        run += 1
+
+
+def get_leveled_weight(level: str, rand: Optional[random.Random] = None) -> float:
     """Return a float value to represent the weight of an edge between two _Person objects
     according to the given level. The level, (high, medium, low) determines the range from which the
-    random float value is chosen.
+    random float value is chosen, drawing from rand, or from the random module if it is None.
 
-    The range per level is as follows, where w is the weight:
+    The range per level is given by LEVEL_RANGES, as follows, where w is the weight:
         - 'high': 0.65 <= w <= 1.0
         - 'medium': 0.45 <= w <= 0.6
         - 'low': 0.05 <= w <= 0.4
@@ -178,14 +597,8 @@ def get_leveled_weight(level: str) -> float:
     Preconditions:
         - level in {'high', 'low', 'medium'}
     """
-    if level == 'high':
-        weight = random.uniform(0.65, 1.0)
-    elif level == 'medium':
-        weight = random.uniform(0.45, 0.6)
-    else:  # type == 'low'
-        weight = random.uniform(0.05, 0.4)
-
-    return weight
+    uniform = random.uniform if rand is None else rand.uniform
+    return uniform(*LEVEL_RANGES[level])
 
 
 if __name__ == '__main__':
@@ -197,8 +610,10 @@ if __name__ == '__main__':
 
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['csv', 'networkx', 'string', 'random', 'social_graph'],
+        'extra-imports': ['csv', 'gzip', 'itertools', 'networkx', 'numpy', 'string', 'random',
+                          'seeding', 'social_graph', 'compact_graph', 'edge_store'],
         'max-line-length': 100,
-        'allowed-io': ['load_graph_csv'],
+        'allowed-io': ['load_graph_csv', '_read_csv_chunks', '_read_binary_contact_chunks',
+                       '_open'],
         'disable': ['E1136']
     })
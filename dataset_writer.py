@@ -0,0 +1,288 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Dataset Writer Module
+This module contains the command-line tool that writes large synthetic datasets, in the same
+format as data/persons.csv and data/connections.csv, for load testing the loaders.
+
+The people are generated in blocks of consecutive indexes, each from its own random stream, so
+the blocks can be written by a pool of processes in any order and only one block per process is
+ever held in memory. Each block is written to a part file, and the parts are joined in order. A
+dataset is the same for the same seed, number of people and block size, however many processes
+write it.
+
+Each person makes a few contacts with the people a random offset of at most (n - 1) // 2 after
+them, wrapping around, so no pair of people is ever in contact twice and the contacts of a block
+never depend on the other blocks.
+
+The contacts can also be written in a binary format, as records of EDGE_DTYPE holding the
+indexes of the two people, in the order of the persons file, and the contact's weight. Every file
+can be compressed with gzip. data_processing.load_graph_csv_bulk and csv_to_edge_store read
+either format.
+
+Usage:
+    python dataset_writer.py OUTPUT_DIRECTORY --people 10000000 --seed 111 [--gzip]
+
+Running this module without any arguments runs its doctests and checks instead.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import argparse
+import gzip
+import os
+import shutil
+import string
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Optional
+import numpy as np
+import generators
+import seeding
+from data_processing import EDGE_DTYPE
+
+PERSONS_HEADER = 'id, name, age, severity\n'
+CONNECTIONS_HEADER = 'person1,person 2, weight\n'
+
+EDGE_FORMATS = ('csv', 'binary')
+
+# The number of people generated at once by each process
+DEFAULT_BLOCK_SIZE = 250_000
+
+# Every weight and severity level is written with two decimal places
+_HUNDREDTHS = np.array(['{:.2f}'.format(i / 100) for i in range(101)])
+
+
+def write_dataset(directory: str, n: int, contacts_per_person: int = 2, level: str = 'medium',
+                  seed: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                  compress: bool = False, edge_format: str = 'csv',
+                  max_workers: Optional[int] = None) -> list[str]:
+    """Write a synthetic dataset of n people, each making contacts_per_person contacts, to
+    directory, and return the paths of the persons file and the connections file.
+
+    The level, (high, medium, low) determines the range from which the weight of each contact is
+    chosen, as in data_processing.get_leveled_weight. The blocks run across max_workers
+    processes, or as many as there are processors if it is None, or in this process if it is 1.
+
+    Preconditions:
+        - 1 <= n <= len(generators.ID_CHARACTERS) ** generators.ID_LENGTH
+        - 0 <= contacts_per_person <= (n - 1) // 2
+        - level in {'high', 'medium', 'low'}
+        - block_size >= 1
+        - edge_format in EDGE_FORMATS
+    """
+    # The seed is fixed here so that every worker derives the same streams
+    if seed is None:
+        seed = seeding.fresh_seed()
+
+    suffix = '.gz' if compress else ''
+    os.makedirs(directory, exist_ok=True)
+    persons_path = os.path.join(directory, 'persons.csv' + suffix)
+    connections_path = os.path.join(directory, ('connections.csv' if edge_format == 'csv'
+                                                else 'connections.bin') + suffix)
+
+    id_map = generators.draw_id_map(seeding.numpy_rng(seed, seeding.DATASET_STREAM))
+    with tempfile.TemporaryDirectory(dir=directory) as parts_directory:
+        tasks = [(parts_directory, start, min(start + block_size, n), n, contacts_per_person,
+                  level, seed, id_map, compress, edge_format)
+                 for start in range(0, n, block_size)]
+
+        with open(persons_path, 'wb') as persons, open(connections_path, 'wb') as connections:
+            persons.write(_encode(PERSONS_HEADER.encode('ascii'), compress))
+            if edge_format == 'csv':
+                connections.write(_encode(CONNECTIONS_HEADER.encode('ascii'), compress))
+
+            if max_workers == 1:
+                for task in tasks:
+                    _append_parts(_write_block(task), persons, connections)
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    # The parts are joined in block order as soon as each block is written
+                    for parts in executor.map(_write_block, tasks):
+                        _append_parts(parts, persons, connections)
+
+    return [persons_path, connections_path]
+
+
+def block_people(start: int, end: int, seed: int,
+                 id_map: tuple[int, int]) -> tuple[np.ndarray, list[str], np.ndarray, np.ndarray]:
+    """Return the id codes (as in generators.id_codes), names, ages and severity levels of the
+    people at indexes start to end - 1 of the dataset with the given seed and id map.
+    """
+    rng = seeding.numpy_rng(seed, seeding.DATASET_STREAM, start)
+    indexes = np.arange(start, end, dtype=np.int64)
+    return (generators.id_codes(indexes, id_map), _names(indexes),
+            rng.integers(18, 56, end - start), rng.uniform(0, 1, end - start))
+
+
+def block_contacts(start: int, end: int, n: int, contacts_per_person: int, level: str,
+                   seed: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the indexes of the people at either end of each contact made by the people at
+    indexes start to end - 1 of the dataset of n people with the given seed, and the weights of
+    the contacts.
+
+    Each person contacts the people up to contacts_per_person distinct random offsets after
+    them, wrapping around. Offsets are at most (n - 1) // 2, so the offset from the other person
+    back to them would be too large, and every pair of people is in contact at most once.
+
+    >>> sources, targets, _ = block_contacts(0, 101, 101, 5, 'low', 111)
+    >>> pairs = {frozenset(pair) for pair in zip(sources.tolist(), targets.tolist())}
+    >>> len(pairs) == len(sources)
+    True
+    """
+    rng = seeding.numpy_rng(seed, seeding.DATASET_STREAM, start, 1)
+    limit = (n - 1) // 2
+    offsets = np.sort(rng.integers(1, max(limit, 1) + 1, (end - start, contacts_per_person)),
+                      axis=1)
+
+    # Repeated offsets of the same person are dropped
+    distinct = np.ones(offsets.shape, dtype=np.bool_)
+    distinct[:, 1:] = offsets[:, 1:] != offsets[:, :-1]
+    distinct &= offsets <= limit
+
+    sources = np.repeat(np.arange(start, end, dtype=np.int64), contacts_per_person)
+    sources = sources[distinct.ravel()]
+    targets = (sources + offsets[distinct]) % n
+    return sources, targets, generators.leveled_weights(level, len(sources), rng)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Write the dataset described by the command-line arguments argv, or by sys.argv if it is
+    None, and print the paths written.
+    """
+    parser = argparse.ArgumentParser(description='Write a synthetic persons and connections '
+                                                 'dataset for load testing.')
+    parser.add_argument('directory', help='the directory to write the dataset to')
+    parser.add_argument('--people', type=int, required=True, help='the number of people')
+    parser.add_argument('--contacts', type=int, default=2,
+                        help='the number of contacts made by each person')
+    parser.add_argument('--level', choices=['high', 'medium', 'low'], default='medium',
+                        help='the level of contact between people')
+    parser.add_argument('--seed', type=int, default=None, help='the seed of the dataset')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                        help='the number of people generated at once by each process')
+    parser.add_argument('--workers', type=int, default=None, help='the number of processes')
+    parser.add_argument('--gzip', action='store_true', help='compress every file with gzip')
+    parser.add_argument('--edge-format', choices=EDGE_FORMATS, default='csv',
+                        help='the format of the connections file')
+    args = parser.parse_args(argv)
+
+    if args.people < 1 or args.block_size < 1:
+        parser.error('--people and --block-size must be at least 1')
+    if not 0 <= args.contacts <= (args.people - 1) // 2:
+        parser.error('--contacts must be between 0 and (people - 1) // 2')
+
+    for path in write_dataset(args.directory, args.people, args.contacts, args.level,
+                              args.seed, args.block_size, args.gzip, args.edge_format,
+                              args.workers):
+        print(path)
+
+
+def _write_block(task: tuple[Any, ...]) -> tuple[str, str]:
+    """Write the people and contacts of one block to part files, and return their paths. task
+    holds the parts directory, the block's start and end, and the remaining arguments of
+    write_dataset.
+    """
+    directory, start, end, n, contacts_per_person, level, seed, id_map, compress, \
+        edge_format = task
+
+    codes, names, ages, severities = block_people(start, end, seed, id_map)
+    ids = codes.view('S{}'.format(generators.ID_LENGTH)).ravel().astype(str)
+    severity_text = _HUNDREDTHS[np.rint(severities * 100).astype(np.int64)]
+    persons = ''.join('{},{},{},{}\n'.format(*row) for row in zip(
+        ids.tolist(), names, ages.tolist(), severity_text.tolist())).encode('ascii')
+
+    sources, targets, weights = block_contacts(start, end, n, contacts_per_person, level, seed)
+    if edge_format == 'csv':
+        connections = _connection_rows(generators.id_codes(sources, id_map),
+                                       generators.id_codes(targets, id_map), weights)
+    else:
+        records = np.empty(len(sources), dtype=EDGE_DTYPE)
+        records['person1'], records['person2'], records['weight'] = sources, targets, weights
+        connections = records.tobytes()
+
+    paths = (os.path.join(directory, 'persons.{}'.format(start)),
+             os.path.join(directory, 'connections.{}'.format(start)))
+    for path, data in zip(paths, (persons, connections)):
+        with open(path, 'wb') as f:
+            f.write(_encode(data, compress))
+    return paths
+
+
+def _connection_rows(person1: np.ndarray, person2: np.ndarray, weights: np.ndarray) -> bytes:
+    """Return the csv rows of the contacts between the people with the id codes in the matching
+    rows of person1 and person2, with the matching weights.
+
+    Every field has a fixed width, so all the rows are filled in as one array of characters.
+    """
+    width = generators.ID_LENGTH
+    rows = np.empty((len(weights), 2 * width + 7), dtype=np.uint8)
+    rows[:, :width] = person1
+    rows[:, width] = ord(',')
+    rows[:, width + 1:2 * width + 1] = person2
+    rows[:, 2 * width + 1] = ord(',')
+    rows[:, 2 * width + 2:2 * width + 6] = np.frombuffer(
+        _HUNDREDTHS[np.rint(weights * 100).astype(np.int64)].astype('S4').tobytes(),
+        dtype=np.uint8).reshape(-1, 4)
+    rows[:, -1] = ord('\n')
+    return rows.tobytes()
+
+
+def _encode(data: bytes, compress: bool) -> bytes:
+    """Return data, compressed as one gzip member if compress is True. Gzip members can be
+    joined one after another into a single gzip file.
+
+    The modification time in the gzip header is fixed, so the same data is always compressed to
+    the same bytes.
+    """
+    return gzip.compress(data, mtime=0) if compress else data
+
+
+def _append_parts(parts: tuple[str, str], persons: BinaryIO, connections: BinaryIO) -> None:
+    """Append the part files at the paths in parts to the open persons and connections files, and
+    delete them.
+    """
+    for path, output in zip(parts, (persons, connections)):
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, output)
+        os.remove(path)
+
+
+def _names(indexes: np.ndarray) -> list[str]:
+    """Return a distinct name of initials for each of the people at the given indexes, in the
+    style of generators.generate_names.
+
+    Consecutive runs of 676 indexes use every pair of initials once, in a scrambled order, and
+    each run after the first adds its number after the initials.
+    """
+    letters = string.ascii_uppercase
+    pairs = len(letters) ** 2
+    # 7 shares no factor with 676, so each run of indexes is mapped to every pair exactly once
+    scrambled = (indexes * 7 + 3) % pairs
+    return ['{}. {}{}'.format(letters[pair // len(letters)], letters[pair % len(letters)],
+                              run or '')
+            for pair, run in zip(scrambled.tolist(), (indexes // pairs).tolist())]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+    else:
+        import doctest
+        doctest.testmod()
+
+        import python_ta.contracts
+        python_ta.contracts.check_all_contracts()
+
+        import python_ta
+        python_ta.check_all(config={
+            'extra-imports': ['argparse', 'gzip', 'os', 'shutil', 'string', 'sys', 'tempfile',
+                              'concurrent.futures', 'numpy', 'generators', 'seeding',
+                              'data_processing'],
+            'max-line-length': 100,
+            'allowed-io': ['main'],
+            'disable': ['E1136']
+        })
@@ -0,0 +1,544 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Edge Store Module
+This module contains a graph whose contacts are read from memory-mapped files, for contact
+networks too large to fit in memory, and the builder that writes those files without ever
+holding all of the contacts in memory at once.
+
+An edge store is a directory containing the following files:
+    - store.json: The store format version and the number of people and contact entries.
+    - identifiers.npy, names.npy: The UTF-8 identifier and name of each person, in index order.
+    - ages.npy, severities.npy: The age and severity level of each person, in index order.
+    - identifier_keys.npy, identifier_indexes.npy: The identifiers in sorted order, and the index
+      of each, so that a person can be found by binary search.
+    - name_keys.npy, name_indexes.npy: Each distinct name in sorted order, and the index of the
+      first person with it.
+    - indptr.npy, indices.npy, weights.npy: The contacts in CSR form, as in compact_graph, sorted
+      by person index so that each person's contacts are one contiguous range of each file.
+
+The people's ages, severity levels, infection statuses and degrees, and the row offsets of the
+contacts, are kept in memory, and the people's identifiers and names are memory-mapped. The
+contacts themselves are read from their files as they are needed, one block of rows at a time,
+so the memory a MappedGraph uses grows with its number of people but not with its number of
+contacts. They are read with positioned reads rather than memory-mapped, since the operating
+system may map far more of a memory-mapped file than each scattered read asks for.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+from __future__ import annotations
+import json
+import os
+from typing import Any, BinaryIO, Iterable, Iterator, Mapping, Optional, Sequence, Union
+import numpy as np
+from compact_graph import CompactGraph, NO_DEGREE
+
+STORE_VERSION = 2
+
+# The maximum number of contact entries held in memory at once while building a store
+DEFAULT_BLOCK_SIZE = 1_000_000
+
+# The largest gap, in contact entries, between two contacts that are read from a contact file
+# together rather than separately, which trades a little extra reading for fewer reads
+READ_GAP = 256
+
+# The number of strings decoded at once while iterating over a column of them
+_DECODE_CHUNK_SIZE = 4096
+
+
+class _StringColumn(Sequence):
+    """A list-like column of strings stored as an array of UTF-8 bytes, which are decoded as they
+    are read, followed by any strings added since the column was stored.
+    """
+    # Private Instance Attributes:
+    #     - _encoded: The stored strings, encoded as UTF-8.
+    #     - _added: The strings added after the stored ones.
+    _encoded: np.ndarray
+    _added: list[str]
+
+    def __init__(self, encoded: np.ndarray) -> None:
+        self._encoded = encoded
+        self._added = []
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, list[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < len(self._encoded):
+            return self._encoded[index].decode('utf-8')
+        return self._added[index - len(self._encoded)]
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self._encoded), _DECODE_CHUNK_SIZE):
+            for value in self._encoded[start:start + _DECODE_CHUNK_SIZE].tolist():
+                yield value.decode('utf-8')
+        yield from self._added
+
+    def __len__(self) -> int:
+        return len(self._encoded) + len(self._added)
+
+    def extend(self, values: Iterable[str]) -> None:
+        """Add the given strings to the end of this column."""
+        self._added.extend(values)
+
+
+class _SortedIndex(Mapping):
+    """A mapping from each stored string to a person index, or to the identifier from a column
+    at that index, found by binary search in the sorted strings, together with any strings added
+    since, which are kept in a dictionary.
+    """
+    # Private Instance Attributes:
+    #     - _keys: The stored strings in sorted order, encoded as UTF-8.
+    #     - _indexes: The person index of each of _keys.
+    #     - _labels: The column each index is looked up in to give the mapped value, or None if
+    #       the index itself is the value.
+    #     - _added: Maps each string added since the index was stored to its value.
+    _keys: np.ndarray
+    _indexes: np.ndarray
+    _labels: Optional[_StringColumn]
+    _added: dict[str, Union[int, str]]
+
+    def __init__(self, keys: np.ndarray, indexes: np.ndarray,
+                 labels: Optional[_StringColumn] = None) -> None:
+        self._keys = keys
+        self._indexes = indexes
+        self._labels = labels
+        self._added = {}
+
+    def __getitem__(self, key: str) -> Union[int, str]:
+        if key in self._added:
+            return self._added[key]
+
+        # A longer key would be cut short to the width of the stored strings
+        encoded = key.encode('utf-8')
+        if len(encoded) <= self._keys.dtype.itemsize:
+            position = int(np.searchsorted(self._keys, encoded))
+            if position < len(self._keys) and self._keys[position] == encoded:
+                index = int(self._indexes[position])
+                return index if self._labels is None else self._labels[index]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from _StringColumn(self._keys)
+        yield from self._added
+
+    def __len__(self) -> int:
+        return len(self._keys) + len(self._added)
+
+    def update(self, pairs: Iterable[tuple[str, Union[int, str]]]) -> None:
+        """Map each string in pairs to its value."""
+        self._added.update(pairs)
+
+    def setdefault(self, key: str, value: Union[int, str]) -> Union[int, str]:
+        """Map key to value unless it is already mapped, and return the value it is mapped to."""
+        if key not in self:
+            self._added[key] = value
+        return self[key]
+
+
+class _ContactColumn:
+    """A read-only array of contact entries in a .npy file, which reads the entries it is indexed
+    with from the file instead of holding them in memory.
+
+    Indexing with a slice reads that range of entries, and indexing with an array of positions
+    reads each run of nearby positions once. Converting the whole column to an array, as
+    np.asarray does, reads every entry.
+
+    Instance Attributes:
+        - dtype: The type of each entry.
+    """
+    dtype: np.dtype
+
+    # Private Instance Attributes:
+    #     - _file: The .npy file, opened for reading without buffering.
+    #     - _offset: The position in the file of the first entry.
+    #     - _length: The number of entries.
+    _file: BinaryIO
+    _offset: int
+    _length: int
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'rb', buffering=0)
+        version = np.lib.format.read_magic(self._file)
+        if version == (1, 0):
+            shape, _, self.dtype = np.lib.format.read_array_header_1_0(self._file)
+        else:
+            shape, _, self.dtype = np.lib.format.read_array_header_2_0(self._file)
+        self._offset = self._file.tell()
+        self._length = int(np.prod(shape))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def close(self) -> None:
+        """Close the file of this column, after which its entries can no longer be read."""
+        self._file.close()
+
+    def __array__(self, dtype: Optional[np.dtype] = None, copy: Optional[bool] = None) \
+            -> np.ndarray:
+        values = self[0:self._length]
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def __getitem__(self, key: Union[slice, np.ndarray]) -> np.ndarray:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step != 1:
+                return self._gather(np.arange(start, stop, step, dtype=np.int64))
+            values = np.empty(max(stop - start, 0), dtype=self.dtype)
+            self._read_into(values, start)
+            return values
+
+        positions = np.asarray(key)
+        if positions.dtype == np.bool_:
+            positions = np.flatnonzero(positions)
+        positions = positions.astype(np.int64)
+        if np.any((positions < -self._length) | (positions >= self._length)):
+            raise IndexError('Contact position out of range')
+        positions = np.where(positions < 0, positions + self._length, positions)
+        if positions.ndim == 0:
+            return self._gather(positions.reshape(1))[0]
+        return self._gather(positions)
+
+    def _gather(self, positions: np.ndarray) -> np.ndarray:
+        """Return the entries at the given positions, reading each run of positions that are at
+        most READ_GAP entries apart with one read.
+        """
+        if len(positions) == 0:
+            return np.zeros(0, dtype=self.dtype)
+
+        unsorted = bool(np.any(positions[1:] < positions[:-1]))
+        order = np.argsort(positions, kind='stable') if unsorted else None
+        ordered = positions[order] if unsorted else positions
+
+        breaks = np.flatnonzero(np.diff(ordered) > READ_GAP) + 1
+        firsts = ordered[np.r_[0, breaks]]
+        lasts = ordered[np.r_[breaks - 1, len(ordered) - 1]]
+        spans = lasts - firsts + 1
+        # Where each run is read to in one buffer holding every run
+        destinations = np.r_[0, np.cumsum(spans)[:-1]]
+
+        buffer = np.empty(int(spans.sum()), dtype=self.dtype)
+        size = self.dtype.itemsize
+        if hasattr(os, 'preadv'):
+            # The usual case, where each run is read whole by a single read, is kept short
+            view, file = memoryview(buffer).cast('B'), self._file.fileno()
+            for first, span, destination in zip((firsts * size + self._offset).tolist(),
+                                                (spans * size).tolist(),
+                                                (destinations * size).tolist()):
+                part = view[destination:destination + span]
+                if os.preadv(file, [part], first) < span:
+                    self._read_into(buffer[destination // size:(destination + span) // size],
+                                    (first - self._offset) // size)
+        else:
+            for first, span, destination in zip(firsts.tolist(), spans.tolist(),
+                                                destinations.tolist()):
+                self._read_into(buffer[destination:destination + span], first)
+
+        counts = np.diff(np.r_[0, breaks, len(ordered)])
+        values = buffer[ordered - np.repeat(firsts - destinations, counts)]
+        if not unsorted:
+            return values
+        result = np.empty_like(values)
+        result[order] = values
+        return result
+
+    def _read_into(self, values: np.ndarray, start: int) -> None:
+        """Fill values with the entries of the file from position start onward. Raise ValueError
+        if the file ends first.
+        """
+        view = memoryview(values).cast('B')
+        position = self._offset + start * self.dtype.itemsize
+        while len(view) > 0:
+            # Positioned reads do not move the file's offset, which forked processes share
+            if hasattr(os, 'preadv'):
+                count = os.preadv(self._file.fileno(), [view], position)
+            else:
+                self._file.seek(position)
+                count = self._file.readinto(view)
+            if not count:
+                raise ValueError('Edge store file {} is truncated'.format(self._file.name))
+            view = view[count:]
+            position += count
+
+
+class MappedGraph(CompactGraph):
+    """ A CompactGraph whose people and contacts are read from an edge store.
+
+    The people's ages, severity levels, infection statuses and degrees are stored in memory, so
+    simulations and degree calculations work as they do on a CompactGraph, but only the
+    identifiers and contacts they touch are read from disk. The contacts are read one block of
+    rows at a time, as in CompactGraph.contact_blocks, and are never all held in memory, except
+    by the methods that need every contact at once: component_labels, the conversion to networkx
+    for drawing, and adding contacts.
+
+    People can be added, and are kept in memory. Adding contacts merges every contact into
+    memory, as in a CompactGraph, so large changes are better made by building a new store.
+
+    The contact files stay open until close is called, or the with statement the graph is opened
+    in ends.
+
+    >>> import tempfile
+    >>> people = CompactGraph()
+    >>> people.add_vertices_bulk(['A', 'B', 'C'], ['Ann', 'Bo', 'Cy'], [20] * 3, [0.5] * 3)
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     builder = EdgeStoreBuilder(directory, people)
+    ...     builder.count(np.array([0]), np.array([1]))
+    ...     builder.fill(np.array([0]), np.array([1]), np.array([0.5]))
+    ...     builder.finish()
+    ...     with MappedGraph.open(directory) as graph:
+    ...         graph.set_infected({'A'})
+    ...         dict(graph.recalculate_degrees())
+    {'A': 0, 'B': 1}
+    """
+    @staticmethod
+    def open(directory: str) -> MappedGraph:
+        """Return the graph stored in the edge store at directory. Raise ValueError if the store
+        is from an unsupported format version.
+        """
+        with open(os.path.join(directory, 'store.json')) as f:
+            meta = json.load(f)
+
+        if meta['version'] != STORE_VERSION:
+            raise ValueError('Unsupported edge store version {} in {}'.format(meta['version'],
+                                                                            directory))
+
+        graph = MappedGraph(capacity=0)
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name), mmap_mode='r')
+
+        identifiers = _StringColumn(load('identifiers.npy'))
+        graph._ids = identifiers
+        graph._names = _StringColumn(load('names.npy'))
+        graph._index = _SortedIndex(load('identifier_keys.npy'), load('identifier_indexes.npy'))
+        graph._name_index = _SortedIndex(load('name_keys.npy'), load('name_indexes.npy'),
+                                         identifiers)
+
+        n = meta['num_people']
+        graph.ages = np.load(os.path.join(directory, 'ages.npy'))
+        graph.severities = np.load(os.path.join(directory, 'severities.npy'))
+        graph.infected = np.zeros(n, dtype=np.bool_)
+        graph.degrees = np.full(n, NO_DEGREE, dtype=np.int32)
+        graph._size = n
+        graph._version += 1
+
+        graph._indptr = np.load(os.path.join(directory, 'indptr.npy'))
+        graph._indices = _ContactColumn(os.path.join(directory, 'indices.npy'))
+        graph._weights = _ContactColumn(os.path.join(directory, 'weights.npy'))
+        return graph
+
+    def close(self) -> None:
+        """Close the contact files of this graph. Its contacts can no longer be read afterwards,
+        unless they were merged into memory by adding contacts.
+        """
+        for column in (self._indices, self._weights):
+            if isinstance(column, _ContactColumn):
+                column.close()
+
+    def __enter__(self) -> MappedGraph:
+        """Return this graph, to be closed at the end of a with statement."""
+        return self
+
+    def __exit__(self, *exception: Any) -> None:
+        """Close this graph at the end of a with statement."""
+        self.close()
+
+    def _merge_pending(self) -> None:
+        """Merge the buffered edges into the CSR arrays, as in CompactGraph.
+
+        When only people have been added, their empty rows are added to the row offsets, and the
+        contacts are still read from the store.
+        """
+        if not self._pending and len(self._indptr) < self._size + 1:
+            self._indptr = np.r_[self._indptr, np.full(self._size + 1 - len(self._indptr),
+                                                       self._indptr[-1])]
+        super()._merge_pending()
+
+
+class EdgeStoreBuilder:
+    """A writer for an edge store, given the people up front and the contacts in two passes.
+
+    The contacts must be passed to count in chunks, then passed again in the same order to fill,
+    before finish is called. Only the per-person counts and one chunk or block of contacts are held
+    in memory at a time. Where the same pair of people is passed more than once, the first weight
+    given is kept.
+
+    Instance Attributes:
+        - directory: The directory the edge store is written to.
+        - contacts: The number of distinct contacts written by finish.
+        - duplicates: The number of repeated contacts left out by finish.
+    """
+    directory: str
+    contacts: int
+    duplicates: int
+    # Private Instance Attributes:
+    #     - _people: The graph of the people in the store, without contacts.
+    #     - _counts: The number of contact entries passed to count for each person.
+    #     - _cursors: The position in _indices where the next entry of each person goes.
+    #     - _indptr: The CSR row offsets computed from _counts, or None until filling starts.
+    #     - _indices, _weights: The temporary memory-mapped CSR arrays, once filling has started.
+    _people: CompactGraph
+    _counts: np.ndarray
+    _cursors: np.ndarray
+    _indptr: Optional[np.ndarray]
+    _indices: np.ndarray
+    _weights: np.ndarray
+
+    def __init__(self, directory: str, people: CompactGraph) -> None:
+        """Initialize a builder for an edge store of the given people, written to directory."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.contacts = 0
+        self.duplicates = 0
+        self._people = people
+        self._counts = np.zeros(people.num_people(), dtype=np.int64)
+        self._indptr = None
+
+    def count(self, sources: np.ndarray, targets: np.ndarray) -> None:
+        """Count a chunk of contacts between the people at the matching indexes of sources and
+        targets.
+        """
+        n = len(self._counts)
+        self._counts += np.bincount(sources, minlength=n) + np.bincount(targets, minlength=n)
+
+    def fill(self, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray) -> None:
+        """Write a chunk of contacts, which must have already been passed to count."""
+        if self._indptr is None:
+            self._start_filling()
+        if len(sources) == 0:
+            return
+
+        # Each contact is an entry in the rows of both of its people, kept in the given order
+        rows = np.stack([sources, targets], axis=1).ravel()
+        columns = np.stack([targets, sources], axis=1).ravel()
+        entry_weights = np.repeat(weights, 2)
+
+        order = np.argsort(rows, kind='stable')
+        rows, columns, entry_weights = rows[order], columns[order], entry_weights[order]
+
+        # The rank of each entry among the entries of the same row in this chunk
+        row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        group_sizes = np.diff(np.r_[row_starts, len(rows)])
+        ranks = np.arange(len(rows)) - np.repeat(row_starts, group_sizes)
+
+        positions = self._cursors[rows] + ranks
+        self._indices[positions] = columns
+        self._weights[positions] = entry_weights
+        self._cursors[rows[row_starts]] += group_sizes
+
+    def finish(self, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        """Sort each person's contacts, leave out repeated contacts, and write the final files of
+        the edge store, working on about block_size entries at a time.
+        """
+        if self._indptr is None:
+            self._start_filling()
+
+        n = len(self._counts)
+        new_indptr = np.zeros(n + 1, dtype=np.int64)
+        written = 0
+        start = 0
+
+        while start < n:
+            end = int(np.searchsorted(self._indptr, self._indptr[start] + block_size,
+                                      side='right')) - 1
+            end = min(max(end, start + 1), n)
+            low, high = self._indptr[start], self._indptr[end]
+
+            rows = np.repeat(np.arange(start, end), np.diff(self._indptr[start:end + 1]))
+            columns = np.array(self._indices[low:high])
+            weights = np.array(self._weights[low:high])
+
+            # A stable sort keeps the first of each repeated contact in front
+            order = np.lexsort((columns, rows))
+            rows, columns, weights = rows[order], columns[order], weights[order]
+            keep = np.r_[True, (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])] \
+                if len(rows) > 0 else np.zeros(0, dtype=np.bool_)
+
+            # Kept entries never overtake the block being read, so they are compacted in place
+            kept = int(keep.sum())
+            self._indices[written:written + kept] = columns[keep]
+            self._weights[written:written + kept] = weights[keep]
+            new_indptr[start + 1:end + 1] = written + np.cumsum(
+                np.bincount(rows[keep] - start, minlength=end - start))
+
+            written += kept
+            start = end
+
+        # Each repeated contact was left out of the rows of both of its people
+        self.contacts = written // 2
+        self.duplicates = int(self._indptr[-1] - written) // 2
+        self._write_files(new_indptr, written, block_size)
+
+    def _start_filling(self) -> None:
+        """Allocate the temporary CSR files from the counted contacts."""
+        self._indptr = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=self._indptr[1:])
+        self._cursors = self._indptr[:-1].copy()
+
+        size = max(int(self._indptr[-1]), 1)
+        self._indices = np.lib.format.open_memmap(self._path('indices.tmp.npy'), mode='w+',
+                                                  dtype=np.int32, shape=(size,))
+        self._weights = np.lib.format.open_memmap(self._path('weights.tmp.npy'), mode='w+',
+                                                  dtype=np.float32, shape=(size,))
+
+    def _write_files(self, indptr: np.ndarray, size: int, block_size: int) -> None:
+        """Write the final files of the edge store, copying the first size entries of the
+        temporary CSR files a block at a time.
+        """
+        np.save(self._path('indptr.npy'), indptr)
+
+        for name, source in (('indices.npy', self._indices), ('weights.npy', self._weights)):
+            target = np.lib.format.open_memmap(self._path(name), mode='w+', dtype=source.dtype,
+                                               shape=(size,))
+            for low in range(0, size, block_size):
+                target[low:low + block_size] = source[low:min(low + block_size, size)]
+            target.flush()
+            del target
+
+        del self._indices, self._weights
+        os.remove(self._path('indices.tmp.npy'))
+        os.remove(self._path('weights.tmp.npy'))
+
+        people = self._people
+        n = people.num_people()
+        np.save(self._path('ages.npy'), people.ages[:n])
+        np.save(self._path('severities.npy'), people.severities[:n])
+        for kind, values in (('identifier', people.get_identifiers()),
+                             ('name', [people.get_name(i) for i in range(n)])):
+            encoded = np.array([value.encode('utf-8') for value in values], dtype=np.bytes_)
+            np.save(self._path(kind + 's.npy'), encoded)
+
+            # A stable sort puts the first person with each name in front of the others
+            order = np.argsort(encoded, kind='stable')
+            keys = encoded[order]
+            first = np.r_[True, keys[1:] != keys[:-1]] if n > 0 else np.zeros(0, dtype=np.bool_)
+            np.save(self._path(kind + '_keys.npy'), keys[first])
+            np.save(self._path(kind + '_indexes.npy'), order[first])
+
+        with open(self._path('store.json'), 'w') as f:
+            json.dump({'version': STORE_VERSION, 'num_people': n, 'num_entries': size}, f)
+
+    def _path(self, name: str) -> str:
+        """Return the path of the file with the given name in the edge store."""
+        return os.path.join(self.directory, name)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['json', 'os', 'numpy', 'compact_graph'],
+        'max-line-length': 100,
+        'allowed-io': ['_ContactColumn.__init__', 'MappedGraph.open',
+                       'EdgeStoreBuilder._write_files'],
+        'disable': ['E1136']
+    })
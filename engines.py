@@ -0,0 +1,542 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Infection Engines Module
+This module contains the engines that decide who becomes infected on each tick of a simulation.
+Every engine follows the same infection model: on each tick, every infected person infects each of
+their neighbours with probability equal to the contact level between them.
+
+Each engine keeps track of who is infected, and is used in two steps per tick:
+    - infect(buffer_infected) marks the people reached on the previous tick as infected.
+    - spread() returns the people reached by an infected person on this tick.
+
+Each engine's state, including its random number generator, can be saved with get_state and
+restored with set_state, so that a run can be stopped and continued with the same outcome.
+
+Each engine can also be given and return people by index, with infect_indexes and
+spread_indexes, which skip turning every person reached into an identifier string. Simulation
+passes the people reached on each tick back to its engine by index, and only turns the people
+newly infected into identifiers when a TickDelta needs them, so headless runs never do.
+ClassicEngine decides its people by identifier, so its index methods only convert them.
+
+With benchmark.benchmark_headless on 10 ** 5 and 10 ** 6 people, a tenth of them infected at the
+start, a tick of Simulation.run_headless takes 0.0038 and 0.046 seconds with VectorizedEngine,
+55 to 60 times faster than the 0.23 and 2.6 seconds it takes with ClassicEngine.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+from __future__ import annotations
+import functools
+import heapq
+import random
+from typing import Optional, Union
+import numpy as np
+import compartments
+import seeding
+from social_graph import Graph
+from compact_graph import CompactGraph, csr_edge_positions, unique_indexes
+
+
+class ClassicEngine:
+    """An infection engine that decides each contact separately, with the random module, using
+    the graph's own people.
+
+    Only the frontier of the infection is checked on each tick: the infected people who still
+    have a neighbour left to infect. Each person's open contacts are only counted once the
+    infection reaches them, so creating the engine reads none of the graph's contacts.
+    """
+    # Private Instance Attributes:
+    #     - _graph: The graph the infection spreads over.
+    #     - _infected: The identifiers of the infected people.
+    #     - _immune: The identifiers of the people who can never be infected.
+    #     - _open_contacts: Maps the identifier of each person counted so far to the number of
+    #       their neighbours who are not infected or immune, and could still be infected by them
+    #       (with a contact level above 0). People are counted when they or a neighbour are first
+    #       infected or immunised.
+    #     - _frontier: The identifiers of the infected people with open contacts, as keys in the
+    #       order they were infected, so the trials are drawn in the same order on every run.
+    #     - _rand: The random number generator used for every infection trial.
+    #     - _identifiers: The identifier of each person, in the order of the graph's people, so
+    #       that the people can also be given by index.
+    #     - _index: Maps the identifier of each person to their index.
+    _graph: Graph
+    _infected: set[str]
+    _immune: set[str]
+    _open_contacts: dict[str, int]
+    _frontier: dict[str, None]
+    _rand: random.Random
+    _identifiers: list[str]
+    _index: dict[str, int]
+
+    def __init__(self, graph: Graph, seed: Union[None, int, random.Random] = None) -> None:
+        """Initialize an engine for graph, with nobody infected. If seed is given, the infection
+        trials are reproducible. seed may also be a random.Random to draw the trials from.
+        """
+        self._graph = graph
+        self._rand = seeding.python_rng(seed)
+        self._infected = set()
+        self._immune = set()
+        self._open_contacts = {}
+        self._frontier = {}
+        self._identifiers = list(graph.get_people())
+        self._index = {identifier: i for i, identifier in enumerate(self._identifiers)}
+
+    def infect(self, identifiers: set[str]) -> set[str]:
+        """Mark the people with the given identifiers as infected, and return the identifiers of
+        those who were not infected or immune already.
+        """
+        newly_infected = identifiers.difference(self._infected, self._immune)
+        self._infected.update(newly_infected)
+
+        for identifier in sorted(newly_infected):
+            self._close_contacts(identifier)
+            if self._count_open_contacts(identifier) > 0:
+                self._frontier[identifier] = None
+
+        return newly_infected
+
+    def immunise(self, identifiers: set[str]) -> None:
+        """Make the people with the given identifiers immune, so that they are never infected.
+        People who are already infected stay infected.
+        """
+        newly_immune = identifiers.difference(self._infected, self._immune)
+        self._immune.update(newly_immune)
+
+        for identifier in sorted(newly_immune):
+            self._close_contacts(identifier)
+
+    def spread(self) -> set[str]:
+        """Return the identifiers of the people reached by an infected person on this tick, who
+        are not infected or immune already.
+        """
+        buffer_infected = set()
+        for person in self._frontier:
+            infect_neighbours(self._graph, person, buffer_infected, self._rand)
+        return buffer_infected.difference(self._infected, self._immune)
+
+    def is_settled(self) -> bool:
+        """Return whether nobody else can ever be infected, since no infected person has a
+        neighbour left to infect.
+        """
+        return not self._frontier
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the state of this engine as a dictionary of arrays, which set_state can restore
+        on an engine for the same graph.
+        """
+        return {'infected': np.array(sorted(self._infected), dtype=np.str_),
+                'frontier': np.array(list(self._frontier), dtype=np.str_),
+                'immune': np.array(sorted(self._immune), dtype=np.str_),
+                'counted': np.array(list(self._open_contacts), dtype=np.str_),
+                'open_contacts': np.array(list(self._open_contacts.values()), dtype=np.int64),
+                'rng_state': np.array(seeding.get_rng_state(self._rand))}
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state of this engine from a dictionary returned by get_state."""
+        self._infected = set(state['infected'].tolist())
+        self._immune = set(state['immune'].tolist())
+        self._frontier = dict.fromkeys(state['frontier'].tolist())
+        self._open_contacts = dict(zip(state['counted'].tolist(),
+                                       state['open_contacts'].tolist()))
+        seeding.set_rng_state(self._rand, str(state['rng_state']))
+
+    def infect_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Mark the people at the given indexes, in the order of the graph's people, as infected,
+        and return the indexes of those who were not infected or immune already.
+
+        The people are still decided by identifier, as in infect, so this is only for callers
+        that work with every engine by index.
+        """
+        return self.to_indexes(self.infect(self.to_identifiers(indexes)))
+
+    def spread_indexes(self) -> np.ndarray:
+        """Return the indexes of the people reached by an infected person on this tick, who are
+        not infected or immune already.
+        """
+        return self.to_indexes(self.spread())
+
+    def to_indexes(self, identifiers: set[str]) -> np.ndarray:
+        """Return the indexes of the people with the given identifiers, in increasing order."""
+        return np.sort(np.fromiter((self._index[identifier] for identifier in identifiers),
+                                   dtype=np.int64, count=len(identifiers)))
+
+    def to_identifiers(self, indexes: np.ndarray) -> set[str]:
+        """Return the identifiers of the people at the given indexes."""
+        return {self._identifiers[i] for i in indexes.tolist()}
+
+    def _close_contacts(self, identifier: str) -> None:
+        """Close the contact of each neighbour with the person with the given identifier, who has
+        just been infected or immunised.
+        """
+        for neighbour in self._graph.get_neighbours(identifier):
+            if self._graph.get_weight(identifier, neighbour.identifier) > 0:
+                self._open_contacts[neighbour.identifier] = \
+                    self._count_open_contacts(neighbour.identifier) - 1
+                # Retire people once all their neighbours are infected or immune
+                if self._open_contacts[neighbour.identifier] == 0:
+                    self._frontier.pop(neighbour.identifier, None)
+
+    def _count_open_contacts(self, identifier: str) -> int:
+        """Return the number of open contacts of the person with the given identifier, counting
+        their contacts with a level above 0 if they have not been counted yet.
+        """
+        if identifier not in self._open_contacts:
+            self._open_contacts[identifier] = sum(
+                1 for level in self._graph.get_people()[identifier].neighbours.values()
+                if level > 0)
+        return self._open_contacts[identifier]
+
+
+class VectorizedEngine:
+    """An infection engine that keeps the infection state in a boolean array and decides every
+    open contact of the infection's frontier at once with NumPy, as in ClassicEngine.
+
+    Graphs that are not already a CompactGraph are frozen into one when the engine is created,
+    so later changes to the graph's contacts are not seen by the engine. The contacts are read one
+    block of rows at a time, as in CompactGraph.contact_blocks, so the engine's memory use grows
+    with the number of people but not with the number of contacts.
+    """
+    # Private Instance Attributes:
+    #     - _compact: The graph the infection spreads over, in compact form.
+    #     - _infected: Whether each person is infected, by index.
+    #     - _immune: Whether each person can never be infected, by index.
+    #     - _open_contacts: The number of neighbours of each person, by index, who are not
+    #       infected or immune, and could still be infected by them (with a contact level above 0).
+    #     - _frontier: The indexes of the infected people with open contacts.
+    #     - _rng: The random number generator used for every infection trial.
+    _compact: CompactGraph
+    _infected: np.ndarray
+    _immune: np.ndarray
+    _open_contacts: np.ndarray
+    _frontier: np.ndarray
+    _rng: np.random.Generator
+
+    def __init__(self, graph: Graph,
+                 seed: Union[None, int, np.random.Generator] = None) -> None:
+        """Initialize an engine for graph, with nobody infected. If seed is given, the infection
+        trials are reproducible. seed may also be a Generator to draw the trials from.
+        """
+        self._compact = graph if isinstance(graph, CompactGraph) else graph.freeze()
+        n = self._compact.num_people()
+
+        self._infected = np.zeros(n, dtype=np.bool_)
+        self._immune = np.zeros(n, dtype=np.bool_)
+        self._open_contacts = self._compact.positive_contact_counts()
+        self._frontier = np.zeros(0, dtype=np.int64)
+        self._rng = seeding.numpy_rng(seed)
+
+    def infect(self, identifiers: set[str]) -> set[str]:
+        """Mark the people with the given identifiers as infected, and return the identifiers of
+        those who were not infected or immune already.
+        """
+        return self.to_identifiers(self.infect_indexes(self.to_indexes(identifiers)))
+
+    def immunise(self, identifiers: set[str]) -> None:
+        """Make the people with the given identifiers immune, so that they are never infected.
+        People who are already infected stay infected.
+        """
+        self.immunise_indexes(self.to_indexes(identifiers))
+
+    def spread(self) -> set[str]:
+        """Return the identifiers of the people reached by an infected person on this tick, who
+        are not infected or immune already.
+        """
+        return self.to_identifiers(self.spread_indexes())
+
+    def is_settled(self) -> bool:
+        """Return whether nobody else can ever be infected, since no infected person has a
+        neighbour left to infect.
+        """
+        return len(self._frontier) == 0
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the state of this engine as a dictionary of arrays, which set_state can restore
+        on an engine for the same graph.
+        """
+        return {'infected': self._infected.copy(),
+                'immune': self._immune.copy(),
+                'open_contacts': self._open_contacts.copy(),
+                'frontier': self._frontier.copy(),
+                'rng_state': np.array(seeding.get_rng_state(self._rng))}
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state of this engine from a dictionary returned by get_state."""
+        self._infected = state['infected'].copy()
+        self._immune = state['immune'].copy()
+        self._open_contacts = state['open_contacts'].copy()
+        self._frontier = state['frontier'].copy()
+        seeding.set_rng_state(self._rng, str(state['rng_state']))
+
+    def infect_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Mark the people at the given indexes as infected, and return the indexes of those who
+        were not infected or immune already.
+        """
+        susceptible = ~self._infected[indexes] & ~self._immune[indexes]
+        newly_infected = unique_indexes(indexes[susceptible])
+        self._infected[newly_infected] = True
+        self._close_contacts(newly_infected)
+
+        frontier = np.concatenate([self._frontier, newly_infected])
+        self._frontier = frontier[self._open_contacts[frontier] > 0]
+        return newly_infected
+
+    def immunise_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Make the people at the given indexes immune, so that they are never infected, and
+        return the indexes of those who were not infected or immune already.
+        """
+        susceptible = ~self._infected[indexes] & ~self._immune[indexes]
+        newly_immune = unique_indexes(indexes[susceptible])
+        self._immune[newly_immune] = True
+        self._close_contacts(newly_immune)
+        return newly_immune
+
+    def spread_indexes(self) -> np.ndarray:
+        """Return the indexes of the people reached by an infected person on this tick, who are
+        not infected or immune already.
+        """
+        indptr, indices, weights = self._compact.to_csr()
+
+        # Gather every contact of the frontier with someone not infected, and try them all at
+        # once, one block of the frontier at a time
+        exposed = np.zeros(len(self._infected), dtype=np.bool_)
+        for block in self._compact.contact_blocks(self._frontier):
+            positions = csr_edge_positions(indptr, block)
+            targets = indices[positions]
+            susceptible = ~self._infected[targets] & ~self._immune[targets]
+            positions, targets = positions[susceptible], targets[susceptible]
+            trials = self._rng.random(len(positions)) < weights[positions]
+            exposed[targets[trials]] = True
+
+        return np.flatnonzero(exposed)
+
+    def _close_contacts(self, indexes: np.ndarray) -> None:
+        """Close the contact of each neighbour with each of the people at the given indexes, who
+        have just been infected or immunised.
+        """
+        indptr, indices, weights = self._compact.to_csr()
+        for block in self._compact.contact_blocks(indexes):
+            positions = csr_edge_positions(indptr, block)
+            positions = positions[weights[positions] > 0]
+            neighbours, counts = np.unique(indices[positions], return_counts=True)
+            self._open_contacts[neighbours] -= counts.astype(np.int32)
+
+        # Retire people once all their neighbours are infected or immune
+        self._frontier = self._frontier[self._open_contacts[self._frontier] > 0]
+
+    def to_indexes(self, identifiers: set[str]) -> np.ndarray:
+        """Return the indexes of the people with the given identifiers."""
+        index = self._compact.get_index_map()
+        return np.fromiter((index[identifier] for identifier in identifiers), dtype=np.int64,
+                           count=len(identifiers))
+
+    def to_identifiers(self, indexes: np.ndarray) -> set[str]:
+        """Return the identifiers of the people at the given indexes."""
+        return {self._compact.get_identifier(i) for i in indexes.tolist()}
+
+
+class EventEngine(VectorizedEngine):
+    """An infection engine that decides each contact once, when its infected person is infected,
+    instead of trying it again on every tick.
+
+    On every tick, a contact with level w infects its neighbour with probability w, so the tick
+    on which it first succeeds follows a geometric distribution. That tick is drawn up front for
+    each contact, and the resulting infection events are processed in time order, so the
+    infections on each tick follow the same distribution as in ClassicEngine and VectorizedEngine
+    while failed trials cost nothing. Events whose person is already infected or immune when their
+    tick comes are dropped.
+    """
+    # Private Instance Attributes:
+    #     - _tick: The number of ticks spread so far.
+    #     - _event_ticks: A heap of the ticks that have infection events waiting.
+    #     - _events: Maps each tick in _event_ticks to the arrays of indexes of the people reached
+    #       on that tick.
+    #     - _pending: The number of waiting events for each person, by index, who is not infected
+    #       or immune.
+    #     - _live: The total number of waiting events for people who are not infected or immune.
+    _tick: int
+    _event_ticks: list[int]
+    _events: dict[int, list[np.ndarray]]
+    _pending: np.ndarray
+    _live: int
+
+    def __init__(self, graph: Graph,
+                 seed: Union[None, int, np.random.Generator] = None) -> None:
+        """Initialize an engine for graph, with nobody infected. If seed is given, the infection
+        events are reproducible. seed may also be a Generator to draw the events from.
+        """
+        super().__init__(graph, seed)
+        self._tick = 0
+        self._event_ticks = []
+        self._events = {}
+        self._pending = np.zeros(self._compact.num_people(), dtype=np.int32)
+        self._live = 0
+
+    def is_settled(self) -> bool:
+        """Return whether nobody else can ever be infected, since no event is waiting for a person
+        who is not infected.
+        """
+        return self._live == 0
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the state of this engine as a dictionary of arrays, which set_state can restore
+        on an engine for the same graph.
+        """
+        state = super().get_state()
+        targets = [np.concatenate(self._events[tick]) for tick in sorted(self._events)]
+        state['tick'] = np.array(self._tick)
+        state['event_ticks'] = np.repeat(np.array(sorted(self._events), dtype=np.int64),
+                                         [len(bucket) for bucket in targets])
+        state['event_targets'] = np.concatenate(targets) if targets \
+            else np.zeros(0, dtype=np.int64)
+        state['pending'] = self._pending.copy()
+        state['live'] = np.array(self._live)
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state of this engine from a dictionary returned by get_state."""
+        super().set_state(state)
+        self._tick = int(state['tick'])
+        self._pending = state['pending'].copy()
+        self._live = int(state['live'])
+
+        event_ticks, targets = state['event_ticks'], state['event_targets']
+        ticks, starts = np.unique(event_ticks, return_index=True)
+        ends = np.r_[starts[1:], len(event_ticks)]
+        self._events = {tick: [targets[start:end]] for tick, start, end
+                        in zip(ticks.tolist(), starts.tolist(), ends.tolist())}
+        self._event_ticks = sorted(self._events)
+
+    def infect_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Mark the people at the given indexes as infected, draw the infection events of their
+        contacts, and return the indexes of those who were not infected or immune already.
+        """
+        susceptible = ~self._infected[indexes] & ~self._immune[indexes]
+        newly_infected = unique_indexes(indexes[susceptible])
+        self._infected[newly_infected] = True
+
+        # Events waiting for the newly infected people will be dropped
+        self._live -= int(self._pending[newly_infected].sum())
+        self._pending[newly_infected] = 0
+
+        indptr, indices, weights = self._compact.to_csr()
+        positions = csr_edge_positions(indptr, newly_infected)
+        targets = indices[positions]
+        positions = positions[(weights[positions] > 0) & ~self._infected[targets]
+                              & ~self._immune[targets]]
+        if len(positions) == 0:
+            return newly_infected
+
+        # Each contact is first tried on the current tick, so a draw of 1 is this tick
+        targets = indices[positions]
+        event_ticks = self._tick - 1 + self._rng.geometric(weights[positions].astype(np.float64))
+
+        order = np.argsort(event_ticks, kind='stable')
+        targets, event_ticks = targets[order], event_ticks[order]
+        starts = np.flatnonzero(np.r_[True, event_ticks[1:] != event_ticks[:-1]])
+        for start, end in zip(starts.tolist(), np.r_[starts[1:], len(targets)].tolist()):
+            tick = int(event_ticks[start])
+            if tick not in self._events:
+                self._events[tick] = []
+                heapq.heappush(self._event_ticks, tick)
+            self._events[tick].append(targets[start:end])
+
+        reached, counts = np.unique(targets, return_counts=True)
+        self._pending[reached] += counts.astype(np.int32)
+        self._live += len(targets)
+        return newly_infected
+
+    def immunise_indexes(self, indexes: np.ndarray) -> np.ndarray:
+        """Make the people at the given indexes immune, so that they are never infected, and
+        return the indexes of those who were not infected or immune already.
+        """
+        newly_immune = super().immunise_indexes(indexes)
+
+        # Events waiting for the newly immune people will be dropped
+        self._live -= int(self._pending[newly_immune].sum())
+        self._pending[newly_immune] = 0
+        return newly_immune
+
+    def spread_indexes(self) -> np.ndarray:
+        """Return the indexes of the people reached by an infected person on this tick, who are
+        not infected or immune already.
+        """
+        reached = np.zeros(0, dtype=np.int64)
+        if self._event_ticks and self._event_ticks[0] == self._tick:
+            heapq.heappop(self._event_ticks)
+            targets = np.concatenate(self._events.pop(self._tick))
+            targets = targets[~self._infected[targets] & ~self._immune[targets]]
+
+            reached, counts = np.unique(targets, return_counts=True)
+            self._pending[reached] -= counts.astype(np.int32)
+            self._live -= len(targets)
+
+        self._tick += 1
+        return reached
+
+
+def sharded_engine(graph: Graph, seed: Union[None, int, np.random.Generator] = None) \
+        -> VectorizedEngine:
+    """Return a sharded.ShardedEngine for graph with a single shard, run in this process.
+
+    It makes the same infections as sharded.run_sharded does with any number of shards and
+    processes for the same seed, so a Simulation with it is the single-process reference for a
+    sharded run.
+    """
+    # The sharded module is built on this one, so it can only be imported once this one is
+    import sharded
+    return sharded.ShardedEngine(graph, seed, num_shards=1, max_workers=1)
+
+
+# Maps the name of each engine, as accepted by Simulation, to its class, or to a function
+# creating it with the right settings
+ENGINES = {'classic': ClassicEngine, 'vectorized': VectorizedEngine, 'event': EventEngine,
+           'seir': compartments.CompartmentEngine,
+           'sirs': functools.partial(compartments.CompartmentEngine,
+                                     immune_ticks=compartments.DEFAULT_IMMUNE_TICKS),
+           'sharded': sharded_engine}
+
+
+def infect_neighbours(graph: Graph, person: str, buffer_infected: set,
+                      rand: Optional[random.Random] = None) -> None:
+    """Loops through all the neighbours of this person object to determine if they will become
+    infected. If the neighbour becomes infected, they are added to buffer_infected.
+
+    The trials are drawn from rand, or from the random module if it is None."""
+    for neighbour in graph.get_neighbours(person):
+        result = determine_infected(graph.get_weight(person, neighbour.identifier), rand)
+        if result:
+            buffer_infected.add(neighbour.identifier)
+
+
+def determine_infected(edge_weight: float, rand: Optional[random.Random] = None) -> bool:
+    """Determine if a node becomes infected using the edge weight between an infected node and a
+    non-infected node, drawing from rand, or from the random module if it is None
+
+    >>> result = determine_infected(1)
+    >>> result
+    True
+    >>> result = determine_infected(0.4)
+    >>> result or not result
+    True
+    """
+    choices = random.choices if rand is None else rand.choices
+    return choices([True, False], weights=(edge_weight, 1 - edge_weight))[0]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['functools', 'heapq', 'random', 'numpy', 'compartments', 'seeding',
+                          'social_graph', 'compact_graph', 'sharded'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,177 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Ensemble Module
+This module contains the runner that repeats a simulation many times on the same graph, across a
+pool of processes, and summarizes the spread over all of the replicates.
+
+A single simulation is only one random outcome. An ensemble runs many replicates without rendering
+anything, and reports the mean and percentiles of the number of infected people after each tick,
+and the distribution of the final number of infected people.
+
+The graph is written to a snapshot once, and each worker process loads it once when it starts, so
+the graph is never sent along with the individual replicates.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+import seeding
+import snapshot
+from compact_graph import CompactGraph
+from engines import VectorizedEngine
+from social_graph import Graph
+
+# The state each worker process loads once, shared by every replicate it runs
+_WORKER_STATE = {}
+
+
+class EnsembleResult:
+    """The summarized outcome of an ensemble of simulation replicates.
+
+    Instance Attributes:
+        - curves: The number of people infected at the end of each tick (column) of each replicate
+        (row), where column 0 is the initial state, as in the frames of Simulation.run.
+
+    Representation Invariants:
+        - self.curves.ndim == 2
+    """
+    curves: np.ndarray
+
+    def __init__(self, curves: np.ndarray) -> None:
+        """Initialize the result of the replicates with the given infection curves."""
+        self.curves = curves
+
+    def num_replicates(self) -> int:
+        """Return the number of replicates in this ensemble."""
+        return self.curves.shape[0]
+
+    def mean_curve(self) -> np.ndarray:
+        """Return the mean number of people infected at the end of each tick."""
+        return self.curves.mean(axis=0)
+
+    def percentile_curve(self, q: float) -> np.ndarray:
+        """Return the q-th percentile of the number of people infected at the end of each tick.
+
+        Preconditions:
+            - 0 <= q <= 100
+        """
+        return np.percentile(self.curves, q, axis=0)
+
+    def final_sizes(self) -> np.ndarray:
+        """Return the number of people infected at the end of each replicate."""
+        return self.curves[:, -1]
+
+    def final_size_distribution(self) -> dict[int, float]:
+        """Return a dictionary mapping each final number of infected people to the fraction of
+        replicates that ended with it.
+
+        >>> result = EnsembleResult(np.array([[1, 2, 4], [1, 1, 1], [1, 3, 4], [1, 2, 2]]))
+        >>> result.final_size_distribution()
+        {1: 0.25, 2: 0.25, 4: 0.5}
+        """
+        sizes, counts = np.unique(self.final_sizes(), return_counts=True)
+        return {size: count / self.num_replicates()
+                for size, count in zip(sizes.tolist(), counts.tolist())}
+
+
+def run_ensemble(graph: Graph, num_infected: int, ticks: int, replicates: int,
+                 seed: Optional[int] = None, max_workers: Optional[int] = None) -> EnsembleResult:
+    """Run replicates simulations of ticks ticks each on graph, starting from num_infected
+    randomly chosen infected people, and return their summarized outcome.
+
+    The replicates run across max_workers processes, or as many as there are processors if it is
+    None, or in this process if it is 1. If seed is given, the result is reproducible.
+
+    Graphs that are not already a CompactGraph are frozen first.
+
+    Preconditions:
+        - 1 <= num_infected <= len(graph.get_people())
+        - ticks >= 0
+        - replicates >= 1
+    """
+    # The seed is fixed here so that every worker derives the same per-replicate streams
+    if seed is None:
+        seed = seeding.fresh_seed()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'graph.snapshot')
+        snapshot.save_snapshot(graph, path)
+        initargs = (path, num_infected, ticks, seed)
+
+        if max_workers == 1:
+            _init_worker(*initargs)
+            curves = [_run_replicate(k) for k in range(replicates)]
+        else:
+            workers = max_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                # Several replicates are sent per task, to keep the overhead per task small
+                chunksize = max(1, replicates // (4 * workers))
+                curves = list(executor.map(_run_replicate, range(replicates),
+                                           chunksize=chunksize))
+
+    return EnsembleResult(np.stack(curves))
+
+
+def _init_worker(path: str, num_infected: int, ticks: int, seed: int) -> None:
+    """Load the graph from the snapshot at path, and the ensemble's parameters, into this worker
+    process.
+    """
+    _WORKER_STATE['graph'] = snapshot.load_snapshot(path)
+    _WORKER_STATE['num_infected'] = num_infected
+    _WORKER_STATE['ticks'] = ticks
+    _WORKER_STATE['seed'] = seed
+
+
+def _run_replicate(k: int) -> np.ndarray:
+    """Run replicate k of the ensemble loaded into this worker process, and return the number of
+    people infected at the end of each tick.
+    """
+    graph: CompactGraph = _WORKER_STATE['graph']
+    ticks = _WORKER_STATE['ticks']
+
+    # Replicate k always draws from the same stream, whichever worker runs it
+    rng = seeding.numpy_rng(_WORKER_STATE['seed'], seeding.REPLICATE_STREAM, k)
+    engine = VectorizedEngine(graph, seed=rng)
+
+    curve = np.zeros(ticks + 1, dtype=np.int64)
+    infected = len(engine.infect_indexes(rng.choice(graph.num_people(),
+                                                    _WORKER_STATE['num_infected'],
+                                                    replace=False)))
+    curve[0] = infected
+
+    # The same steps as each tick of Simulation.run, without rendering
+    buffer_infected = np.zeros(0, dtype=np.int64)
+    for i in range(ticks):
+        infected += len(engine.infect_indexes(buffer_infected))
+        buffer_infected = engine.spread_indexes()
+        curve[i + 1] = infected
+
+        if engine.is_settled():
+            curve[i + 1:] = infected
+            break
+
+    return curve
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'tempfile', 'concurrent.futures', 'numpy', 'seeding', 'snapshot',
+                          'compact_graph', 'engines', 'social_graph'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,421 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Generators Module
+This module contains the functions that generate synthetic populations of any size, from a few
+people to millions, as CompactGraphs.
+
+Every contact model is drawn with NumPy as whole arrays of contacts, and the people and contacts
+are added to the graph with bulk insertions. The models in MODELS are:
+    - 'tree': A random tree, where people join in a random order and each contacts a random
+      person who joined before them.
+    - 'erdos_renyi': Contacts between uniformly random pairs of people.
+    - 'barabasi_albert': Preferential attachment, where people join one at a time and contact
+      people with many contacts more often, giving a few people very many contacts.
+    - 'watts_strogatz': A small world, where people in a ring contact their nearest neighbours
+      and some of those contacts are moved to random people.
+    - 'household': People live in small households where everyone is in contact, and work in
+      larger workplaces where each person has a few random contacts.
+
+Each person gets a unique 6-character id of uppercase letters and digits, and the weights of the
+contacts are drawn from the same ranges as data_processing.get_leveled_weight.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import string
+from typing import Any, Union
+import numpy as np
+import seeding
+from compact_graph import CompactGraph
+from data_processing import LEVEL_RANGES
+
+MODELS = ('tree', 'erdos_renyi', 'barabasi_albert', 'watts_strogatz', 'household')
+
+# The characters of the ids, and the number of characters in each id
+ID_CHARACTERS = string.digits + string.ascii_uppercase
+ID_LENGTH = 6
+
+# The level of contact between the members of a household in the 'household' model, and the
+# default sizes of its households and workplaces
+HOUSEHOLD_LEVEL = 'high'
+DEFAULT_HOUSEHOLD_SIZE = 3.0
+DEFAULT_WORKPLACE_SIZE = 20.0
+DEFAULT_WORKPLACE_CONTACTS = 4
+
+
+def generate_connected_population(n: int, model: str = 'erdos_renyi', level: str = 'medium',
+                                  seed: Union[None, int, np.random.Generator] = None,
+                                  **parameters: Any) -> CompactGraph:
+    """Return a connected CompactGraph of n randomly generated people, with contacts drawn from
+    the given model in MODELS and a random tree joining everyone together.
+
+    parameters are passed on to the model's function in this module, such as mean_degree for
+    'erdos_renyi'. The level, (high, medium, low) determines the range from which the weight of
+    each contact is chosen. If seed is given, the same graph is returned for the same seed.
+
+    Preconditions:
+        - 2 <= n <= len(ID_CHARACTERS) ** ID_LENGTH
+        - model in MODELS
+        - level in {'high', 'medium', 'low'}
+
+    >>> graph = generate_connected_population(1000, 'barabasi_albert', 'low', seed=111)
+    >>> graph.num_people(), len(graph.component_sizes())
+    (1000, 1)
+    """
+    rng = seeding.numpy_rng(seed)
+    graph = CompactGraph()
+    _add_people(graph, n, rng)
+    _add_contacts(graph, *_connected_contacts(n, model, level, rng, parameters))
+    return graph
+
+
+def generate_disconnected_population(n: int, model: str = 'erdos_renyi', level: str = 'medium',
+                                     seed: Union[None, int, np.random.Generator] = None,
+                                     **parameters: Any) -> CompactGraph:
+    """Return a CompactGraph of n randomly generated people, with a larger connected portion as
+    in generate_connected_population and n // 5 loners, some of which are in contact with each
+    other, as in data_processing.generate_disconnected_graph.
+
+    Preconditions:
+        - 10 <= n <= len(ID_CHARACTERS) ** ID_LENGTH
+        - model in MODELS
+        - level in {'high', 'medium', 'low'}
+
+    >>> graph = generate_disconnected_population(1000, 'watts_strogatz', seed=111)
+    >>> max(graph.component_sizes().values())
+    800
+    """
+    rng = seeding.numpy_rng(seed)
+    num_loners = n // 5
+    graph = CompactGraph()
+    _add_people(graph, n, rng)
+
+    sources, targets, weights = _connected_contacts(n - num_loners, model, level, rng, parameters)
+
+    # Adds random contacts between the loners, who come after everyone else
+    times = int(rng.integers(0, num_loners // 2 + 1))
+    loner_sources, loner_targets = unique_pairs(n - num_loners + rng.integers(0, num_loners, times),
+                                                n - num_loners + rng.integers(0, num_loners, times))
+    _add_contacts(graph, np.concatenate([sources, loner_sources]),
+                  np.concatenate([targets, loner_targets]),
+                  np.concatenate([weights, leveled_weights(level, len(loner_sources), rng)]))
+    return graph
+
+
+def tree_contacts(n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Return the contacts of a random tree of n people, as arrays of the indexes of the people at
+    either end of each contact. People join in a random order, and each contacts a uniformly
+    random person who joined before them.
+    """
+    order = rng.permutation(n)
+    earlier = (rng.random(n - 1) * np.arange(1, n)).astype(np.int64)
+    return order[1:], order[earlier]
+
+
+def erdos_renyi_contacts(n: int, rng: np.random.Generator,
+                         mean_degree: float = 4.0) -> tuple[np.ndarray, np.ndarray]:
+    """Return the contacts between uniformly random distinct pairs of n people, with
+    mean_degree contacts per person on average.
+
+    Preconditions:
+        - 0 <= mean_degree < n - 1
+    """
+    num_contacts = int(round(mean_degree * n / 2))
+    sources, targets = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Pairs are drawn with a margin for self-contacts and repeats, until there are enough
+    while len(sources) < num_contacts:
+        extra = num_contacts - len(sources) + num_contacts // 10 + 16
+        sources, targets = unique_pairs(np.concatenate([sources, rng.integers(0, n, extra)]),
+                                        np.concatenate([targets, rng.integers(0, n, extra)]))
+
+    keep = rng.permutation(len(sources))[:num_contacts]
+    return sources[keep], targets[keep]
+
+
+def barabasi_albert_contacts(n: int, rng: np.random.Generator,
+                             attachments: int = 2) -> tuple[np.ndarray, np.ndarray]:
+    """Return the contacts of n people joining one at a time, each contacting attachments people
+    who joined before them, chosen with probability proportional to their number of contacts.
+
+    This is the algorithm of Batagelj and Brandes: every contact chooses a uniformly random end
+    of an earlier contact. Choosing the second end of an earlier contact copies that contact's
+    choice, so the choices are resolved together by following the copies, one step at a time
+    for every contact at once. Repeated choices are merged into one contact.
+
+    Preconditions:
+        - attachments >= 1
+    """
+    # Person v makes contacts v * attachments to (v + 1) * attachments - 1, whose first end is v
+    slots = n * attachments
+    first_ends = np.arange(slots, dtype=np.int64) // attachments
+
+    # Contact i picks one of the 2 * i ends of the contacts before it, or its own first end,
+    # which makes a self-contact that is dropped
+    picks = (rng.random(slots) * (2 * np.arange(slots) + 1)).astype(np.int64)
+    copies = picks % 2 == 1
+    choices = np.where(copies, picks // 2, first_ends[picks // 2])
+
+    # Copies of copies are followed until every choice is a person
+    pending = np.flatnonzero(copies)
+    while len(pending) > 0:
+        copied = choices[pending]
+        choices[pending], copies[pending] = choices[copied], copies[copied]
+        pending = pending[copies[pending]]
+
+    return unique_pairs(first_ends, choices)
+
+
+def watts_strogatz_contacts(n: int, rng: np.random.Generator, neighbours: int = 4,
+                            rewiring: float = 0.1) -> tuple[np.ndarray, np.ndarray]:
+    """Return the contacts of n people in a ring, each in contact with the neighbours people
+    nearest to them, where each contact is moved to a uniformly random person with probability
+    rewiring.
+
+    Preconditions:
+        - 2 <= neighbours < n
+        - 0 <= rewiring <= 1
+    """
+    sources = np.repeat(np.arange(n), neighbours // 2)
+    targets = (sources + np.tile(np.arange(1, neighbours // 2 + 1), n)) % n
+
+    rewired = rng.random(len(targets)) < rewiring
+    targets[rewired] = rng.integers(0, n, int(rewired.sum()))
+    return unique_pairs(sources, targets)
+
+
+def household_contacts(n: int, rng: np.random.Generator,
+                       household_size: float = DEFAULT_HOUSEHOLD_SIZE,
+                       workplace_size: float = DEFAULT_WORKPLACE_SIZE,
+                       workplace_contacts: int = DEFAULT_WORKPLACE_CONTACTS) \
+        -> tuple[np.ndarray, np.ndarray]:
+    """Return the contacts of n people in households and workplaces. The people are split into
+    households of 1 + Poisson(household_size - 1) people, where everyone is in contact, and
+    separately into workplaces of about workplace_size people, where each person contacts
+    workplace_contacts random coworkers.
+
+    Preconditions:
+        - household_size >= 1
+        - workplace_size >= 1
+        - workplace_contacts >= 0
+    """
+    household_sources, household_targets = _household_pairs(n, rng, household_size)
+    workplace_sources, workplace_targets = _workplace_pairs(n, rng, workplace_size,
+                                                            workplace_contacts)
+    return unique_pairs(np.concatenate([household_sources, workplace_sources]),
+                        np.concatenate([household_targets, workplace_targets]))
+
+
+def unique_pairs(sources: np.ndarray, targets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the distinct contacts between the people at the matching positions of sources and
+    targets, without self-contacts and with the smaller index first, in order of their indexes.
+
+    >>> sources, targets = unique_pairs(np.array([3, 1, 2, 0]), np.array([1, 3, 2, 1]))
+    >>> sources.tolist(), targets.tolist()
+    ([0, 1], [1, 3])
+    """
+    sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+    distinct = sources != targets
+    low = np.minimum(sources[distinct], targets[distinct])
+    high = np.maximum(sources[distinct], targets[distinct])
+
+    size = int(high.max(initial=0)) + 1
+    keys = np.sort(_pair_keys(low, high, size))
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return keys // size, keys % size
+
+
+def leveled_weights(level: str, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Return size contact weights drawn uniformly from the range of the given level in
+    data_processing.LEVEL_RANGES.
+
+    Preconditions:
+        - level in {'high', 'medium', 'low'}
+
+    >>> weights = leveled_weights('medium', 1000, np.random.default_rng(111))
+    >>> bool(weights.min() >= 0.45 and weights.max() <= 0.6)
+    True
+    """
+    low, high = LEVEL_RANGES[level]
+    return rng.uniform(low, high, size).astype(np.float32)
+
+
+def generate_ids(n: int, rng: np.random.Generator) -> list[str]:
+    """Return n distinct random ids of ID_LENGTH uppercase letters and digits.
+
+    Preconditions:
+        - n <= len(ID_CHARACTERS) ** ID_LENGTH
+
+    >>> ids = generate_ids(10000, np.random.default_rng(111))
+    >>> len(set(ids)), len(ids[0])
+    (10000, 6)
+    """
+    codes = id_codes(np.arange(n, dtype=np.int64), draw_id_map(rng))
+    return codes.view('S{}'.format(ID_LENGTH)).ravel().astype(str).tolist()
+
+
+def draw_id_map(rng: np.random.Generator) -> tuple[int, int]:
+    """Return a random invertible map of the numbers below len(ID_CHARACTERS) ** ID_LENGTH, as
+    the multiplier and offset taken to id_codes.
+    """
+    space = len(ID_CHARACTERS) ** ID_LENGTH
+
+    # A multiplier sharing no factor with the size of the space makes the map invertible
+    return int(rng.integers(0, space // 6)) * 6 + 1, int(rng.integers(0, space))
+
+
+def id_codes(indexes: np.ndarray, id_map: tuple[int, int]) -> np.ndarray:
+    """Return the ASCII codes of the ids of the people at the given indexes, one row of
+    ID_LENGTH codes per person, for the map returned by draw_id_map.
+
+    Each index is scrambled by the map and written in base len(ID_CHARACTERS), so distinct
+    indexes always have distinct ids, and the id of each index does not depend on the others.
+
+    Preconditions:
+        - all(0 <= i < len(ID_CHARACTERS) ** ID_LENGTH for i in indexes)
+
+    >>> id_map = draw_id_map(np.random.default_rng(111))
+    >>> both, alone = id_codes(np.array([3, 4]), id_map), id_codes(np.array([4]), id_map)
+    >>> both[1].tolist() == alone[0].tolist()
+    True
+    """
+    base = len(ID_CHARACTERS)
+    multiplier, offset = id_map
+    numbers = (indexes.astype(np.int64) * multiplier + offset) % base ** ID_LENGTH
+
+    digits = np.empty((len(indexes), ID_LENGTH), dtype=np.int64)
+    for k in range(ID_LENGTH - 1, -1, -1):
+        numbers, digits[:, k] = np.divmod(numbers, base)
+
+    return np.frombuffer(ID_CHARACTERS.encode('ascii'), dtype=np.uint8)[digits]
+
+
+def generate_names(n: int, rng: np.random.Generator) -> list[str]:
+    """Return n distinct random names of initials, in the style of
+    data_processing.generate_connected_graph. Once all pairs of initials are used, a number is
+    added after them.
+
+    >>> names = generate_names(1000, np.random.default_rng(111))
+    >>> len(set(names))
+    1000
+    """
+    letters = string.ascii_uppercase
+    pairs = len(letters) ** 2
+    order = rng.permutation(max(n, pairs))[:n]
+    return ['{}. {}{}'.format(letters[i % pairs // len(letters)], letters[i % len(letters)],
+                              i // pairs or '') for i in order.tolist()]
+
+
+def _connected_contacts(n: int, model: str, level: str, rng: np.random.Generator,
+                        parameters: dict[str, Any]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the contacts and weights of n connected people, from the given model joined
+    together by a random tree.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    tree_sources, tree_targets = tree_contacts(n, rng)
+
+    # Household contacts are kept apart, since household members are in closer contact
+    if model == 'household':
+        household_sources, household_targets = _household_pairs(
+            n, rng, parameters.get('household_size', DEFAULT_HOUSEHOLD_SIZE))
+        model_sources, model_targets = _workplace_pairs(
+            n, rng, parameters.get('workplace_size', DEFAULT_WORKPLACE_SIZE),
+            parameters.get('workplace_contacts', DEFAULT_WORKPLACE_CONTACTS))
+    elif model == 'tree':
+        household_sources, household_targets = empty, empty
+        model_sources, model_targets = empty, empty
+    else:
+        household_sources, household_targets = empty, empty
+        model_sources, model_targets = MODEL_CONTACTS[model](n, rng, **parameters)
+
+    sources, targets = unique_pairs(
+        np.concatenate([household_sources, model_sources, tree_sources]),
+        np.concatenate([household_targets, model_targets, tree_targets]))
+
+    weights = leveled_weights(level, len(sources), rng)
+    in_household = np.isin(_pair_keys(sources, targets, n),
+                           _pair_keys(household_sources, household_targets, n))
+    weights[in_household] = leveled_weights(HOUSEHOLD_LEVEL, int(in_household.sum()), rng)
+    return sources, targets, weights
+
+
+def _household_pairs(n: int, rng: np.random.Generator,
+                     household_size: float) -> tuple[np.ndarray, np.ndarray]:
+    """Return every pair of people living in the same household, with the smaller index first,
+    for n people split in index order into households of 1 + Poisson(household_size - 1) people.
+    """
+    sizes = 1 + rng.poisson(household_size - 1, n)
+    bounds = np.minimum(np.concatenate([[0], np.cumsum(sizes)]), n)
+    bounds = bounds[:np.searchsorted(bounds, n) + 1]
+    starts, sizes = bounds[:-1], np.diff(bounds)
+
+    # Each member of a household is paired with every later member
+    people = np.arange(n)
+    household_of = np.repeat(np.arange(len(sizes)), sizes)
+    later = (starts + sizes)[household_of] - people - 1
+    sources = np.repeat(people, later)
+    targets = sources + np.arange(len(sources)) - np.repeat(np.cumsum(later) - later, later) + 1
+    return sources, targets
+
+
+def _workplace_pairs(n: int, rng: np.random.Generator, workplace_size: float,
+                     workplace_contacts: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return workplace_contacts contacts for each of n people with random coworkers, for the
+    people split in a random order into workplaces of about workplace_size people. Contacts are
+    not checked for repeats.
+    """
+    order = rng.permutation(n)
+    num_workplaces = max(1, int(round(n / workplace_size)))
+    bounds = np.linspace(0, n, num_workplaces + 1).astype(np.int64)
+    workplace_of = np.repeat(np.arange(num_workplaces), np.diff(bounds))
+    starts, sizes = bounds[workplace_of], np.diff(bounds)[workplace_of]
+
+    # Workplaces are consecutive runs of the order, and each coworker is a random member
+    positions = np.repeat(np.arange(n), workplace_contacts)
+    coworkers = starts[positions] + (rng.random(len(positions))
+                                     * sizes[positions]).astype(np.int64)
+    return order[positions], order[coworkers]
+
+
+def _pair_keys(sources: np.ndarray, targets: np.ndarray, size: int) -> np.ndarray:
+    """Return a single integer key for each pair of indexes below size."""
+    return np.asarray(sources, dtype=np.int64) * size + np.asarray(targets, dtype=np.int64)
+
+
+def _add_people(graph: CompactGraph, n: int, rng: np.random.Generator) -> None:
+    """Add n people with random ids, names, ages and severity levels to graph."""
+    graph.add_vertices_bulk(generate_ids(n, rng), generate_names(n, rng),
+                            rng.integers(18, 56, n), rng.uniform(0, 1, n))
+
+
+def _add_contacts(graph: CompactGraph, sources: np.ndarray, targets: np.ndarray,
+                  weights: np.ndarray) -> None:
+    """Add the distinct contacts between the people at the matching indexes of sources and
+    targets to graph, with the matching weights.
+    """
+    graph.add_edges_bulk(sources.astype(np.int32), targets.astype(np.int32),
+                         weights.astype(np.float32))
+
+
+# Maps the name of each model to the function drawing its contacts
+MODEL_CONTACTS = {'tree': tree_contacts, 'erdos_renyi': erdos_renyi_contacts,
+                  'barabasi_albert': barabasi_albert_contacts,
+                  'watts_strogatz': watts_strogatz_contacts, 'household': household_contacts}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['string', 'numpy', 'seeding', 'compact_graph', 'data_processing'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
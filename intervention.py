@@ -0,0 +1,207 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Intervention Module
+This module contains the functions that rank people by how central they are to a contact network,
+to choose who to immunise before a simulation.
+
+People can be ranked by any of the measures in RANKING_METHODS:
+    - 'degree': Their number of contacts.
+    - 'weighted_degree': The sum of their contact levels.
+    - 'betweenness': Their betweenness centrality, the share of shortest paths between other
+      people that pass through them. It is estimated from the shortest paths leaving a random
+      sample of people, which are searched across a pool of processes.
+
+Rankings are cached for each graph until its people or contacts change, so trying several numbers
+of people to immunise only ranks the graph once.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+import seeding
+from compact_graph import CompactGraph, csr_edge_positions
+from social_graph import Graph
+
+RANKING_METHODS = ('degree', 'weighted_degree', 'betweenness')
+
+# The default number of people whose shortest paths are searched to estimate betweenness
+DEFAULT_BETWEENNESS_SAMPLES = 64
+
+# Maps each graph to a dictionary mapping (version, method, samples, seed) to its ranking
+_RANKING_CACHE = weakref.WeakKeyDictionary()
+
+# The contacts each worker process loads once, shared by every source it searches
+_WORKER_STATE = {}
+
+
+def rank_people(graph: Graph, method: str = 'degree',
+                samples: int = DEFAULT_BETWEENNESS_SAMPLES, seed: Optional[int] = None,
+                max_workers: Optional[int] = None) -> list[str]:
+    """Return the identifiers of the people in graph, from the highest to the lowest score by the
+    given ranking method. People with equal scores keep the order they were added in.
+
+    samples and seed are only used by the 'betweenness' method, which searches from samples
+    randomly chosen people across max_workers processes, as in estimate_betweenness. Rankings
+    with a seed are cached until graph changes.
+
+    Preconditions:
+        - method in RANKING_METHODS
+        - samples >= 1
+
+    >>> graph = Graph()
+    >>> for identifier in ['A', 'B', 'C', 'D']:
+    ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+    >>> graph.add_edge('A', 'B', 0.9)
+    >>> graph.add_edge('B', 'C', 0.1)
+    >>> graph.add_edge('C', 'D', 0.1)
+    >>> rank_people(graph, 'degree')
+    ['B', 'C', 'A', 'D']
+    >>> rank_people(graph, 'weighted_degree')
+    ['B', 'A', 'C', 'D']
+    """
+    key = (graph.get_version(), method, samples if method == 'betweenness' else None, seed)
+    cached = _RANKING_CACHE.setdefault(graph, {})
+    if key in cached:
+        return cached[key]
+
+    compact = graph if isinstance(graph, CompactGraph) else graph.freeze()
+    scores = person_scores(compact, method, samples, seed, max_workers)
+
+    # A stable sort of the negated scores keeps equal people in index order
+    order = np.argsort(-scores, kind='stable')
+    ranking = [compact.get_identifier(i) for i in order.tolist()]
+
+    # Without a seed the betweenness estimate changes on every call, so it is not kept
+    if method != 'betweenness' or seed is not None:
+        for stale in [other for other in cached if other[0] != key[0]]:
+            del cached[stale]
+        cached[key] = ranking
+    return ranking
+
+
+def person_scores(graph: CompactGraph, method: str,
+                  samples: int = DEFAULT_BETWEENNESS_SAMPLES, seed: Optional[int] = None,
+                  max_workers: Optional[int] = None) -> np.ndarray:
+    """Return the score of each person in graph, by index, for the given ranking method.
+
+    Preconditions:
+        - method in RANKING_METHODS
+    """
+    indptr, indices, weights = graph.to_csr()
+    if method == 'degree':
+        return np.diff(indptr).astype(np.float64)
+    elif method == 'weighted_degree':
+        rows = np.repeat(np.arange(graph.num_people()), np.diff(indptr))
+        return np.bincount(rows, weights=weights, minlength=graph.num_people())
+    else:
+        return estimate_betweenness(graph, samples, seed, max_workers)
+
+
+def estimate_betweenness(graph: CompactGraph, samples: int = DEFAULT_BETWEENNESS_SAMPLES,
+                         seed: Optional[int] = None,
+                         max_workers: Optional[int] = None) -> np.ndarray:
+    """Return an estimate of the betweenness centrality of each person in graph, by index,
+    counting contacts as one step each.
+
+    The shortest paths leaving samples randomly chosen people are searched with Brandes'
+    algorithm, and the total is scaled up to all of the people. The searches run across
+    max_workers processes, or as many as there are processors if it is None, or in this process
+    if it is 1.
+
+    >>> graph = CompactGraph()
+    >>> for identifier in ['A', 'B', 'C']:
+    ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+    >>> graph.add_edge('A', 'B', 0.5)
+    >>> graph.add_edge('B', 'C', 0.5)
+    >>> estimate_betweenness(graph, samples=3, max_workers=1).tolist()
+    [0.0, 1.0, 0.0]
+    """
+    n = graph.num_people()
+    indptr, indices, _ = graph.to_csr()
+    sources = seeding.numpy_rng(seed).choice(n, size=min(samples, n), replace=False)
+
+    if max_workers == 1:
+        _init_worker(indptr, indices)
+        total = _search_sources(sources)
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        chunks = [chunk for chunk in np.array_split(sources, workers) if len(chunk) > 0]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(indptr, indices)) as executor:
+            total = sum(executor.map(_search_sources, chunks))
+
+    # Each path was counted from both of its ends, and only the sampled sources were searched
+    return total * n / (2 * len(sources))
+
+
+def _init_worker(indptr: np.ndarray, indices: np.ndarray) -> None:
+    """Load the contacts of the graph being ranked, in CSR form, into this worker process."""
+    _WORKER_STATE['indptr'] = indptr
+    _WORKER_STATE['indices'] = indices
+
+
+def _search_sources(sources: np.ndarray) -> np.ndarray:
+    """Return the sum, over the given sources, of the dependency of each person on the shortest
+    paths leaving that source, for the graph loaded into this worker process.
+    """
+    indptr, indices = _WORKER_STATE['indptr'], _WORKER_STATE['indices']
+    n = len(indptr) - 1
+    total = np.zeros(n, dtype=np.float64)
+
+    for source in sources.tolist():
+        distances = np.full(n, -1, dtype=np.int64)
+        paths = np.zeros(n, dtype=np.float64)
+        distances[source], paths[source] = 0, 1.0
+
+        # Counts the shortest paths to each person one level at a time, keeping the contacts
+        # between consecutive levels for the backward pass
+        levels = []
+        frontier = np.array([source], dtype=np.int64)
+        depth = 0
+        while len(frontier) > 0:
+            positions = csr_edge_positions(indptr, frontier)
+            parents = np.repeat(frontier, indptr[frontier + 1] - indptr[frontier])
+            children = indices[positions].astype(np.int64)
+
+            frontier = np.unique(children[distances[children] == -1])
+            distances[frontier] = depth + 1
+
+            on_paths = distances[children] == depth + 1
+            parents, children = parents[on_paths], children[on_paths]
+            paths += np.bincount(children, weights=paths[parents], minlength=n)
+            levels.append((parents, children))
+            depth += 1
+
+        # Accumulates each person's dependency from the deepest level back to the source
+        dependency = np.zeros(n, dtype=np.float64)
+        for parents, children in reversed(levels):
+            dependency += np.bincount(parents, minlength=n, weights=paths[parents]
+                                      / paths[children] * (1 + dependency[children]))
+
+        dependency[source] = 0
+        total += dependency
+
+    return total
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'weakref', 'concurrent.futures', 'numpy', 'seeding',
+                          'compact_graph', 'social_graph'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
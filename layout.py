@@ -0,0 +1,422 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Layout Module
+This module contains the functions that position the nodes of a networkx graph for rendering.
+
+Layouts are cached on disk under a hash of the graph's topology, so rendering the same graph
+again skips the layout entirely. A graph that shares nearly all of its nodes with a cached one,
+such as one with a few people or contacts added or removed, starts from the cached positions and
+only needs a few rounds to settle.
+
+Graphs of up to SPRING_LAYOUT_SIZE nodes are laid out by networkx's spring layout, as they were
+before. Larger graphs are laid out by a multilevel force-directed layout: the graph is coarsened
+by merging nodes into their neighbours until it is small, the coarsest graph is laid out, and
+each finer graph starts from the positions of the coarser one. The repulsion on each node is
+approximated from the centres of mass of the cells of a grid, as in Barnes-Hut, so every round
+takes time linear in the number of nodes and contacts.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import glob
+import hashlib
+import os
+import tempfile
+from typing import Optional
+import networkx as nx
+import numpy as np
+import seeding
+
+# The default directory the layouts are cached in
+LAYOUT_DIRECTORY = '.layout_cache'
+
+# The number of most recently used layouts kept in a cache directory
+MAX_CACHED_LAYOUTS = 16
+
+# The share of a graph's nodes a cached layout must have for the graph to start from it
+WARM_START_OVERLAP = 0.9
+
+# The largest graph laid out by networkx's spring layout
+SPRING_LAYOUT_SIZE = 1000
+
+# The largest graph the multilevel layout lays out directly, without coarsening it further
+COARSEST_SIZE = 64
+
+# The rounds of forces applied to the coarsest graph, to each finer graph, and when starting
+# from a cached layout
+COARSEST_ITERATIONS = 100
+LEVEL_ITERATIONS = 30
+WARM_ITERATIONS = 15
+
+# The largest number of cells along each side of the repulsion grid
+GRID_SIZE = 12
+
+# The number of nodes whose repulsion is computed at once, which bounds memory use
+CHUNK_SIZE = 2048
+
+
+def graph_layout(graph_nx: nx.Graph, directory: Optional[str] = LAYOUT_DIRECTORY,
+                 seed: Optional[int] = None) -> dict:
+    """Return a dictionary mapping each node of graph_nx to its position, a NumPy array of its x
+    and y coordinates between -1 and 1.
+
+    The layout is read from directory if it was cached there for the same topology, and
+    otherwise computed, starting from the closest cached layout if there is one, and saved there.
+    If directory is None, the layout is always computed from scratch and not saved.
+
+    >>> graph_nx = nx.path_graph(['A', 'B', 'C'])
+    >>> pos = graph_layout(graph_nx, None, 111)
+    >>> sorted(pos) == ['A', 'B', 'C'] and all(abs(pos[node]).max() <= 1 for node in pos)
+    True
+    """
+    nodes, edges = _topology(graph_nx)
+    if not nodes:
+        return {}
+
+    if directory is None:
+        positions = compute_layout(len(nodes), edges, seed=seed)
+    else:
+        path = os.path.join(directory, _hash_topology(nodes, edges) + '.npz')
+        positions = _load_layout(path, nodes)
+        if positions is None:
+            initial = _warm_start(directory, nodes, edges)
+            positions = compute_layout(len(nodes), edges, initial, seed)
+            _save_layout(directory, path, nodes, positions)
+        else:
+            # Marks the layout as recently used, so it is the last to be removed
+            os.utime(path)
+
+    return {node: positions[i] for i, node in enumerate(nodes)}
+
+
+def topology_hash(graph_nx: nx.Graph) -> str:
+    """Return a hash of the nodes and edges of graph_nx, which does not depend on the order
+    they were added in or on their attributes.
+
+    >>> first = nx.Graph([('A', 'B'), ('B', 'C')])
+    >>> second = nx.Graph([('C', 'B'), ('B', 'A')])
+    >>> topology_hash(first) == topology_hash(second)
+    True
+    >>> second.add_edge('A', 'C')
+    >>> topology_hash(first) == topology_hash(second)
+    False
+    """
+    return _hash_topology(*_topology(graph_nx))
+
+
+def compute_layout(num_nodes: int, edges: np.ndarray, initial: Optional[np.ndarray] = None,
+                   seed: Optional[int] = None) -> np.ndarray:
+    """Return a (num_nodes, 2) array of positions between -1 and 1 for the graph on nodes
+    0 to num_nodes - 1 with the given (m, 2) array of edges.
+
+    If initial is given, it is a (num_nodes, 2) array of starting positions that only needs a
+    few rounds of forces to settle.
+
+    Preconditions:
+        - num_nodes >= 1
+        - initial is None or initial.shape == (num_nodes, 2)
+
+    >>> edges = np.array([[0, 1], [1, 2], [2, 3]])
+    >>> positions = compute_layout(4, edges, seed=111)
+    >>> positions.shape
+    (4, 2)
+    >>> bool(np.abs(positions).max() <= 1.0)
+    True
+    """
+    rng = seeding.numpy_rng(seed, seeding.LAYOUT_STREAM)
+    if num_nodes <= SPRING_LAYOUT_SIZE:
+        graph_nx = nx.Graph()
+        graph_nx.add_nodes_from(range(num_nodes))
+        graph_nx.add_edges_from(edges.tolist())
+        if initial is None:
+            pos = getattr(nx, 'spring_layout')(graph_nx, seed=int(rng.integers(2 ** 31)))
+        else:
+            pos = getattr(nx, 'spring_layout')(graph_nx, pos=dict(enumerate(initial)),
+                                               iterations=WARM_ITERATIONS)
+        return _rescale(np.array([pos[i] for i in range(num_nodes)], dtype=float))
+
+    if initial is None:
+        positions = multilevel_layout(num_nodes, edges, rng)
+    else:
+        spacing = 1 / np.sqrt(num_nodes)
+        positions = _relax(_to_unit_box(initial), edges, np.ones(num_nodes), spacing,
+                           3 * spacing, WARM_ITERATIONS)
+    return _rescale(positions)
+
+
+def multilevel_layout(num_nodes: int, edges: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Return a (num_nodes, 2) array of positions for the graph on nodes 0 to num_nodes - 1 with
+    the given (m, 2) array of edges, laid out from its coarsest graph to itself.
+
+    >>> rng = np.random.default_rng(111)
+    >>> multilevel_layout(200, np.array([[i, i + 1] for i in range(199)]), rng).shape
+    (200, 2)
+    """
+    # Coarsens the graph until it is small or no more nodes can be merged
+    levels = []
+    masses = np.ones(num_nodes)
+    while num_nodes > COARSEST_SIZE:
+        labels, num_coarse = coarsen(num_nodes, edges, rng)
+        if num_coarse > 0.9 * num_nodes:
+            break
+        levels.append((labels, masses, edges))
+        edges = _coarse_edges(edges, labels, num_coarse)
+        masses = np.bincount(labels, masses, minlength=num_coarse)
+        num_nodes = num_coarse
+
+    # A graph that could not be coarsened far, such as one of mostly isolated nodes, is too
+    # large for as many rounds as the coarsest graph usually gets
+    spacing = 1 / np.sqrt(num_nodes)
+    iterations = COARSEST_ITERATIONS if num_nodes <= COARSEST_SIZE else LEVEL_ITERATIONS
+    positions = _relax(rng.random((num_nodes, 2)), edges, masses, spacing, 0.1, iterations)
+
+    # Places each finer node near the coarse node it was merged into, then lets the forces
+    # separate it from the others
+    for labels, masses, edges in reversed(levels):
+        spacing = 1 / np.sqrt(len(labels))
+        positions = _to_unit_box(positions)[labels]
+        positions += rng.uniform(-spacing, spacing, positions.shape)
+        positions = _relax(positions, edges, masses, spacing, 3 * spacing, LEVEL_ITERATIONS)
+    return positions
+
+
+def coarsen(num_nodes: int, edges: np.ndarray,
+            rng: np.random.Generator) -> tuple[np.ndarray, int]:
+    """Return the label of the coarse node each of the num_nodes nodes is merged into, and the
+    number of coarse nodes.
+
+    Every node is given a random priority, and is merged into the node of lowest priority among
+    itself and its neighbours, so nodes with no neighbours are never merged.
+
+    >>> labels, num_coarse = coarsen(3, np.array([[0, 1], [1, 2]]), np.random.default_rng(1))
+    >>> num_coarse < 3 and set(labels.tolist()) == set(range(num_coarse))
+    True
+    """
+    priorities = rng.permutation(num_nodes)
+    lowest = priorities.copy()
+    sources = np.concatenate([edges[:, 0], edges[:, 1]])
+    targets = np.concatenate([edges[:, 1], edges[:, 0]])
+    np.minimum.at(lowest, sources, priorities[targets])
+
+    # Numbers the chosen nodes in index order
+    chosen = np.argsort(priorities)[lowest]
+    is_chosen = np.zeros(num_nodes, dtype=bool)
+    is_chosen[chosen] = True
+    numbers = np.cumsum(is_chosen) - 1
+    return numbers[chosen], int(numbers[-1]) + 1
+
+
+def _relax(positions: np.ndarray, edges: np.ndarray, masses: np.ndarray, spacing: float,
+           temperature: float, iterations: int) -> np.ndarray:
+    """Return positions after the given rounds of Fruchterman-Reingold forces, with the ideal
+    distance spacing between neighbours and each node moving at most temperature in the first
+    round and less in every later one.
+
+    Each node repels the others in proportion to its mass, and each edge pulls its two ends
+    together.
+    """
+    positions = positions.astype(float)
+    for iteration in range(iterations):
+        displacements = _repulsion(positions, masses, spacing)
+
+        offsets = positions[edges[:, 0]] - positions[edges[:, 1]]
+        pulls = offsets * np.sqrt((offsets ** 2).sum(axis=1))[:, None] / spacing
+        for axis in range(2):
+            displacements[:, axis] -= np.bincount(edges[:, 0], pulls[:, axis], len(positions))
+            displacements[:, axis] += np.bincount(edges[:, 1], pulls[:, axis], len(positions))
+
+        lengths = np.sqrt((displacements ** 2).sum(axis=1))
+        limit = temperature * (1 - iteration / iterations)
+        scales = np.minimum(lengths, limit) / np.maximum(lengths, 1e-12)
+        positions += displacements * scales[:, None]
+    return positions
+
+
+def _repulsion(positions: np.ndarray, masses: np.ndarray, spacing: float) -> np.ndarray:
+    """Return the repulsion on each node, approximating the nodes in each cell of a grid over
+    positions by their total mass at their centre of mass.
+
+    The node itself is left out of the centre of mass of its own cell.
+    """
+    num_nodes = len(positions)
+    side = int(np.clip(np.sqrt(num_nodes) / 2, 1, GRID_SIZE))
+    lower = positions.min(axis=0)
+    extent = np.maximum(positions.max(axis=0) - lower, 1e-12)
+    cells_xy = np.minimum((positions - lower) / extent * side, side - 1).astype(np.int64)
+    cells = cells_xy[:, 0] * side + cells_xy[:, 1]
+
+    cell_masses = np.bincount(cells, masses, side * side)
+    centres = np.zeros((side * side, 2))
+    occupied = cell_masses > 0
+    for axis in range(2):
+        moments = np.bincount(cells, masses * positions[:, axis], side * side)
+        centres[occupied, axis] = moments[occupied] / cell_masses[occupied]
+
+    # The centre of mass and mass of each node's own cell without the node
+    own_masses = cell_masses[cells] - masses
+    own_centres = (centres[cells] * cell_masses[cells, None] - positions * masses[:, None])
+    own_centres /= np.maximum(own_masses, 1e-12)[:, None]
+
+    # The own cell's term is computed apart from the others, which are summed by a product with
+    # the centres of the cells
+    offsets = positions - own_centres
+    squares = np.maximum((offsets ** 2).sum(axis=1), (spacing / 100) ** 2)
+    forces = offsets * (np.maximum(own_masses, 0) / squares)[:, None]
+    for start in range(0, num_nodes, CHUNK_SIZE):
+        block = positions[start:start + CHUNK_SIZE]
+        squares = np.maximum((block[:, 0, None] - centres[:, 0]) ** 2
+                             + (block[:, 1, None] - centres[:, 1]) ** 2, (spacing / 100) ** 2)
+        strengths = cell_masses / squares
+        strengths[np.arange(len(block)), cells[start:start + CHUNK_SIZE]] = 0
+        forces[start:start + CHUNK_SIZE] += (block * strengths.sum(axis=1)[:, None]
+                                             - strengths @ centres)
+    return forces * spacing ** 2
+
+
+def _coarse_edges(edges: np.ndarray, labels: np.ndarray, num_coarse: int) -> np.ndarray:
+    """Return the distinct edges between different coarse nodes, given the coarse label of each
+    node.
+    """
+    ends = np.sort(labels[edges], axis=1)
+    ends = ends[ends[:, 0] != ends[:, 1]]
+    keys = np.sort(ends[:, 0] * num_coarse + ends[:, 1])
+    if len(keys) > 0:
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return np.stack([keys // num_coarse, keys % num_coarse], axis=1)
+
+
+def _to_unit_box(positions: np.ndarray) -> np.ndarray:
+    """Return positions shifted and scaled to fit the unit square, keeping their proportions."""
+    lower = positions.min(axis=0)
+    return (positions - lower) / max(float((positions.max(axis=0) - lower).max()), 1e-12)
+
+
+def _rescale(positions: np.ndarray) -> np.ndarray:
+    """Return positions centred at the origin and scaled to fit between -1 and 1, as networkx's
+    layouts are.
+    """
+    positions = positions - positions.mean(axis=0)
+    largest = float(np.abs(positions).max())
+    return positions / largest if largest > 0 else positions
+
+
+def _topology(graph_nx: nx.Graph) -> tuple[list, np.ndarray]:
+    """Return the sorted nodes of graph_nx and its (m, 2) array of edges between their indexes,
+    with the smaller index first and the edges sorted.
+    """
+    nodes = sorted(graph_nx.nodes)
+    indexes = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(indexes[u], indexes[v]) for u, v in graph_nx.edges if u != v],
+                     dtype=np.int64).reshape(-1, 2)
+    edges.sort(axis=1)
+    return nodes, edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+
+def _hash_topology(nodes: list, edges: np.ndarray) -> str:
+    """Return the hash of the given sorted nodes and sorted edges between their indexes."""
+    hasher = hashlib.sha256()
+    hasher.update('\n'.join(str(node) for node in nodes).encode('utf-8'))
+    hasher.update(b'\0')
+    hasher.update(edges.astype('<i8').tobytes())
+    return hasher.hexdigest()
+
+
+def _load_layout(path: str, nodes: list) -> Optional[np.ndarray]:
+    """Return the positions cached at path if it is a layout of the given nodes, and None
+    otherwise.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as cached:
+        if cached['names'].tolist() != [str(node) for node in nodes]:
+            return None
+        return cached['positions']
+
+
+def _save_layout(directory: str, path: str, nodes: list, positions: np.ndarray) -> None:
+    """Save the positions of the given nodes to path in directory, and remove the least recently
+    used layouts beyond MAX_CACHED_LAYOUTS.
+
+    The layout is written to a temporary file first, so other processes never read a partly
+    written layout.
+    """
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    with os.fdopen(handle, 'wb') as file:
+        np.savez(file, names=np.array([str(node) for node in nodes]), positions=positions)
+    os.replace(temporary, path)
+
+    for stale in _cached_paths(directory)[MAX_CACHED_LAYOUTS:]:
+        os.remove(stale)
+
+
+def _cached_paths(directory: str) -> list[str]:
+    """Return the paths of the layouts cached in directory, from the most to the least recently
+    used.
+    """
+    paths = glob.glob(os.path.join(directory, '*.npz'))
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def _warm_start(directory: str, nodes: list, edges: np.ndarray) -> Optional[np.ndarray]:
+    """Return starting positions for the given sorted nodes from the cached layout sharing the
+    most of them, or None if no layout shares at least WARM_START_OVERLAP of them.
+
+    Each node missing from the cached layout starts at the average position of its placed
+    neighbours, or at one of the cached positions if it has no path to a placed node.
+    """
+    names = np.array([str(node) for node in nodes])
+    best_shared, best = 0, None
+    for path in _cached_paths(directory):
+        with np.load(path) as cached:
+            _, own, other = np.intersect1d(names, cached['names'], assume_unique=True,
+                                           return_indices=True)
+            if len(own) > best_shared:
+                best_shared, best = len(own), (own, cached['positions'][other])
+
+    if best is None or best_shared < WARM_START_OVERLAP * len(nodes):
+        return None
+
+    positions = np.zeros((len(nodes), 2))
+    placed = np.zeros(len(nodes), dtype=bool)
+    positions[best[0]], placed[best[0]] = best[1], True
+
+    # Spreads the placed positions to the missing nodes one contact at a time
+    sources = np.concatenate([edges[:, 0], edges[:, 1]])
+    targets = np.concatenate([edges[:, 1], edges[:, 0]])
+    while not placed.all():
+        reaching = placed[sources] & ~placed[targets]
+        if not reaching.any():
+            missing = np.flatnonzero(~placed)
+            positions[missing] = best[1][np.arange(len(missing)) % len(best[1])]
+            break
+        counts = np.bincount(targets[reaching], minlength=len(nodes))
+        reached = counts > 0
+        for axis in range(2):
+            sums = np.bincount(targets[reaching], positions[sources[reaching], axis],
+                               len(nodes))
+            positions[reached, axis] = sums[reached] / counts[reached]
+        placed |= reached
+    return positions
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
+
+    import python_ta.contracts
+
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['glob', 'hashlib', 'os', 'tempfile', 'networkx', 'numpy', 'seeding'],
+        'max-line-length': 100,
+        'allowed-io': ['graph_layout', '_load_layout', '_save_layout', '_warm_start'],
+        'disable': ['E1136']
+    })
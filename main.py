@@ -9,35 +9,46 @@ Copyright and Usage Information
 ===============================
 This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
 """
+from typing import Optional
 import visualization
 import data_processing
-import random
+import seeding
 from simulation import Simulation
+from social_graph import Graph
 import menu
 
 
 ###########################################################
 # csv runners
 ###########################################################
-def run_degrees_graph_csv(persons_dataset: str, connections_dataset: str) -> None:
+def run_degrees_graph_csv(persons_dataset: str, connections_dataset: str,
+                          seed: Optional[int] = None) -> None:
     """Run the example degrees risk visualization using the graph of people loaded from
     a csv file. Example datasets can be found in 'data/persons.csv' and 'data/connections.csv'
+
+    If seed is given, the same person is chosen as the initially infected for the same seed.
+    Invalid rows in the datasets are left out and summarized.
     """
-    graph = data_processing.load_graph_csv(persons_dataset, connections_dataset)
-    init_infected = {random.choice(list(graph.get_people()))}
+    graph = _load_csv(persons_dataset, connections_dataset)
+    rand = seeding.python_rng(seed, seeding.INITIAL_STREAM)
+    init_infected = {rand.choice(list(graph.get_people()))}
 
     visualization.render_degrees_apart(graph, init_infected)
 
 
-def run_simulation_csv(persons_dataset: str, connections_dataset: str) -> None:
+def run_simulation_csv(persons_dataset: str, connections_dataset: str,
+                       seed: Optional[int] = None) -> None:
     """Run the simulation using a graph of people loaded from the csv files. The level of contact
     between people is automatically set to 'medium'. Example datasets can be found in
     'data/persons.csv' and 'data/connections.csv'
 
+    If seed is given, the simulation is the same for the same seed. Invalid rows in the datasets
+    are left out and summarized.
+
     Preconditions:
         - the number of rows in persons_dataset is greater than 1
     """
-    graph = data_processing.load_graph_csv(persons_dataset, connections_dataset)
+    graph = _load_csv(persons_dataset, connections_dataset)
 
     # Update these conditions accordingly if sample datasets deviate from original
     conditions = (len(graph.get_people()),  # Number of people in graph
@@ -45,10 +56,20 @@ def run_simulation_csv(persons_dataset: str, connections_dataset: str) -> None:
                   1,  # Number of initially infected people
                   'no'  # Whether the graph is connected or not
                   )
-    sim = Simulation(conditions, graph)
+    sim = Simulation(conditions, graph, seed=seed)
     sim.run(10, with_degrees=True)
 
 
+def _load_csv(persons_dataset: str, connections_dataset: str) -> Graph:
+    """Return the graph loaded from the csv files, printing a summary of any rows that were left
+    out because they were invalid.
+    """
+    graph, report = data_processing.load_graph_csv_bulk(persons_dataset, connections_dataset)
+    if report.total_skipped() > 0:
+        print(report)
+    return graph
+
+
 ###########################################################
 # data generation runners
 ###########################################################
@@ -58,20 +79,24 @@ def open_gui_menu() -> None:
     menu.run_interface()
 
 
-def run_degrees_graph_generated(n: int = 50) -> None:
+def run_degrees_graph_generated(n: int = 50, seed: Optional[int] = None) -> None:
     """Run the example degrees risk visualization using a randomly generated graph of n people. One
-    person is randomly chosen as the initially infected.
+    person is randomly chosen as the initially infected. If seed is given, the graph and the
+    initially infected person are the same for the same seed.
 
     Preconditions:
         - 10 < n <= 60
     """
-    graph = data_processing.generate_connected_graph(n)
-    init_infected = {random.choice(list(graph.get_people()))}
+    graph = data_processing.generate_connected_graph(
+        n, seed=seeding.derive_seed(seed, seeding.GRAPH_STREAM))
+    rand = seeding.python_rng(seed, seeding.INITIAL_STREAM)
+    init_infected = {rand.choice(list(graph.get_people()))}
     visualization.render_degrees_apart(graph, init_infected)
 
 
 def run_simulation_no_degrees_preview(
-        sim_conditions: tuple[int, str, int, str] = (50, 'medium', 1, 'yes')) -> None:
+        sim_conditions: tuple[int, str, int, str] = (50, 'medium', 1, 'yes'),
+        seed: Optional[int] = None) -> None:
     """Run the simulation with the given conditions. This simulation does not show the degrees
     of separation between nodes.
 
@@ -80,6 +105,7 @@ def run_simulation_no_degrees_preview(
         - sim_conditions[1] is the level of contact between people (edge weights)
         - sim_conditions[2] is the number of initially infected people
         - sim_conditions[3] is whether the graph is connected
+        - seed makes the simulation the same for the same seed, if it is given
 
     Preconditions:
         - 10 < sim_conditions[0] <= 60
@@ -87,12 +113,13 @@ def run_simulation_no_degrees_preview(
         - 1 <= sim_conditions[2] <= sim_conditions[0]
         - sim_conditions[3] == 'yes' or sim_conditions[3] == 'no'
     """
-    sim = Simulation(sim_conditions)
+    sim = Simulation(sim_conditions, seed=seed)
     sim.run(21)
 
 
 def run_simulation_with_degrees_preview(
-        sim_conditions: tuple[int, str, int, str] = (50, 'medium', 1, 'yes')) -> None:
+        sim_conditions: tuple[int, str, int, str] = (50, 'medium', 1, 'yes'),
+        seed: Optional[int] = None) -> None:
     """Run the simulation with the given conditions. This simulation previews the degrees
     of separation between nodes.
 
@@ -101,6 +128,7 @@ def run_simulation_with_degrees_preview(
         - sim_conditions[1] is the level of contact between people (edge weights)
         - sim_conditions[2] is the number of initially infected people
         - sim_conditions[3] is whether the graph is connected
+        - seed makes the simulation the same for the same seed, if it is given
 
     Preconditions:
         - 10 < sim_conditions[0] <= 60
@@ -108,7 +136,7 @@ def run_simulation_with_degrees_preview(
         - 1 <= sim_conditions[2] <= sim_conditions[0]
         - sim_conditions[3] == 'yes' or sim_conditions[3] == 'no'
     """
-    sim = Simulation(sim_conditions)
+    sim = Simulation(sim_conditions, seed=seed)
     sim.run(21, with_degrees=True)
 
 
@@ -0,0 +1,127 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Seeding Module
+This module contains the functions that turn a seed into the random number generators used by
+the graph generators, infection engines, simulations and ensembles.
+
+Streams are counter-based: the generator for a seed and a tuple of keys depends only on those
+values, never on how many other generators were made before it or in which process or thread.
+For example, replicate k of an ensemble with a given seed draws from the stream
+(seed, REPLICATE_STREAM, k), so it gives the same result whether it runs on its own or in a pool.
+
+A seed of None gives fresh, unreproducible generators.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import json
+import random
+from typing import Optional, Union
+import numpy as np
+
+# The first key of the stream used for each purpose
+GRAPH_STREAM = 0
+INITIAL_STREAM = 1
+ENGINE_STREAM = 2
+REPLICATE_STREAM = 3
+DATASET_STREAM = 4
+LAYOUT_STREAM = 5
+RANKING_STREAM = 6
+
+
+def derive_seed(seed: Optional[int], *keys: int) -> Optional[int]:
+    """Return the seed of the stream for the given keys under seed, or None if seed is None.
+
+    >>> derive_seed(111, ENGINE_STREAM) == derive_seed(111, ENGINE_STREAM)
+    True
+    >>> derive_seed(111, REPLICATE_STREAM, 0) == derive_seed(111, REPLICATE_STREAM, 1)
+    False
+    >>> derive_seed(None, ENGINE_STREAM) is None
+    True
+    """
+    if seed is None:
+        return None
+    state = np.random.SeedSequence(seed, spawn_key=keys).generate_state(2, dtype=np.uint64)
+    return int.from_bytes(state.tobytes(), 'little')
+
+
+def python_rng(seed: Union[None, int, random.Random], *keys: int) -> random.Random:
+    """Return the random.Random for the stream of the given keys under seed. If seed is already a
+    random.Random, it is returned as it is.
+
+    >>> python_rng(111, GRAPH_STREAM).random() == python_rng(111, GRAPH_STREAM).random()
+    True
+    """
+    if isinstance(seed, random.Random):
+        return seed
+    return random.Random(derive_seed(seed, *keys))
+
+
+def numpy_rng(seed: Union[None, int, np.random.Generator], *keys: int) -> np.random.Generator:
+    """Return the NumPy Generator for the stream of the given keys under seed. If seed is already
+    a Generator, it is returned as it is.
+
+    >>> first, second = numpy_rng(111, REPLICATE_STREAM, 4), numpy_rng(111, REPLICATE_STREAM, 4)
+    >>> first.random() == second.random()
+    True
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(derive_seed(seed, *keys))
+
+
+def get_rng_state(rng: Union[random.Random, np.random.Generator]) -> str:
+    """Return the state of rng as a string, which set_rng_state can restore.
+
+    >>> rng = python_rng(111)
+    >>> state = get_rng_state(rng)
+    >>> first = rng.random()
+    >>> set_rng_state(rng, state)
+    >>> rng.random() == first
+    True
+    """
+    if isinstance(rng, random.Random):
+        return json.dumps(rng.getstate())
+    return json.dumps(rng.bit_generator.state)
+
+
+def set_rng_state(rng: Union[random.Random, np.random.Generator], state: str) -> None:
+    """Restore the state of rng from a string returned by get_rng_state.
+
+    >>> rng = numpy_rng(111)
+    >>> state = get_rng_state(rng)
+    >>> first = rng.random()
+    >>> set_rng_state(rng, state)
+    >>> rng.random() == first
+    True
+    """
+    if isinstance(rng, random.Random):
+        version, internal_state, gauss_next = json.loads(state)
+        rng.setstate((version, tuple(internal_state), gauss_next))
+    else:
+        rng.bit_generator.state = json.loads(state)
+
+
+def fresh_seed() -> int:
+    """Return a new random seed, for runs that must share one seed across processes without being
+    given one.
+    """
+    return int(np.random.SeedSequence().entropy)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['json', 'random', 'numpy'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,366 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Sharded Module
+This module contains an infection engine that splits each tick's infection trials across a pool
+of processes, for contact graphs too large for one core.
+
+The people are partitioned into shards: the connected components are laid out one after another,
+each in breadth-first order from its first person, and the layout is cut into pieces with equal
+numbers of contacts. Only the components that a cut falls inside are split, and only between
+two levels of their search, so few contacts cross between shards.
+
+The contacts and the infection state are kept in shared memory, which every worker process maps
+once. On each tick, every worker tries the open contacts of the infected people in its shard and
+marks the people they reach in a shared array, and the marks are only gathered once every shard
+has finished the tick.
+
+Instead of drawing from one random number generator, the trial of each contact on each tick uses
+a number hashed from the seed, the tick and the contact's position in the graph. The trials do not
+depend on which process runs them or in what order, so a run gives exactly the same result for
+any number of shards or processes, including a single process. These are separate random streams
+from VectorizedEngine's, so for the same seed a ShardedEngine infects different people than the
+'vectorized' engine does, with the same probabilities.
+
+Simulation can select the 'sharded' engine, which runs a single shard in its own process and so
+is the reference that a run_sharded run across many processes reproduces. Runs across several
+processes go through run_sharded or the engine directly, since its worker processes must be
+closed once a run ends.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+from __future__ import annotations
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Optional, Union
+import numpy as np
+import seeding
+from compact_graph import CompactGraph, csr_edge_positions
+from engines import VectorizedEngine
+from simulation import NEVER_INFECTED, SimulationResult
+from social_graph import Graph
+
+# The constants of the splitmix64 hash, which turns counters into uniform random numbers
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+
+# The shared arrays each worker process maps once, shared by every tick it runs
+_WORKER_STATE = {}
+
+
+class ShardedEngine(VectorizedEngine):
+    """An infection engine that tries the open contacts of each shard of the people in a separate
+    process, over infection state kept in shared memory.
+
+    It keeps the same frontier as VectorizedEngine, so infect_indexes and is_settled work the
+    same way, but every trial is decided by edge_uniforms, so the same seed always gives the same
+    infections, whatever the number of shards and processes.
+
+    The worker processes and shared memory are released by close, or when the engine is garbage
+    collected.
+    """
+    # Private Instance Attributes:
+    #     - _key: The 64-bit key hashed into every trial.
+    #     - _tick: The number of ticks spread so far.
+    #     - _shards: The shard of each person, by index.
+    #     - _num_shards: The number of shards.
+    #     - _reached: Whether each person, by index, was reached on the current tick.
+    #     - _frontier_buffer: The frontier, ordered by shard, for the workers to read.
+    #     - _executor: The pool of worker processes, or None if the shards run in this process.
+    #     - _state: The arrays the shards are run over, for the shards run in this process.
+    #     - _release: Releases the worker processes and shared memory.
+    _key: int
+    _tick: int
+    _shards: np.ndarray
+    _num_shards: int
+    _reached: np.ndarray
+    _frontier_buffer: np.ndarray
+    _executor: Optional[ProcessPoolExecutor]
+    _state: dict[str, Any]
+    _release: weakref.finalize
+
+    def __init__(self, graph: Graph, seed: Union[None, int, np.random.Generator] = None,
+                 num_shards: Optional[int] = None, max_workers: Optional[int] = None) -> None:
+        """Initialize an engine for graph, with nobody infected, split into num_shards shards.
+
+        The shards run across max_workers processes, or as many as there are processors if it is
+        None, or in this process if it is 1. num_shards defaults to the number of processes. If
+        seed is given, the infections are reproducible.
+
+        Preconditions:
+            - num_shards is None or num_shards >= 1
+        """
+        super().__init__(graph, seed)
+        workers = 1 if max_workers == 1 else max_workers or os.cpu_count() or 1
+        self._num_shards = num_shards or workers
+        self._key = int(self._rng.integers(0, 2 ** 64, dtype=np.uint64))
+        self._tick = 0
+        self._shards = partition_people(self._compact, self._num_shards)
+
+        indptr, indices, weights = self._compact.to_csr()
+        n = self._compact.num_people()
+        arrays = {'indptr': indptr, 'indices': indices, 'weights': weights,
+                  'infected': self._infected, 'immune': self._immune,
+                  'reached': np.zeros(n, dtype=np.bool_),
+                  'frontier': np.zeros(n, dtype=np.int64)}
+
+        memories = []
+        if max_workers == 1:
+            self._executor = None
+            self._state = arrays
+        else:
+            descriptors = {}
+            self._state = {}
+            for name, array in arrays.items():
+                memory, shared = _share(array)
+                memories.append(memory)
+                descriptors[name] = (memory.name, shared.shape, shared.dtype.str)
+                self._state[name] = shared
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                 initargs=(descriptors,))
+
+        # The engine's own state is kept in the arrays the shards read and write
+        self._infected, self._immune = self._state['infected'], self._state['immune']
+        self._reached, self._frontier_buffer = self._state['reached'], self._state['frontier']
+        self._release = weakref.finalize(self, _release, self._executor, memories)
+
+    def close(self) -> None:
+        """Shut down the worker processes and release the shared memory of this engine."""
+        self._release()
+
+    def __enter__(self) -> ShardedEngine:
+        """Return this engine, to be closed at the end of a with statement."""
+        return self
+
+    def __exit__(self, *exception: Any) -> None:
+        """Close this engine at the end of a with statement."""
+        self.close()
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the state of this engine as a dictionary of arrays, which set_state can restore
+        on an engine for the same graph.
+        """
+        state = super().get_state()
+        state['key'] = np.array(self._key, dtype=np.uint64)
+        state['tick'] = np.array(self._tick)
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the state of this engine from a dictionary returned by get_state."""
+        # The infection state is copied into the shared arrays, which the workers keep reading
+        self._infected[:] = state['infected']
+        self._immune[:] = state['immune']
+        self._open_contacts = state['open_contacts'].copy()
+        self._frontier = state['frontier'].copy()
+        seeding.set_rng_state(self._rng, str(state['rng_state']))
+        self._key = int(state['key'])
+        self._tick = int(state['tick'])
+
+    def spread_indexes(self) -> np.ndarray:
+        """Return the indexes of the people reached by an infected person on this tick, who are
+        not infected or immune already.
+        """
+        # Each shard reads its own slice of the frontier
+        shards = self._shards[self._frontier]
+        order = np.argsort(shards, kind='stable')
+        self._frontier_buffer[:len(order)] = self._frontier[order]
+        bounds = np.searchsorted(shards[order], np.arange(self._num_shards + 1)).tolist()
+
+        tasks = [(self._key, self._tick, start, end) for start, end in zip(bounds, bounds[1:])
+                 if start < end]
+        if self._executor is None:
+            for task in tasks:
+                _spread_shard(self._state, *task)
+        else:
+            # Waiting for every shard is the tick boundary, after which all the marks are in place
+            list(self._executor.map(_spread_shard_in_worker, tasks))
+
+        reached = np.flatnonzero(self._reached)
+        self._reached[reached] = False
+        self._tick += 1
+        return reached
+
+
+def partition_people(graph: CompactGraph, num_shards: int) -> np.ndarray:
+    """Return the shard of each person in graph, by index, splitting the people into num_shards
+    shards with about the same number of contacts each.
+
+    The connected components are laid out one after another, each in breadth-first order from its
+    first person, and the layout is cut where the running number of contacts (counting one more
+    for each person, so that people without contacts are spread too) passes each multiple of the
+    total over num_shards.
+
+    Preconditions:
+        - num_shards >= 1
+
+    >>> graph = CompactGraph()
+    >>> for identifier in ['A', 'B', 'C', 'D']:
+    ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+    >>> graph.add_edge('A', 'B', 0.5)
+    >>> graph.add_edge('C', 'D', 0.5)
+    >>> partition_people(graph, 2).tolist()
+    [0, 0, 1, 1]
+    """
+    n = graph.num_people()
+    indptr, indices, _ = graph.to_csr()
+    labels = graph.component_labels()
+
+    # Every component is searched from its first person at once
+    depths = np.full(n, -1, dtype=np.int64)
+    frontier = np.flatnonzero(labels == np.arange(n))
+    depths[frontier] = 0
+    depth = 0
+    while len(frontier) > 0:
+        neighbours = indices[csr_edge_positions(indptr, frontier)].astype(np.int64)
+        frontier = np.unique(neighbours[depths[neighbours] == -1])
+        depth += 1
+        depths[frontier] = depth
+
+    order = np.lexsort((depths, labels))
+    loads = np.diff(indptr)[order] + 1
+    before = np.cumsum(loads) - loads
+
+    shards = np.zeros(n, dtype=np.int32)
+    shards[order] = np.minimum(before * num_shards // max(int(loads.sum()), 1), num_shards - 1)
+    return shards
+
+
+def edge_uniforms(key: int, tick: int, positions: np.ndarray) -> np.ndarray:
+    """Return a uniform random number in [0, 1) for the contact at each of the given positions in
+    the CSR indices array, on the given tick, under the given 64-bit key.
+
+    The numbers come from the splitmix64 hash of the key, tick and position, so they depend on
+    nothing else.
+
+    >>> first = edge_uniforms(111, 3, np.array([0, 5, 9]))
+    >>> second = edge_uniforms(111, 3, np.array([9, 5]))
+    >>> first[[2, 1]].tolist() == second.tolist()
+    True
+    >>> bool(np.all((0 <= first) & (first < 1)))
+    True
+    """
+    with np.errstate(over='ignore'):
+        tick_key = _splitmix64(np.array([key], dtype=np.uint64)
+                               + np.uint64(tick) * _GOLDEN_GAMMA)
+        hashed = _splitmix64(tick_key + positions.astype(np.uint64) * _GOLDEN_GAMMA)
+    return (hashed >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def run_sharded(graph: Graph, num_infected: int, ticks: int, seed: Optional[int] = None,
+                num_shards: Optional[int] = None,
+                max_workers: Optional[int] = None) -> SimulationResult:
+    """Run a simulation of ticks ticks on graph with a ShardedEngine, starting from num_infected
+    randomly chosen infected people, and return its result.
+
+    The initially infected people are chosen as in Simulation for the same seed. The result is
+    the same for every num_shards and max_workers.
+
+    Preconditions:
+        - 1 <= num_infected <= len(graph.get_people())
+        - ticks >= 0
+    """
+    compact = graph if isinstance(graph, CompactGraph) else graph.freeze()
+    rand = seeding.python_rng(seed, seeding.INITIAL_STREAM)
+    index = compact.get_index_map()
+    initial = np.array([index[identifier]
+                        for identifier in rand.sample(list(compact.get_people()), num_infected)],
+                       dtype=np.int64)
+
+    tick_infected = np.full(compact.num_people(), NEVER_INFECTED, dtype=np.int16)
+    with ShardedEngine(compact, seeding.derive_seed(seed, seeding.ENGINE_STREAM), num_shards,
+                       max_workers) as engine:
+        tick_infected[engine.infect_indexes(initial)] = 0
+
+        # The same steps as each tick of Simulation.run_headless
+        buffer_infected = np.zeros(0, dtype=np.int64)
+        for i in range(ticks):
+            tick_infected[engine.infect_indexes(buffer_infected)] = i + 1
+            buffer_infected = engine.spread_indexes()
+
+            if len(buffer_infected) == 0 and engine.is_settled():
+                break
+
+    return SimulationResult(compact.get_identifiers(), tick_infected, ticks)
+
+
+def _splitmix64(values: np.ndarray) -> np.ndarray:
+    """Return the splitmix64 hash of each of the given 64-bit values."""
+    values = values + _GOLDEN_GAMMA
+    values = (values ^ (values >> np.uint64(30))) * _MIX_MULTIPLIER_1
+    values = (values ^ (values >> np.uint64(27))) * _MIX_MULTIPLIER_2
+    return values ^ (values >> np.uint64(31))
+
+
+def _share(array: np.ndarray) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Return a new block of shared memory holding a copy of array, and the array it holds.
+
+    The contacts of an edge_store.MappedGraph are read into the shared memory from disk.
+    """
+    array = np.asarray(array)
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+    shared[:] = array
+    return memory, shared
+
+
+def _release(executor: Optional[ProcessPoolExecutor],
+             memories: list[shared_memory.SharedMemory]) -> None:
+    """Shut down executor, if there is one, and free the given blocks of shared memory."""
+    if executor is not None:
+        executor.shutdown()
+    for memory in memories:
+        memory.close()
+        memory.unlink()
+
+
+def _init_worker(descriptors: dict[str, tuple[str, tuple, str]]) -> None:
+    """Map the shared arrays of an engine, described by the name of their shared memory, their
+    shape and their dtype, into this worker process.
+    """
+    for name, (memory_name, shape, dtype) in descriptors.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        # The memory is kept open for as long as the worker uses its array
+        _WORKER_STATE[name + '_memory'] = memory
+        _WORKER_STATE[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf)
+
+
+def _spread_shard_in_worker(task: tuple[int, int, int, int]) -> None:
+    """Run _spread_shard for task over the shared arrays mapped into this worker process."""
+    _spread_shard(_WORKER_STATE, *task)
+
+
+def _spread_shard(state: dict[str, Any], key: int, tick: int, start: int, end: int) -> None:
+    """Try every open contact of the infected people in positions start to end of the frontier
+    array of state, on the given tick, and mark the people they reach in its reached array.
+    """
+    indptr, indices, weights = state['indptr'], state['indices'], state['weights']
+
+    positions = csr_edge_positions(indptr, state['frontier'][start:end])
+    targets = indices[positions]
+    positions = positions[~state['infected'][targets] & ~state['immune'][targets]]
+    trials = edge_uniforms(key, tick, positions) < weights[positions]
+
+    # Shards may reach the same person, but they only ever set the mark
+    state['reached'][indices[positions[trials]]] = True
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'weakref', 'concurrent.futures', 'multiprocessing', 'numpy',
+                          'seeding', 'compact_graph', 'engines', 'simulation', 'social_graph'],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -5,18 +5,145 @@ Module Description
 Simulation Module
 This module contains the dataclasses and their methods needed to create the simulation.
 
+Simulation.iter_ticks yields the change over each tick as soon as it is made, so a renderer, a file
+writer or a live display can consume a simulation tick by tick; Simulation.run renders its frames
+from it.
+
+Simulations can also run headless, without networkx layouts or plotly figures, returning a
+SimulationResult that can be rendered later with visualization.render_simulation_result. Plotly
+is only imported when a simulation is rendered, so headless batch runs never load it. Long
+headless runs can save checkpoints, and continue from the latest one with Simulation.resume.
+
+Before a simulation runs, chosen people can be immunised, such as the people ranked highest by one
+of the measures in the intervention module.
+
 Copyright and Usage Information
 ===============================
 This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
 """
-from typing import Optional
-import random
-import networkx as nx
-import plotly.graph_objects as go
+from __future__ import annotations
+import os
+from typing import Iterator, Mapping, Optional, TYPE_CHECKING, Union
+import numpy as np
 import data_processing
-import visualization as vis
+import engines
+import intervention
+import seeding
+import snapshot
+from compartments import CompartmentEngine, EXPOSED, INFECTIOUS, RECOVERED, SUSCEPTIBLE
 from social_graph import Graph
 
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# determine_infected moved to the engines module, and is kept here for code that still imports it
+# from this one
+determine_infected = engines.determine_infected
+
+# The tick recorded in SimulationResult.tick_infected for people who were never infected
+NEVER_INFECTED = -1
+
+# The checkpoint format version, and the files saved in a checkpoint directory
+CHECKPOINT_VERSION = 2
+CHECKPOINT_FILE = 'checkpoint.npz'
+CHECKPOINT_GRAPH_FILE = 'graph.snapshot'
+
+# The name of each compartment in the counts of a TickDelta
+COMPARTMENT_NAMES = {'susceptible': SUSCEPTIBLE, 'exposed': EXPOSED, 'infectious': INFECTIOUS,
+                     'recovered': RECOVERED}
+
+
+class SimulationResult:
+    """The outcome of a headless simulation, as a time series of who was infected on which tick.
+
+    Tick 0 is the initial state, and tick t is the state at the end of the t-th tick, matching
+    the frames of Simulation.run.
+
+    Instance Attributes:
+        - identifiers: The identifiers of the people in the simulation, in index order.
+        - infected_counts: The total number of people infected at each tick.
+        - new_infections: The number of people newly infected on each tick.
+        - tick_infected: The tick on which each person, by index, was infected, or
+        NEVER_INFECTED if they never were.
+
+    Representation Invariants:
+        - len(self.infected_counts) == len(self.new_infections)
+        - len(self.tick_infected) == len(self.identifiers)
+        - self.tick_infected.dtype == np.int16
+    """
+    identifiers: list[str]
+    infected_counts: np.ndarray
+    new_infections: np.ndarray
+    tick_infected: np.ndarray
+
+    def __init__(self, identifiers: list[str], tick_infected: np.ndarray, ticks: int) -> None:
+        """Initialize the result of a simulation of the given number of ticks, in which the
+        person at each index of identifiers was infected on the tick at the same index of
+        tick_infected.
+
+        >>> result = SimulationResult(['a', 'b', 'c'], np.array([0, 2, -1], dtype=np.int16), 3)
+        >>> result.new_infections.tolist()
+        [1, 0, 1, 0]
+        >>> result.infected_counts.tolist()
+        [1, 1, 2, 2]
+        """
+        self.identifiers = identifiers
+        self.tick_infected = tick_infected
+        infected = tick_infected[tick_infected != NEVER_INFECTED]
+        self.new_infections = np.bincount(infected, minlength=ticks + 1)
+        self.infected_counts = np.cumsum(self.new_infections)
+
+    def num_ticks(self) -> int:
+        """Return the number of ticks the simulation ran for, not counting the initial state."""
+        return len(self.infected_counts) - 1
+
+    def infected_on(self, tick: int) -> set[str]:
+        """Return the identifiers of the people newly infected on the given tick.
+
+        >>> result = SimulationResult(['a', 'b', 'c'], np.array([0, 2, 2], dtype=np.int16), 2)
+        >>> sorted(result.infected_on(2))
+        ['b', 'c']
+        """
+        return {self.identifiers[i] for i in np.flatnonzero(self.tick_infected == tick).tolist()}
+
+
+class TickDelta:
+    """The change to a simulation over one tick, as yielded by Simulation.iter_ticks.
+
+    Instance Attributes:
+        - tick: The tick that was run, where tick 0 is the initial state.
+        - newly_infected: The identifiers of the people infected on this tick (or, with the
+        'seir' and 'sirs' engines, exposed).
+        - recovered: The identifiers of the people who recovered on this tick.
+        - changed_degrees: Maps the identifier of each person whose degrees_apart changed on this
+        tick to their new degree, or None if they are no longer connected to an infected person.
+        It is empty unless the simulation is run with degrees.
+        - counts: The number of people who are 'infected' and 'healthy' at the end of this tick,
+        and with the 'seir' and 'sirs' engines, the number in each compartment, by its name in
+        COMPARTMENT_NAMES.
+        - settled: Whether nobody can be infected after this tick, so every later tick is empty.
+
+    Representation Invariants:
+        - self.tick >= 0
+    """
+    tick: int
+    newly_infected: set[str]
+    recovered: set[str]
+    changed_degrees: Mapping[str, Optional[int]]
+    counts: dict[str, int]
+    settled: bool
+
+    def __init__(self, tick: int, newly_infected: set[str], recovered: set[str],
+                 changed_degrees: Mapping[str, Optional[int]], counts: dict[str, int],
+                 settled: bool) -> None:
+        """Initialize the change to a simulation over the given tick."""
+        self.tick = tick
+        self.newly_infected = newly_infected
+        self.recovered = recovered
+        self.changed_degrees = changed_degrees
+        self.counts = counts
+        self.settled = settled
+
 
 class Simulation:
     """A simulation of the spread of COVID-19 over time.
@@ -27,14 +154,21 @@ class Simulation:
         simulation time).
         - _init_infected: The set of initially infected people.
         - _num_infected: The number of people who are initially infected.
+        - _engine: The infection engine that decides who becomes infected on each tick.
+        - _engine_name: The name of the infection engine in engines.ENGINES.
+        - _seed: The seed this simulation was created with, or None.
     """
     _graph: Graph
     _frames: list[go.Frame]
     _init_infected: set[str]
     _num_infected: int
+    _engine: Union[engines.ClassicEngine, engines.VectorizedEngine, CompartmentEngine]
+    _engine_name: str
+    _seed: Optional[int]
 
     def __init__(self, conditions: tuple[int, str, int, str],
-                 graph: Optional[Graph] = None) -> None:
+                 graph: Optional[Graph] = None, engine: str = 'classic',
+                 seed: Optional[int] = None) -> None:
         """Initialize the values in this simulation.
 
         - conditions[0] is the number of people in this simulation
@@ -42,11 +176,21 @@ class Simulation:
         - conditions[2] is the number of initially infected people
         - conditions[3] is whether the graph is connected
 
+        engine is the name of the infection engine to use, from engines.ENGINES. The
+        'vectorized' engine is much faster on large graphs, and the 'event' engine is faster
+        still on large graphs with low levels of contact. The 'seir' and 'sirs' engines let
+        people recover, and colour each person by their compartment. The 'sharded' engine
+        makes the same infections as sharded.run_sharded for the same seed.
+
+        If seed is given, the generated graph, the initially infected people and every infection
+        are the same for the same seed.
+
         Preconditions:
             - 10 < conditions[0] <= 60
             - conditions[1] == 'high' or conditions[1] == 'medium' or conditions[1] == 'low'
             - 1 <= conditions[2] <= conditions[0]
             - conditions[3] == 'yes' or conditions[3] == 'no'
+            - engine in engines.ENGINES
         """
         # for when a dataset is given
         if graph is not None:
@@ -54,84 +198,308 @@ class Simulation:
 
         # for when a graph needs to be generated
         elif conditions[3] == 'yes':
-            self._graph = data_processing.generate_connected_graph(conditions[0], conditions[1])
+            self._graph = data_processing.generate_connected_graph(
+                conditions[0], conditions[1], seeding.derive_seed(seed, seeding.GRAPH_STREAM))
         else:
-            self._graph = data_processing.generate_disconnected_graph(conditions[0], conditions[1])
+            self._graph = data_processing.generate_disconnected_graph(
+                conditions[0], conditions[1], seeding.derive_seed(seed, seeding.GRAPH_STREAM))
 
         # Setting the initially infected people
         self._num_infected = conditions[2]
-        self._init_infected = set()
 
-        # choosing random people to be the initially infected
-        people_copy = set(self._graph.get_people())
-        for _ in range(0, self._num_infected):
-            self._init_infected.add(people_copy.pop())
+        # choosing random people to be the initially infected, from the people in insertion order
+        rand = seeding.python_rng(seed, seeding.INITIAL_STREAM)
+        self._init_infected = set(rand.sample(list(self._graph.get_people()), self._num_infected))
 
         self._frames = []
+        self._seed = seed
+        self._engine_name = engine
+        self._engine = engines.ENGINES[engine](self._graph,
+                                               seeding.derive_seed(seed, seeding.ENGINE_STREAM))
+
+    def immunise(self, identifiers: set[str]) -> None:
+        """Make the people with the given identifiers immune before this simulation runs, so that
+        they are never infected and never pass the infection on.
+
+        Preconditions:
+            - not any(identifier in self._init_infected for identifier in identifiers)
+        """
+        self._engine.immunise(identifiers)
+
+    def immunise_top(self, k: int, method: str = 'degree',
+                     samples: int = intervention.DEFAULT_BETWEENNESS_SAMPLES,
+                     seed: Optional[int] = None) -> set[str]:
+        """Immunise the k highest ranked people by the given ranking method, from
+        intervention.RANKING_METHODS, who are not initially infected, and return their identifiers.
+
+        The ranking is cached with the graph, so trying several values of k on simulations of the
+        same graph only ranks it once. The betweenness estimate is drawn from seed, or from a
+        stream of this simulation's own seed if it is None. A betweenness ranking without either
+        seed is estimated afresh on every call.
+
+        Preconditions:
+            - k >= 0
+            - method in intervention.RANKING_METHODS
+        """
+        if seed is None:
+            seed = seeding.derive_seed(self._seed, seeding.RANKING_STREAM)
+        ranking = intervention.rank_people(self._graph, method, samples, seed)
+        chosen = set()
+        for identifier in ranking:
+            if len(chosen) == k:
+                break
+            if identifier not in self._init_infected:
+                chosen.add(identifier)
+
+        self.immunise(chosen)
+        return chosen
 
     def run(self, ticks: int, with_degrees: bool = False) -> None:
         """Run the simulation for a given amount of ticks.
         """
-        self._graph.set_infected(self._init_infected)
-
-        # Creates simulation buffer and infected sets.
-        infected = self._init_infected
-        buffer_infected = set()
+        # Imported here so that headless runs never load networkx layouts or plotly
+        import layout
+        import visualization as vis
 
-        if with_degrees:
-            self._graph.recalculate_degrees()
-            graph_nx = self._graph.to_nx_with_degree_colour()
-        else:
-            graph_nx = self._graph.to_nx_with_simulation_colour()
+        # The topology is converted once, and only the node colours change between frames
+        graph_nx = self._graph.to_nx()
 
-        # Establishes a shared position of all nodes when visualizing
-        pos = getattr(nx, 'spring_layout')(graph_nx)
+        # Establishes a shared position of all nodes when visualizing, reusing the layout cached
+        # for this topology if there is one
+        pos = layout.graph_layout(graph_nx)
+        positions = vis.determine_positions(pos, graph_nx)
 
-        # Renders the initial state frame
         sliders_dict = {"steps": []}
-        self._frames.append(vis.render_simulation_frame(self._graph, pos, 0, with_degrees))
+        was_settled = False
+        for delta in self.iter_ticks(ticks, with_degrees):
+            # The initial state is frame 0, and the frame for the end of each tick is numbered
+            # from 0 as well
+            name = max(delta.tick - 1, 0)
+            if was_settled:
+                # Nobody else can be infected, so the remaining frames are all the same
+                self._frames.append(vis.copy_frame(self._frames[-1], name))
+            else:
+                self._frames.append(vis.render_simulation_frame(
+                    self._graph, pos, name, with_degrees, positions,
+                    self._compartment_colours(with_degrees)))
 
-        # Loops for the amount of ticks, rendering each frame as it goes
+            if delta.tick > 0:
+                vis.update_slider(sliders_dict, name)
+            was_settled = delta.settled
+
+        vis.render_simulation_full(self._frames, sliders_dict, len(graph_nx.nodes),
+                                   len(self._init_infected))
+
+    def iter_ticks(self, ticks: int, with_degrees: bool = False) -> Iterator[TickDelta]:
+        """Run the simulation for a given amount of ticks, yielding the change to the simulation
+        over each tick as soon as it is made, starting with the initial state as tick 0.
+
+        The graph's infection statuses, and its degrees if with_degrees is True, are updated
+        before each change is yielded, so consumers can read the graph as it is at that tick.
+        Nothing is kept between ticks, so the memory used does not grow with the number of ticks.
+        Once the simulation has settled, the remaining ticks are yielded without any changes.
+
+        The people reached on each tick are passed back to the engine by index, and only the
+        people newly infected are turned into identifiers.
+        """
+        newly_infected = self._engine.infect(self._init_infected)
+        self._graph.set_infected(newly_infected)
+        recovered = self._pop_recovered()
+        changed_degrees = self._graph.recalculate_degrees() if with_degrees else {}
+
+        num_infected = len(newly_infected) - len(recovered)
+        yield TickDelta(0, newly_infected, recovered, changed_degrees,
+                        self._counts(num_infected), False)
+
+        # Creates the simulation buffer of the indexes of people reached but not yet infected
+        buffer_infected = np.zeros(0, dtype=np.int64)
+        settled = False
         for i in range(ticks):
-            # Updates the infected and
-            infected = infected.union(buffer_infected)
-            self._graph.set_infected(buffer_infected)
-            buffer_infected = set()
+            if settled:
+                yield TickDelta(i + 1, set(), set(), {}, self._counts(num_infected), True)
+                continue
+
+            # Updates the infected people from the buffer
+            newly_indexes = self._engine.infect_indexes(buffer_infected)
+            newly_infected = self._engine.to_identifiers(newly_indexes)
+            self._graph.set_infected(newly_infected)
+
             # checking every connection where one node is infected
-            for person in infected:
-                self.infect_neighbours(person, buffer_infected)
+            buffer_infected = self._engine.spread_indexes()
+            recovered = self._pop_recovered()
 
-            if with_degrees:
-                self._graph.recalculate_degrees()
+            if with_degrees and recovered:
+                # Recoveries can lengthen degrees, so they are all calculated again
+                changed_degrees = self._graph.recalculate_degrees()
+            elif with_degrees:
+                # Only the degrees around the newly infected people can change
+                changed_degrees = self._graph.update_degrees(newly_infected)
+            else:
+                changed_degrees = {}
 
-            # Renders the frame for the end of tick.
-            self._frames.append(vis.render_simulation_frame(self._graph, pos, i, with_degrees))
-            vis.update_slider(sliders_dict, i)
+            # People reached on this tick are only infected on the next, so they must be waited for
+            settled = len(buffer_infected) == 0 and self._engine.is_settled()
+            num_infected += len(newly_infected) - len(recovered)
+            yield TickDelta(i + 1, newly_infected, recovered, changed_degrees,
+                            self._counts(num_infected), settled)
 
-        vis.render_simulation_full(self._frames, sliders_dict, len(graph_nx.nodes),
-                                   len(self._init_infected))
+    def run_headless(self, ticks: int, checkpoint: Optional[str] = None,
+                     checkpoint_every: int = 10) -> SimulationResult:
+        """Run the simulation for a given amount of ticks without rendering anything, and return
+        its outcome. The graph's infection statuses are not changed.
+
+        With the 'seir' and 'sirs' engines, people are recorded on the tick they were first
+        exposed.
+
+        If checkpoint is given, it is a directory where the graph is saved once, and the state of
+        the run is saved at the start and every checkpoint_every ticks, so that Simulation.resume
+        can continue the run if it is stopped.
+
+        Preconditions:
+            - ticks < 2 ** 15
+            - checkpoint_every >= 1
+        """
+        tick_infected = np.full(len(self._graph.get_people()), NEVER_INFECTED, dtype=np.int16)
+        initial = self._engine.to_indexes(self._init_infected)
+        tick_infected[self._engine.infect_indexes(initial)] = 0
+
+        buffer_infected = np.zeros(0, dtype=np.int64)
+        if checkpoint is not None:
+            os.makedirs(checkpoint, exist_ok=True)
+            snapshot.save_snapshot(self._graph, os.path.join(checkpoint, CHECKPOINT_GRAPH_FILE))
+            # A run stopped before its first checkpoint can still be resumed from the start
+            self._save_checkpoint((checkpoint, checkpoint_every), (0, ticks), buffer_infected,
+                                  tick_infected)
+
+        return self._run_headless_ticks(0, ticks, buffer_infected, tick_infected,
+                                        (checkpoint, checkpoint_every))
+
+    @staticmethod
+    def resume(path: str, graph: Optional[Graph] = None) -> SimulationResult:
+        """Continue the headless run with its checkpoints in the directory path from its latest
+        checkpoint, and return its outcome, which is the same as if the run had never stopped.
+        Later checkpoints are saved to the same directory.
+
+        The graph is loaded from the checkpoint unless it is given. The 'classic' engine tries each
+        person's contacts in the order their graph stores them, which a snapshot does not keep,
+        so a 'classic' run on a Graph only has the same outcome if the same graph is given.
+
+        Raise ValueError if the checkpoint is from an unsupported format version.
+        """
+        with np.load(os.path.join(path, CHECKPOINT_FILE), allow_pickle=False) as archive:
+            arrays = dict(archive)
+
+        version = int(arrays['format_version'])
+        if version != CHECKPOINT_VERSION:
+            raise ValueError('Unsupported checkpoint format version {} in {}'.format(version, path))
+
+        if graph is None:
+            graph = snapshot.load_snapshot(os.path.join(path, CHECKPOINT_GRAPH_FILE))
+
+        init_infected = set(arrays['init_infected'].tolist())
+        conditions = (len(graph.get_people()), 'medium', len(init_infected), 'yes')
+        simulation = Simulation(conditions, graph, str(arrays['engine']))
+        simulation._init_infected = init_infected
+        simulation._engine.set_state({name[len('engine_'):]: array
+                                      for name, array in arrays.items()
+                                      if name.startswith('engine_')})
+
+        return simulation._run_headless_ticks(int(arrays['tick']), int(arrays['ticks']),
+                                              simulation._engine.to_indexes(
+                                                  set(arrays['buffer_infected'].tolist())),
+                                              arrays['tick_infected'],
+                                              (path, int(arrays['checkpoint_every'])))
+
+    def _run_headless_ticks(self, start: int, ticks: int, buffer_infected: np.ndarray,
+                            tick_infected: np.ndarray,
+                            checkpoint: tuple[Optional[str], int]) -> SimulationResult:
+        """Run the ticks of a headless run from tick start up to ticks, given the indexes of the
+        people reached on the tick before start and the tick each person was infected on so far,
+        and return the outcome of the whole run.
+
+        checkpoint is the directory to save checkpoints to, or None, and the number of ticks
+        between checkpoints.
+        """
+        # The same steps as each tick of run, recording who was infected on which tick. Nobody
+        # is turned into an identifier, except in checkpoints.
+        for i in range(start, ticks):
+            newly_infected = self._engine.infect_indexes(buffer_infected)
+            newly_infected = newly_infected[tick_infected[newly_infected] == NEVER_INFECTED]
+            tick_infected[newly_infected] = i + 1
+            buffer_infected = self._engine.spread_indexes()
+
+            # Recoveries are not recorded, but are still taken from the engine, as in iter_ticks,
+            # so that they do not pile up over a long run
+            if isinstance(self._engine, CompartmentEngine):
+                self._engine.pop_recovered_indexes()
+
+            if len(buffer_infected) == 0 and self._engine.is_settled():
+                break
+
+            if checkpoint[0] is not None and (i + 1) % checkpoint[1] == 0:
+                self._save_checkpoint(checkpoint, (i + 1, ticks), buffer_infected, tick_infected)
+
+        return SimulationResult(list(self._graph.get_people()), tick_infected, ticks)
+
+    def _save_checkpoint(self, checkpoint: tuple[str, int], ticks: tuple[int, int],
+                         buffer_infected: np.ndarray, tick_infected: np.ndarray) -> None:
+        """Save the state of a headless run to the checkpoint directory checkpoint[0], after
+        ticks[0] of its ticks[1] ticks have run.
+
+        The checkpoint is written to a separate file first and then moved into place, so a run
+        stopped while saving still leaves the previous checkpoint intact.
+        """
+        path = os.path.join(checkpoint[0], CHECKPOINT_FILE)
+        arrays = {'format_version': np.array(CHECKPOINT_VERSION),
+                  'engine': np.array(self._engine_name),
+                  'tick': np.array(ticks[0]),
+                  'ticks': np.array(ticks[1]),
+                  'checkpoint_every': np.array(checkpoint[1]),
+                  'init_infected': np.array(sorted(self._init_infected), dtype=np.str_),
+                  'buffer_infected': np.array(sorted(self._engine.to_identifiers(buffer_infected)),
+                                              dtype=np.str_),
+                  'tick_infected': tick_infected}
+        for name, array in self._engine.get_state().items():
+            arrays['engine_' + name] = array
+
+        # Passing an open file stops NumPy from adding a .npz extension to the path
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+
+    def _counts(self, num_infected: int) -> dict[str, int]:
+        """Return the counts of a TickDelta, for the given number of infected people."""
+        counts = {'infected': num_infected,
+                  'healthy': len(self._graph.get_people()) - num_infected}
+        if isinstance(self._engine, CompartmentEngine):
+            totals = self._engine.counts()
+            counts.update((name, totals[compartment])
+                          for name, compartment in COMPARTMENT_NAMES.items())
+        return counts
+
+    def _pop_recovered(self) -> set[str]:
+        """Mark the people who recovered since the last call as no longer infected in the graph,
+        and return their identifiers. Only the compartment engines let people recover.
+        """
+        if not isinstance(self._engine, CompartmentEngine):
+            return set()
+
+        recovered = self._engine.pop_recovered()
+        self._graph.set_recovered(recovered)
+        return recovered
+
+    def _compartment_colours(self, with_degrees: bool) -> Optional[list[str]]:
+        """Return the colour of each person's compartment, in the node order of the graph, or None
+        if the people are coloured by the graph instead.
+        """
+        if with_degrees or not isinstance(self._engine, CompartmentEngine):
+            return None
+        return self._engine.node_colours(self._graph.node_identifiers())
 
     def infect_neighbours(self, person: str, buffer_infected: set) -> None:
         """Loops through all the neighbours of this person object to determine if they will become
         infected. If the neighbour becomes infected, they are added to buffer_infected. """
-        for neighbour in self._graph.get_neighbours(person):
-            result = determine_infected(self._graph.get_weight(person, neighbour.identifier))
-            if result:
-                buffer_infected.add(neighbour.identifier)
-
-
-def determine_infected(edge_weight: float) -> bool:
-    """Determine if a node becomes infected using the edge weight between an infected node and a
-    non-infected node
-
-    >>> result = determine_infected(1)
-    >>> result
-    True
-    >>> result = determine_infected(0.4)
-    >>> result or not result
-    True
-    """
-    return random.choices([True, False], weights=(edge_weight, 1 - edge_weight))[0]
+        engines.infect_neighbours(self._graph, person, buffer_infected)
 
 
 if __name__ == '__main__':
@@ -143,8 +511,10 @@ if __name__ == '__main__':
 
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['random', 'networkx', 'plotly.graph_objects', 'data_processing',
+        'extra-imports': ['os', 'numpy', 'plotly.graph_objects', 'data_processing', 'layout',
+                          'compartments', 'engines', 'intervention', 'seeding', 'snapshot',
                           'visualization', 'social_graph'],
         'max-line-length': 100,
+        'allowed-io': ['Simulation._save_checkpoint'],
         'disable': ['E1136']
     })
@@ -0,0 +1,120 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Snapshot Module
+This module contains the functions that save and load graphs in a binary snapshot format, which
+loads in close to the time it takes to read the file, unlike the csv files that are parsed row by
+row.
+
+A snapshot is an uncompressed NumPy .npz archive containing the following arrays:
+    - format_version: The snapshot format version, currently SNAPSHOT_VERSION.
+    - identifiers, names: The identifier and name of each person, in index order.
+    - ages, severities, infected: The person attribute columns, in index order.
+    - indptr, indices, weights: The weighted contacts in CSR form, as in compact_graph.
+    - checksum: The SHA-256 digest of all of the above, checked when the snapshot is loaded.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import hashlib
+import struct
+import zipfile
+import zlib
+import numpy as np
+from social_graph import Graph
+from compact_graph import CompactGraph
+
+SNAPSHOT_VERSION = 1
+
+# The arrays covered by the checksum, in the order they are hashed
+_CHECKED_ARRAYS = ('format_version', 'identifiers', 'names', 'ages', 'severities', 'infected',
+                   'indptr', 'indices', 'weights')
+
+# The errors zipfile and NumPy raise for a snapshot file that cannot be decoded
+_DECODE_ERRORS = (zipfile.BadZipFile, zlib.error, struct.error, KeyError, IndexError, EOFError,
+                  OSError, ValueError, RuntimeError, NotImplementedError)
+
+
+def save_snapshot(graph: Graph, path: str) -> None:
+    """Save the people and contacts of graph to a snapshot file at path.
+
+    Graphs that are not already a CompactGraph are frozen first.
+    """
+    compact = graph if isinstance(graph, CompactGraph) else graph.freeze()
+    n = compact.num_people()
+    indptr, indices, weights = compact.to_csr()
+
+    arrays = {
+        'format_version': np.array([SNAPSHOT_VERSION], dtype=np.int32),
+        'identifiers': np.array(compact.get_identifiers(), dtype=np.str_),
+        'names': np.array([compact.get_name(i) for i in range(n)], dtype=np.str_),
+        'ages': compact.ages[:n],
+        'severities': compact.severities[:n],
+        'infected': compact.infected[:n],
+        'indptr': indptr,
+        'indices': indices,
+        'weights': weights
+    }
+    arrays['checksum'] = np.frombuffer(_checksum(arrays), dtype=np.uint8)
+
+    # Passing an open file stops NumPy from adding a .npz extension to path
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_snapshot(path: str) -> CompactGraph:
+    """Return the graph saved in the snapshot file at path.
+
+    Raise ValueError if the snapshot is from an unsupported format version, if it cannot be
+    decoded, or if its contents do not match its checksum. A missing file raises OSError as usual.
+    """
+    with open(path, 'rb') as file:
+        try:
+            with np.load(file, allow_pickle=False) as archive:
+                # The version is read first, since other versions may not have the same arrays
+                version = int(archive['format_version'][0])
+                if version == SNAPSHOT_VERSION:
+                    arrays = {name: archive[name] for name in _CHECKED_ARRAYS + ('checksum',)}
+        except _DECODE_ERRORS as error:
+            raise ValueError('Snapshot {} is corrupted: {!r}'.format(path, error)) from error
+
+    if version != SNAPSHOT_VERSION:
+        raise ValueError('Unsupported snapshot format version {} in {}'.format(version, path))
+
+    if arrays['checksum'].tobytes() != _checksum(arrays):
+        raise ValueError('Snapshot {} is corrupted: checksum does not match'.format(path))
+
+    return CompactGraph.from_arrays(arrays['identifiers'].tolist(), arrays['names'].tolist(),
+                                    {'ages': arrays['ages'],
+                                     'severities': arrays['severities'],
+                                     'infected': arrays['infected']},
+                                    (arrays['indptr'], arrays['indices'], arrays['weights']))
+
+
+def _checksum(arrays: dict[str, np.ndarray]) -> bytes:
+    """Return the SHA-256 digest of the snapshot arrays, including their types and shapes."""
+    digest = hashlib.sha256()
+    for name in _CHECKED_ARRAYS:
+        array = np.ascontiguousarray(arrays[name])
+        digest.update('{}:{}:{};'.format(name, array.dtype.str, array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.digest()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'struct', 'zipfile', 'zlib', 'numpy', 'social_graph',
+                          'compact_graph'],
+        'max-line-length': 100,
+        'allowed-io': ['save_snapshot', 'load_snapshot'],
+        'disable': ['E1136']
+    })
@@ -10,7 +10,8 @@ Copyright and Usage Information
 This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
 """
 from __future__ import annotations
-from typing import Optional
+from collections import deque
+from typing import AbstractSet, Optional, Union
 import networkx as nx
 import colouring as colour
 
@@ -67,24 +68,6 @@ class _Person:
         self.infected = not self.infected
 
     # DEGREE CALCULATION
-    def calculate_degrees_apart(self, curr_degree: int, visited: set,
-                                init_call: bool = True) -> None:
-        """Update degrees_apart for all the people this person is connected to, where degrees_apart
-        is the smallest degree apart between this person and an infected person.
-        """
-        # This will ensure that degrees_apart is always calculating the smallest degree between
-        # an infected person.
-        if not init_call and curr_degree == 0:
-            return  # To avoid redundant calculations
-
-        if self.degrees_apart is None or curr_degree < self.degrees_apart:
-            self.degrees_apart = curr_degree
-
-        visited.add(self)
-        for person in self.neighbours:
-            if person not in visited:
-                person.calculate_degrees_apart(curr_degree + 1, visited.copy(), False)
-
     def get_degree(self) -> int:
         """Return smallest degree apart from an infected vertex. Raise ValueError if has not been
         calculated yet.
@@ -103,6 +86,92 @@ class _Person:
             self.degrees_apart = None
 
 
+class _Components:
+    """ A union-find index of the connected components of a graph, which is updated as people and
+    contacts are added. Each component is identified by the identifier of one of its members,
+    which may change when components are merged.
+
+    The number of infected people in each component is kept with it, so the components with an
+    infected person can be found without looking at anyone in them.
+    """
+    # Private Instance Attributes:
+    #     - _parent:
+    #         Maps each person identifier to the identifier of another person in its component,
+    #         or to itself if it is the root of its component.
+    #     - _members:
+    #         Maps the identifier of each root to the identifiers of everyone in its component.
+    #     - _infected_counts:
+    #         Maps the identifier of each root to the number of infected people in its component.
+    #     - _infected_roots:
+    #         The roots of the components with at least one infected person.
+    _parent: dict[str, str]
+    _members: dict[str, list[str]]
+    _infected_counts: dict[str, int]
+    _infected_roots: set[str]
+
+    def __init__(self) -> None:
+        """ Initialize an empty component index."""
+        self._parent = {}
+        self._members = {}
+        self._infected_counts = {}
+        self._infected_roots = set()
+
+    def add(self, identifier: str) -> None:
+        """Add a new person, who is not infected, in a component of their own."""
+        self._parent[identifier] = identifier
+        self._members[identifier] = [identifier]
+        self._infected_counts[identifier] = 0
+
+    def find(self, identifier: str) -> str:
+        """Return the identifier of the component containing the given person."""
+        parent = self._parent
+        while parent[identifier] != identifier:
+            # Path halving keeps later searches short
+            parent[identifier] = parent[parent[identifier]]
+            identifier = parent[identifier]
+        return identifier
+
+    def union(self, identifier1: str, identifier2: str) -> None:
+        """Merge the components containing the two given people."""
+        root1, root2 = self.find(identifier1), self.find(identifier2)
+        if root1 == root2:
+            return
+
+        # The smaller component joins the larger one, so each person's members entry moves at most
+        # O(log n) times
+        if len(self._members[root1]) < len(self._members[root2]):
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        self._members[root1].extend(self._members.pop(root2))
+        self._infected_counts[root1] += self._infected_counts.pop(root2)
+        if root2 in self._infected_roots:
+            self._infected_roots.remove(root2)
+            self._infected_roots.add(root1)
+
+    def count_infection(self, identifier: str, change: int) -> None:
+        """Change the number of infected people in the component containing the given person by
+        change, which is 1 when they become infected and -1 when they recover.
+        """
+        root = self.find(identifier)
+        self._infected_counts[root] += change
+        if self._infected_counts[root] > 0:
+            self._infected_roots.add(root)
+        else:
+            self._infected_roots.discard(root)
+
+    def infected(self) -> set[str]:
+        """Return the components with at least one infected person."""
+        return set(self._infected_roots)
+
+    def members(self, component: str) -> list[str]:
+        """Return the identifiers of the people in the given component."""
+        return self._members[component]
+
+    def sizes(self) -> dict[str, int]:
+        """Return a dictionary mapping each component to the number of people in it."""
+        return {root: len(members) for root, members in self._members.items()}
+
+
 class Graph:
     """ A weighted graph used to represent a network of people that keeps track of the level of
     contact between any two people.
@@ -111,11 +180,34 @@ class Graph:
     #     - _people:
     #         A collection of the people in this graph.
     #         Maps person identifier to _Person object.
+    #     - _name_index:
+    #         Maps each name in this graph to the identifier of the first person added with it.
+    #     - _version:
+    #         The number of times people or contacts have been added to this graph, used to tell
+    #         when cached conversions of the graph are out of date.
+    #     - _components:
+    #         The connected components of this graph.
+    #     - _degree_components:
+    #         A member of each component whose degrees_apart were set by the last degree
+    #         calculation.
+    #     - _nx_cache:
+    #         The version the networkx topology was converted at, the converted nx.Graph, and the
+    #         person drawn as each of its nodes, in node order. None if never converted.
     _people: dict[str, _Person]
+    _name_index: dict[str, str]
+    _version: int
+    _components: _Components
+    _degree_components: set[str]
+    _nx_cache: Optional[tuple[int, nx.Graph, list]]
 
     def __init__(self) -> None:
         """ Initialize an empty graph."""
         self._people = {}
+        self._name_index = {}
+        self._version = 0
+        self._components = _Components()
+        self._degree_components = set()
+        self._nx_cache = None
 
     # ACCESSOR METHODS
     def get_people(self) -> dict[str, _Person]:
@@ -138,15 +230,124 @@ class Graph:
         """
         return self._people[person1].neighbours[self._people[person2]]
 
-    def get_names(self) -> set[str]:
-        """Return a set containing the names of every _Person object in this graph.
+    def get_version(self) -> int:
+        """Return the number of times people or contacts have been added to this graph. Anything
+        computed from the graph's topology can be reused for as long as this stays the same.
+        """
+        return self._version
+
+    def get_names(self) -> AbstractSet[str]:
+        """Return a set-like view of the names of every _Person object in this graph.
+
+        The view is kept up to date as people are added, so it does not need to be fetched again.
+        """
+        return self._name_index.keys()
+
+    def has_name(self, name: str) -> bool:
+        """Return whether a person with the given name is in this graph."""
+        return name in self._name_index
+
+    def has_identifier(self, identifier: str) -> bool:
+        """Return whether a person with the given identifier is in this graph."""
+        return identifier in self._people
+
+    def get_identifier_by_name(self, name: str) -> str:
+        """Return the identifier of the first person added to this graph with the given name.
+        Raise KeyError if there is no such person.
+
+        >>> graph = Graph()
+        >>> graph.add_vertex('F5H9A8', 'Bob', 60, 0.9)
+        >>> graph.get_identifier_by_name('Bob')
+        'F5H9A8'
         """
-        names_so_far = set()
+        return self._name_index[name]
+
+    def neighbourhood(self, sources: Union[str, set[str]],
+                      max_hops: int) -> dict[str, tuple[int, Optional[str], float]]:
+        """Return everyone within max_hops contacts of the given person or people, for contact
+        tracing. Each person's identifier is mapped to a tuple of:
+            1. Their number of hops from the nearest source.
+            2. The identifier of the person one hop closer that they are reached through, or None
+               for the sources themselves. Where there are several, the one with the highest
+               contact level is used.
+            3. The contact level with that person, or 0 for the sources.
+
+        Only the people within max_hops of the sources are visited, and nothing in the graph is
+        changed, so the degrees_apart and infected attributes are unaffected.
+
+        Preconditions:
+            - max_hops >= 0
 
-        for person in self._people:
-            names_so_far.add(self._people[person].name)
+        >>> graph = Graph()
+        >>> for identifier in ['A', 'B', 'C', 'D']:
+        ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> graph.add_edge('B', 'C', 0.25)
+        >>> graph.add_edge('C', 'D', 0.75)
+        >>> graph.neighbourhood('A', 2)
+        {'A': (0, None, 0), 'B': (1, 'A', 0.5), 'C': (2, 'B', 0.25)}
+        """
+        if isinstance(sources, str):
+            sources = {sources}
+
+        reached = {identifier: (0, None, 0) for identifier in sources}
+        frontier = list(reached)
+
+        for hops in range(1, max_hops + 1):
+            next_frontier = []
+            for identifier in frontier:
+                for neighbour, contact_level in self._people[identifier].neighbours.items():
+                    found = reached.get(neighbour.identifier)
+                    if found is None:
+                        next_frontier.append(neighbour.identifier)
+                    elif found[0] != hops or found[2] >= contact_level:
+                        continue
+                    reached[neighbour.identifier] = (hops, identifier, contact_level)
+
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        return reached
+
+    def component_of(self, identifier: str) -> str:
+        """Return the id of the connected component containing the person with the given
+        identifier. Component ids may change as contacts are added.
+        """
+        return self._components.find(identifier)
 
-        return names_so_far
+    def component_sizes(self) -> dict[str, int]:
+        """Return a dictionary mapping the id of each connected component to its number of people.
+
+        >>> graph = Graph()
+        >>> for identifier in ['A', 'B', 'C']:
+        ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> sorted(graph.component_sizes().values())
+        [1, 2]
+        """
+        return self._components.sizes()
+
+    def component_members(self, component: str) -> list[str]:
+        """Return the identifiers of the people in the connected component with the given id."""
+        return self._components.members(component)
+
+    def infected_components(self) -> set[str]:
+        """Return the ids of the connected components that contain at least one infected person.
+        Nobody in any other component can ever become infected.
+
+        The components keep count of their infected people as set_infected and set_recovered
+        change them, so this takes time in the number of infected components only.
+
+        >>> graph = Graph()
+        >>> for identifier in ['A', 'B', 'C']:
+        ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+        >>> graph.set_infected({'A'})
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> graph.infected_components() == {graph.component_of('B')}
+        True
+        """
+        return self._components.infected()
 
     def get_contact_level(self, identifier1: str, identifier2: str) -> float:
         """Return the level of contact between the given items (the weight of their edge).
@@ -165,6 +366,9 @@ class Graph:
         """
         if identifier not in self._people:
             self._people[identifier] = _Person(identifier, name, age, severity_level)
+            self._name_index.setdefault(name, identifier)
+            self._components.add(identifier)
+            self._version += 1
 
     def add_edge(self, identifier1: str, identifier2: str, contact_level: float) -> None:
         """Add an edge between two people with the given identifiers in this graph, with the given
@@ -178,6 +382,8 @@ class Graph:
 
         person1.neighbours[person2] = contact_level
         person2.neighbours[person1] = contact_level
+        self._components.union(identifier1, identifier2)
+        self._version += 1
 
     def set_infected(self, init_infected: set[str]) -> None:
         """Sets the initial infected people for the graph, given their ids.
@@ -190,23 +396,119 @@ class Graph:
         True
         """
         for identifier in init_infected:
-            self._people[identifier].infected = True
+            person = self._people[identifier]
+            if not person.infected:
+                person.infected = True
+                self._components.count_infection(identifier, 1)
+
+    def set_recovered(self, recovered: set[str]) -> None:
+        """Sets the people with the given ids as no longer infected.
 
-    def recalculate_degrees(self) -> None:
-        """Recalculates the degrees_apart attribute for each connected person to an infected.
+        >>> graph = Graph()
+        >>> graph.add_vertex('F5H9A8', 'L.V', 60, 0.9)
+        >>> graph.set_infected({'F5H9A8'})
+        >>> graph.set_recovered({'F5H9A8'})
+        >>> graph._people['F5H9A8'].infected
+        False
         """
-        self._reset_degrees()
+        for identifier in recovered:
+            person = self._people[identifier]
+            if person.infected:
+                person.infected = False
+                self._components.count_infection(identifier, -1)
 
-        infected_people = set()
+    def recalculate_degrees(self) -> dict[str, Optional[int]]:
+        """Recalculates the degrees_apart attribute for each connected person to an infected, and
+        return a dictionary mapping the identifier of each person whose degree changed to their
+        new degree.
 
-        for person in self._people.values():
-            if person.infected:
+        All infected people are used as the sources of a single breadth-first search, so each
+        person and each contact in a component with an infected person is visited at most once.
+
+        >>> graph = Graph()
+        >>> for identifier in ['A', 'B', 'C', 'D']:
+        ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> graph.add_edge('B', 'C', 0.5)
+        >>> graph.set_infected({'A'})
+        >>> graph.recalculate_degrees()
+        {'A': 0, 'B': 1, 'C': 2}
+        >>> [graph.get_people()[p].degrees_apart for p in ['A', 'B', 'C', 'D']]
+        [0, 1, 2, None]
+        """
+        infected_components = self.infected_components()
+
+        # Only components that contain infected people now, or did at the last calculation, can
+        # have degrees set; everyone else stays at None without being visited
+        stale_components = {self.component_of(member) for member in self._degree_components}
+        queue = deque()
+        previous = {}
+        for component in stale_components.union(infected_components):
+            for identifier in self.component_members(component):
+                person = self._people[identifier]
+                previous[identifier] = person.degrees_apart
+                person.reset_degree()
+                if person.infected:
+                    person.reset_degree(zero=True)
+                    queue.append(person)
+
+        self._degree_components = infected_components
+
+        while queue:
+            person = queue.popleft()
+            for neighbour in person.neighbours:
+                if neighbour.degrees_apart is None:
+                    neighbour.degrees_apart = person.degrees_apart + 1
+                    queue.append(neighbour)
+
+        return {identifier: self._people[identifier].degrees_apart
+                for identifier, degree in previous.items()
+                if self._people[identifier].degrees_apart != degree}
+
+    def update_degrees(self, newly_infected: set[str]) -> dict[str, int]:
+        """Update the degrees_apart attribute of each person after the people with the given
+        identifiers have become infected, and return a dictionary mapping the identifier of each
+        person whose degree changed to their new degree.
+
+        Every other degrees_apart attribute must already be correct for the previously infected
+        people. New infections can only shorten degrees, so the search only continues outward
+        from people whose degree decreased, and stops at anyone whose degree is already no larger.
+
+        >>> graph = Graph()
+        >>> for identifier in ['A', 'B', 'C', 'D']:
+        ...     graph.add_vertex(identifier, identifier, 20, 0.5)
+        >>> graph.add_edge('A', 'B', 0.5)
+        >>> graph.add_edge('B', 'C', 0.5)
+        >>> graph.add_edge('C', 'D', 0.5)
+        >>> graph.set_infected({'A'})
+        >>> _ = graph.recalculate_degrees()
+        >>> graph.set_infected({'D'})
+        >>> graph.update_degrees({'D'})
+        {'D': 0, 'C': 1}
+        >>> [graph.get_people()[p].degrees_apart for p in ['A', 'B', 'C', 'D']]
+        [0, 1, 1, 0]
+        """
+        self._degree_components.update(newly_infected)
+
+        queue = deque()
+        changed = {}
+        for identifier in sorted(newly_infected):
+            person = self._people[identifier]
+            if person.degrees_apart != 0:
                 person.reset_degree(zero=True)
-                infected_people.add(person)
+                changed[identifier] = 0
+                queue.append(person)
 
-        for infected_person in infected_people:
-            # This method calculates it for its neighbours
-            infected_person.calculate_degrees_apart(0, set())
+        while queue:
+            person = queue.popleft()
+            new_degree = person.degrees_apart + 1
+            for neighbour in person.neighbours:
+                if neighbour.degrees_apart is None or neighbour.degrees_apart > new_degree:
+                    neighbour.degrees_apart = new_degree
+                    changed[neighbour.identifier] = new_degree
+                    queue.append(neighbour)
+
+        return changed
 
     def _reset_degrees(self) -> None:
         """ Resets all degrees_apart attributes in graph to be None
@@ -214,18 +516,42 @@ class Graph:
         for person in self._people.values():
             person.reset_degree()  # Reset all degrees to None
 
-    # NETWORKX CONVERSION METHODS
-    def to_nx(self) -> nx.Graph:
-        """Return a networkx Graph representing self."""
+    # COMPACT CONVERSION METHODS
+    def freeze(self) -> Graph:
+        """Return a compact_graph.CompactGraph copy of self, which stores the same people and
+        contacts in arrays instead of one object per person.
+        """
+        # Imported here since compact_graph builds on this module
+        from compact_graph import CompactGraph
+        return CompactGraph.from_graph(self)
 
-        graph_nx = nx.Graph()
-        for p in self._people.values():
-            graph_nx.add_node(p.name, colour='rgb(155, 234, 58)')  # add node for each person
+    def save_snapshot(self, path: str) -> None:
+        """Save the people and contacts of this graph to a binary snapshot file at path, which
+        can be loaded much faster than the csv files. See the snapshot module for the format.
+        """
+        # Imported here since snapshot builds on this module
+        import snapshot
+        snapshot.save_snapshot(self, path)
+
+    @staticmethod
+    def load_snapshot(path: str) -> Graph:
+        """Return a compact_graph.CompactGraph loaded from the snapshot file at path. Raise
+        ValueError if the file is from an unsupported format version or is corrupted.
+        """
+        # Imported here since snapshot builds on this module
+        import snapshot
+        return snapshot.load_snapshot(path)
 
-            for u in p.neighbours:
-                if u.name in graph_nx.nodes:
-                    graph_nx.add_edge(p.name, u.name)  # add edge edge between each neighbour pair
+    # NETWORKX CONVERSION METHODS
+    def to_nx(self) -> nx.Graph:
+        """Return a networkx Graph representing self.
 
+        The networkx Graph is only rebuilt when people or contacts have been added since the last
+        conversion, so the returned object is shared between calls and must not be modified. Its
+        'colour' attributes are set by the most recent to_nx call.
+        """
+        graph_nx = self._nx_topology()[0]
+        nx.set_node_attributes(graph_nx, 'rgb(155, 234, 58)', 'colour')
         return graph_nx
 
     def to_nx_with_degree_colour(self) -> nx.Graph:
@@ -234,18 +560,7 @@ class Graph:
 
         This function is used for just a degree graph.
         """
-        graph_nx = nx.Graph()
-
-        for p in self._people.values():
-            graph_nx.add_node(p.name)  # add node for each person
-            node_colour = colour.rgb_to_str(colour.degrees_apart_get_colour(p.degrees_apart))
-            graph_nx.nodes[p.name]['colour'] = node_colour
-
-            for u in p.neighbours:
-                if u.name in graph_nx.nodes:
-                    graph_nx.add_edge(p.name, u.name)  # add edge edge between each neighbour pair
-
-        return graph_nx
+        return self._colour_nx(self.node_colours(with_degrees=True))
 
     def to_nx_with_simulation_colour(self) -> nx.Graph:
         """Return a networkx Graph representing self. This function also sets an additional
@@ -253,20 +568,62 @@ class Graph:
 
         This function is used for the simulations.
         """
-        graph_nx = nx.Graph()
+        return self._colour_nx(self.node_colours(with_degrees=False))
 
-        for p in self._people.values():
-            graph_nx.add_node(p.name)  # add node for each person
-            node_colour = colour.rgb_to_str(colour.INFECTED_COLOUR) if p.infected else 'rgb(255, ' \
-                                                                                       '255, 255) '
-            graph_nx.nodes[p.name]['colour'] = node_colour
+    def node_colours(self, with_degrees: bool = False) -> list[str]:
+        """Return the colour of each node of self.to_nx(), in node order.
+
+        If with_degrees is True, people are coloured by their degrees_apart, otherwise by whether
+        they are infected. This is all that changes between the frames of a simulation.
+        """
+        node_people = self._nx_topology()[1]
+
+        if with_degrees:
+            return [colour.rgb_to_str(colour.degrees_apart_get_colour(p.degrees_apart))
+                    for p in node_people]
+        else:
+            infected_colour = colour.rgb_to_str(colour.INFECTED_COLOUR)
+            healthy_colour = colour.rgb_to_str(colour.HEALTHY_COLOUR)
+            return [infected_colour if p.infected else healthy_colour for p in node_people]
 
-            for u in p.neighbours:
-                if u.name in graph_nx.nodes:
-                    graph_nx.add_edge(p.name, u.name)  # add edge edge between each neighbour pair
+    def node_identifiers(self) -> list[str]:
+        """Return the identifier of each node of self.to_nx(), in node order."""
+        return [p.identifier for p in self._nx_topology()[1]]
 
+    def _colour_nx(self, colours: list[str]) -> nx.Graph:
+        """Return the cached networkx Graph of self, with each node's 'colour' attribute set to
+        the matching element of colours.
+        """
+        graph_nx = self._nx_topology()[0]
+        nx.set_node_attributes(graph_nx, dict(zip(graph_nx.nodes, colours)), 'colour')
         return graph_nx
 
+    def _nx_topology(self) -> tuple[nx.Graph, list]:
+        """Return the networkx Graph of self and the person drawn as each of its nodes, converting
+        them again only if the graph has changed since they were last converted.
+        """
+        if self._nx_cache is None or self._nx_cache[0] != self._version:
+            graph_nx, node_people = self._build_nx_topology()
+            self._nx_cache = (self._version, graph_nx, node_people)
+
+        return self._nx_cache[1], self._nx_cache[2]
+
+    def _build_nx_topology(self) -> tuple[nx.Graph, list]:
+        """Return a new networkx Graph with a node for each person's name and an edge for each
+        contact, and the person drawn as each node, in node order.
+        """
+        # People with the same name share a node, which is drawn as the last of them
+        node_people = {}
+        for p in self._people.values():
+            node_people[p.name] = p
+
+        graph_nx = nx.Graph()
+        graph_nx.add_nodes_from(node_people)
+        graph_nx.add_edges_from((p.name, u.name) for p in self._people.values()
+                                for u in p.neighbours)
+
+        return graph_nx, list(node_people.values())
+
 
 if __name__ == '__main__':
     import doctest
@@ -277,7 +634,7 @@ if __name__ == '__main__':
 
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['networkx', 'colouring'],  # the names (strs) of imported modules
+        'extra-imports': ['collections', 'networkx', 'colouring'],  # names of imported modules
         'max-line-length': 100,
         'disable': ['E1136']
     })
@@ -0,0 +1,185 @@
+"""CSC111 Project: COVID-19 Contact Visualizer
+
+Module Description
+==================
+Sweep Module
+This module contains the runner for parameter sweeps: headless simulations of every combination of
+the conditions given to Simulation, run across a pool of processes.
+
+A sweep is described by a grid, mapping each of the keys in GRID_KEYS to the list of values to try.
+Every cell of the grid is one simulation. A sweep keeps the following in its directory:
+    - graphs/: A snapshot of each generated graph, keyed by its number of people, contact level,
+      connectedness and seed, so that cells sharing a graph never generate it again.
+    - results.jsonl: One line of JSON for each finished cell, appended as soon as it finishes.
+
+Running a sweep again in the same directory skips every cell that already has a result, so a sweep
+that was interrupted continues where it stopped.
+Cells are keyed by their grid values only, so each directory should only be used for sweeps with
+the same number of ticks and engine.
+
+Copyright and Usage Information
+===============================
+This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
+"""
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Optional
+import data_processing
+import seeding
+import snapshot
+from compact_graph import CompactGraph
+from simulation import Simulation
+
+# The keys of a sweep grid, in the order they appear in cell keys
+GRID_KEYS = ('n', 'level', 'num_infected', 'connected', 'seed')
+
+RESULTS_FILE = 'results.jsonl'
+GRAPHS_DIRECTORY = 'graphs'
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict[str, Any]]:
+    """Return every cell of grid, as a dictionary mapping each key of GRID_KEYS to a value.
+
+    Preconditions:
+        - set(grid) == set(GRID_KEYS)
+
+    >>> cells = expand_grid({'n': [20, 40], 'level': ['low'], 'num_infected': [1],
+    ...                      'connected': ['yes', 'no'], 'seed': [0]})
+    >>> len(cells)
+    4
+    >>> cells[0]
+    {'n': 20, 'level': 'low', 'num_infected': 1, 'connected': 'yes', 'seed': 0}
+    """
+    return [dict(zip(GRID_KEYS, values))
+            for values in itertools.product(*(grid[key] for key in GRID_KEYS))]
+
+
+def cell_key(cell: dict[str, Any]) -> str:
+    """Return the key identifying cell in the results of a sweep.
+
+    >>> cell_key({'n': 20, 'level': 'low', 'num_infected': 1, 'connected': 'yes', 'seed': 0})
+    'n=20,level=low,num_infected=1,connected=yes,seed=0'
+    """
+    return ','.join('{}={}'.format(key, cell[key]) for key in GRID_KEYS)
+
+
+def run_sweep(grid: dict[str, list], directory: str, ticks: int = 21,
+              engine: str = 'vectorized', max_workers: Optional[int] = None) -> list[dict]:
+    """Run a headless simulation of ticks ticks for every cell of grid that does not already have
+    a result in directory, and return the results of every cell of grid.
+
+    The cells run across max_workers processes, or as many as there are processors if it is None,
+    or in this process if it is 1. Each result is a dictionary with the cell's key, its values, and
+    the number of people infected at the end of each tick.
+
+    Preconditions:
+        - set(grid) == set(GRID_KEYS)
+        - engine in engines.ENGINES
+    """
+    os.makedirs(os.path.join(directory, GRAPHS_DIRECTORY), exist_ok=True)
+    results = load_results(directory)
+    pending = [cell for cell in expand_grid(grid) if cell_key(cell) not in results]
+
+    with open(os.path.join(directory, RESULTS_FILE), 'a+') as results_file:
+        # A line cut off by an interrupted sweep is ended, so the next result starts its own line
+        if results_file.tell() > 0:
+            results_file.seek(results_file.tell() - 1)
+            if results_file.read(1) != '\n':
+                results_file.write('\n')
+
+        if max_workers == 1:
+            for cell in pending:
+                _record(results_file, results, run_cell(cell, directory, ticks, engine))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(run_cell, cell, directory, ticks, engine)
+                           for cell in pending]
+                # Results are written by this process alone, in the order they finish
+                for future in as_completed(futures):
+                    _record(results_file, results, future.result())
+
+    return [results[cell_key(cell)] for cell in expand_grid(grid)]
+
+
+def load_results(directory: str) -> dict[str, dict]:
+    """Return a dictionary mapping each cell key to its result, for every finished cell of the
+    sweep in directory. A last line cut off by an interrupted sweep is ignored.
+    """
+    results = {}
+    path = os.path.join(directory, RESULTS_FILE)
+    if not os.path.exists(path):
+        return results
+
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result['key']] = result
+
+    return results
+
+
+def run_cell(cell: dict[str, Any], directory: str, ticks: int, engine: str) -> dict:
+    """Run the headless simulation of cell in the sweep in directory, and return its result."""
+    graph = cached_graph(directory, cell['n'], cell['level'], cell['connected'], cell['seed'])
+    conditions = (cell['n'], cell['level'], cell['num_infected'], cell['connected'])
+    result = Simulation(conditions, graph, engine, cell['seed']).run_headless(ticks)
+
+    return {'key': cell_key(cell), **cell, 'ticks': ticks, 'engine': engine,
+            'infected_counts': result.infected_counts.tolist()}
+
+
+def cached_graph(directory: str, n: int, level: str, connected: str, seed: int) -> CompactGraph:
+    """Return the graph generated for the given conditions and seed, from the graph cache of the
+    sweep in directory, generating and caching it first if it is not there.
+
+    The graph is the one Simulation would generate for the same conditions and seed.
+    """
+    path = os.path.join(directory, GRAPHS_DIRECTORY,
+                        'n={},level={},connected={},seed={}.snapshot'.format(n, level, connected,
+                                                                             seed))
+    if not os.path.exists(path):
+        graph_seed = seeding.derive_seed(seed, seeding.GRAPH_STREAM)
+        if connected == 'yes':
+            graph = data_processing.generate_connected_graph(n, level, graph_seed)
+        else:
+            graph = data_processing.generate_disconnected_graph(n, level, graph_seed)
+
+        # Workers may generate the same graph at once, so each writes its own file and moves it
+        # into place, which never leaves a partly written snapshot at path
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        snapshot.save_snapshot(graph, temporary_path)
+        os.replace(temporary_path, path)
+
+    return snapshot.load_snapshot(path)
+
+
+def _record(results_file: Any, results: dict[str, dict], result: dict) -> None:
+    """Append result to the open results file of a sweep and to results, and flush it to disk so
+    that it survives a crash.
+    """
+    results_file.write(json.dumps(result) + '\n')
+    results_file.flush()
+    os.fsync(results_file.fileno())
+    results[result['key']] = result
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['itertools', 'json', 'os', 'concurrent.futures', 'data_processing',
+                          'seeding', 'snapshot', 'compact_graph', 'simulation'],
+        'max-line-length': 100,
+        'allowed-io': ['run_sweep', 'load_results'],
+        'disable': ['E1136']
+    })
@@ -9,10 +9,11 @@ Copyright and Usage Information
 ===============================
 This file is Copyright (c) 2021 Simon Chen, Patricia Ding, Salman Husainie, Makayla Duffus
 """
-from typing import Any, Tuple
+from typing import Any, Optional, Tuple
 import networkx as nx
 from plotly.graph_objs import Scatter, Figure
 import plotly.graph_objects as go
+import layout
 from social_graph import Graph
 
 
@@ -32,7 +33,7 @@ def render_degrees_apart(graph: Graph, init_infected: set[str]) -> None:
     graph_nx = graph.to_nx_with_degree_colour()
 
     colours = [graph_nx.nodes[node]['colour'] for node in graph_nx.nodes]
-    pos = getattr(nx, 'spring_layout')(graph_nx)
+    pos = layout.graph_layout(graph_nx)
 
     # put positions of nodes into lists
     x_values, y_values, x_edges, y_edges = determine_positions(pos, graph_nx)
@@ -52,19 +53,27 @@ def render_degrees_apart(graph: Graph, init_infected: set[str]) -> None:
 
 
 def render_simulation_frame(graph: Graph, pos: dict[str, Any], num: int = 0,
-                            with_degrees: bool = False) -> go.Frame:
+                            with_degrees: bool = False,
+                            positions: Optional[tuple[list[Any], list[Any], list[Any],
+                                                      list[Any]]] = None,
+                            colours: Optional[list[str]] = None) -> go.Frame:
     """Return a plotly Frame given object a graph and the positions of each person and edge on the
     rendered graph.
+
+    Only the colours of the people are recalculated for each frame, since the graph's topology
+    does not change during a simulation. positions may be given as the result of
+    determine_positions(pos, graph.to_nx()) to avoid recalculating it for every frame. colours
+    may be given, in node order, to colour the people other than by graph.node_colours.
     """
-    if with_degrees:
-        graph_nx = graph.to_nx_with_degree_colour()
-    else:
-        graph_nx = graph.to_nx_with_simulation_colour()
+    graph_nx = graph.to_nx()
 
     # create frame
-    colours = [graph_nx.nodes[node]['colour'] for node in graph_nx.nodes]
+    if colours is None:
+        colours = graph.node_colours(with_degrees)
     num_infected = colours.count('rgb(255, 0, 0)')
-    x_values, y_values, x_edges, y_edges = determine_positions(pos, graph_nx)
+    if positions is None:
+        positions = determine_positions(pos, graph_nx)
+    x_values, y_values, x_edges, y_edges = positions
     labels = list(graph_nx.nodes)
 
     # put positions of edges into lists
@@ -75,6 +84,13 @@ def render_simulation_frame(graph: Graph, pos: dict[str, Any], num: int = 0,
                                                             + str(len(graph_nx.nodes))}, name=num)
 
 
+def copy_frame(frame: go.Frame, num: int) -> go.Frame:
+    """Return a copy of the given plotly Frame with a new frame number, for a tick in which
+    nothing changed.
+    """
+    return go.Frame(data=frame.data, layout=frame.layout, name=num)
+
+
 def update_slider(sliders_dict: dict[str, Any], num: int = 0) -> None:
     """Updates slider_dict for the layout of plotly figure. slider_dict controls the slider on the
     plotly visualization.
@@ -123,6 +139,52 @@ def render_simulation_full(frames: list[go.Frame], sliders_dict: dict, num_nodes
     fig.show()
 
 
+def render_simulation_result(graph: Graph, result: Any, with_degrees: bool = False) -> None:
+    """Render the simulation of graph recorded in result, a simulation.SimulationResult from a
+    headless run, in the same way as Simulation.run.
+
+    Preconditions:
+        - all(not person.infected for person in graph._people.values())
+        - result.identifiers == list(graph.get_people())
+    """
+    graph_nx = graph.to_nx()
+    pos = layout.graph_layout(graph_nx)
+    positions = determine_positions(pos, graph_nx)
+
+    graph.set_infected(result.infected_on(0))
+    if with_degrees:
+        graph.recalculate_degrees()
+
+    sliders_dict = {"steps": []}
+    frames = [render_simulation_frame(graph, pos, 0, with_degrees, positions)]
+
+    # Replays the ticks of the result, numbering the frames as Simulation.run does
+    for tick in range(1, result.num_ticks() + 1):
+        newly_infected = result.infected_on(tick)
+        graph.set_infected(newly_infected)
+        if with_degrees:
+            graph.update_degrees(newly_infected)
+
+        frames.append(render_simulation_frame(graph, pos, tick - 1, with_degrees, positions))
+        update_slider(sliders_dict, tick - 1)
+
+    render_simulation_full(frames, sliders_dict, len(graph_nx.nodes),
+                           int(result.infected_counts[0]))
+
+
+def render_infection_curve(result: Any) -> None:
+    """Render the total and new number of infected people on each tick of result, a
+    simulation.SimulationResult or any result with infected_counts and new_infections.
+    """
+    ticks = list(range(len(result.infected_counts)))
+    fig = Figure(data=[Scatter(x=ticks, y=result.infected_counts.tolist(), mode='lines+markers',
+                               name='Total infected'),
+                       go.Bar(x=ticks, y=result.new_infections.tolist(), name='Newly infected')])
+    fig.update_layout({'xaxis_title': 'Week', 'yaxis_title': 'Number of people'})
+
+    fig.show()
+
+
 def create_scatters(edges: Tuple[list[Any], list[Any]], values: Tuple[list[Any], list[Any]],
                     colours: list[Any], labels: list[Any]) -> tuple[go.Scatter, go.Scatter]:
     """Create the nodes and edges through plotly for the visualization"""
@@ -180,7 +242,8 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['networkx', 'social_graph', 'plotly.graph_objs', 'plotly.graph_objects'],
+        'extra-imports': ['networkx', 'social_graph', 'plotly.graph_objs', 'plotly.graph_objects',
+                          'layout'],
         'max-line-length': 100,
         'disable': ['E1136']
     })